@@ -28,6 +28,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'posts.instrumentation.InstrumentationMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -51,6 +52,8 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'posts.context_processors.navigation',
+                'posts.context_processors.rankings',
             ],
         },
     },
@@ -60,11 +63,40 @@ WSGI_APPLICATION = 'Blog.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'ENGINE': config('DATABASE_ENGINE', default='django.db.backends.sqlite3'),
+        'NAME': config('DATABASE_NAME', default=str(BASE_DIR / 'db.sqlite3')),
+        'USER': config('DATABASE_USER', default=''),
+        'PASSWORD': config('DATABASE_PASSWORD', default=''),
+        'HOST': config('DATABASE_HOST', default=''),
+        'PORT': config('DATABASE_PORT', default=''),
+        # Соединение переживает запрос и перед переиспользованием проверяется
+        'CONN_MAX_AGE': config('DATABASE_CONN_MAX_AGE', default=60, cast=int),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Реплика для чтения страниц и API (posts.db.PrimaryReplicaRouter); запись всегда в default.
+# Для SQLite — копия файла, которую обновляет внешняя репликация (например, litestream)
+DATABASE_REPLICA_NAME = config('DATABASE_REPLICA_NAME', default='')
+if DATABASE_REPLICA_NAME:
+    DATABASES['replica'] = dict(
+        DATABASES['default'],
+        NAME=DATABASE_REPLICA_NAME,
+        HOST=config('DATABASE_REPLICA_HOST', default=DATABASES['default']['HOST']),
+        PORT=config('DATABASE_REPLICA_PORT', default=DATABASES['default']['PORT']),
+        TEST={'MIRROR': 'default'},
+    )
+    DATABASE_ROUTERS = ['posts.db.PrimaryReplicaRouter']
+    MIDDLEWARE.insert(1, 'posts.db.ReplicaRoutingMiddleware')
+
+# PRAGMA для каждого нового соединения SQLite (posts.db); пустое значение оставляет умолчание SQLite.
+# WAL включается явно (SQLITE_JOURNAL_MODE=WAL в продакшене): режим записывается в сам файл базы
+# и оставляет рядом -wal/-shm; при пустом SQLITE_SYNCHRONOUS в WAL используется NORMAL
+SQLITE_JOURNAL_MODE = config('SQLITE_JOURNAL_MODE', default='')
+SQLITE_SYNCHRONOUS = config('SQLITE_SYNCHRONOUS', default='')
+SQLITE_MMAP_SIZE = config('SQLITE_MMAP_SIZE', default=256 * 1024 * 1024, cast=int)
+SQLITE_BUSY_TIMEOUT = config('SQLITE_BUSY_TIMEOUT', default=5000, cast=int)
+
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator'},
@@ -112,4 +144,94 @@ CORS_ALLOW_ALL_ORIGINS = DEBUG
 # Email settings (для контактной формы)
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 DEFAULT_FROM_EMAIL = 'noreply@myblog.com'
-CONTACT_EMAIL = 'admin@myblog.com'
\ No newline at end of file
+CONTACT_EMAIL = 'admin@myblog.com'
+
+# Счётчик просмотров: буфер сбрасывается в базу раз в N секунд,
+# повторные просмотры одного посетителя в окне не учитываются
+VIEW_COUNT_FLUSH_INTERVAL = config('VIEW_COUNT_FLUSH_INTERVAL', default=10, cast=int)
+VIEW_COUNT_DEDUP_WINDOW = config('VIEW_COUNT_DEDUP_WINDOW', default=30 * 60, cast=int)
+
+# Приблизительное количество постов в списках кешируется на N секунд
+POST_COUNT_CACHE_TIMEOUT = config('POST_COUNT_CACHE_TIMEOUT', default=300, cast=int)
+
+# Кеши: default для счётчиков и служебных данных, fragments для
+# отрендеренных карточек и текстов постов (LocMemCache вытесняет по LRU)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'fragments': {
+        'BACKEND': config('FRAGMENT_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('FRAGMENT_CACHE_LOCATION', default='post-fragments'),
+        'TIMEOUT': 24 * 60 * 60,
+        'OPTIONS': {
+            'MAX_ENTRIES': config('FRAGMENT_CACHE_MAX_ENTRIES', default=5000, cast=int),
+            'CULL_FREQUENCY': 10,
+        },
+    },
+    # С FileBasedCache готовый XML лент хранится файлами на диске
+    'feeds': {
+        'BACKEND': config('FEED_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('FEED_CACHE_LOCATION', default='post-feeds'),
+        'TIMEOUT': 24 * 60 * 60,
+    },
+}
+
+# Навигация (дерево категорий и облако тегов) кешируется в default и сбрасывается сигналами
+NAVIGATION_CACHE_TIMEOUT = config('NAVIGATION_CACHE_TIMEOUT', default=600, cast=int)
+TAG_CLOUD_SIZE = config('TAG_CLOUD_SIZE', default=50, cast=int)
+
+# Похожие посты (manage.py build_related, задача related.update): число соседей и доля текста против тегов
+RELATED_POSTS_COUNT = config('RELATED_POSTS_COUNT', default=8, cast=int)
+RELATED_POSTS_TEXT_WEIGHT = config('RELATED_POSTS_TEXT_WEIGHT', default=0.7, cast=float)
+
+# Рейтинги постов (задача ranking.refresh): часовые корзины просмотров и лайков сворачиваются в суточные,
+# «популярное» — сумма с затуханием за неделю, «самое читаемое» — просмотры за месяц
+RANKING_SIZE = config('RANKING_SIZE', default=10, cast=int)
+RANKING_REFRESH_INTERVAL = config('RANKING_REFRESH_INTERVAL', default=600, cast=int)
+RANKINGS_CACHE_TIMEOUT = config('RANKINGS_CACHE_TIMEOUT', default=300, cast=int)
+RANKING_LIKE_WEIGHT = config('RANKING_LIKE_WEIGHT', default=5, cast=float)
+TRENDING_WINDOW_DAYS = config('TRENDING_WINDOW_DAYS', default=7, cast=int)
+TRENDING_HALF_LIFE_HOURS = config('TRENDING_HALF_LIFE_HOURS', default=24, cast=float)
+POPULAR_WINDOW_DAYS = config('POPULAR_WINDOW_DAYS', default=30, cast=int)
+ACTIVITY_HOURLY_RETENTION_HOURS = config('ACTIVITY_HOURLY_RETENTION_HOURS', default=48, cast=int)
+
+# Автомодерация комментариев (фоновый обработчик: manage.py run_worker)
+COMMENT_SPAM_THRESHOLD = 0.6
+MODERATOR_EMAILS = [CONTACT_EMAIL]
+
+# Выполненные фоновые задачи удаляются через JOB_RETENTION_DAYS (периодическая задача queue.purge)
+JOB_RETENTION_DAYS = config('JOB_RETENTION_DAYS', default=7, cast=int)
+JOB_PURGE_INTERVAL = config('JOB_PURGE_INTERVAL', default=3600, cast=int)
+
+# Рассылка новых постов подписчикам
+SITE_URL = config('SITE_URL', default='http://localhost:8000')
+NEWSLETTER_BATCH_SIZE = config('NEWSLETTER_BATCH_SIZE', default=500, cast=int)
+NEWSLETTER_WORKERS = config('NEWSLETTER_WORKERS', default=4, cast=int)
+
+# Замеры запросов: Server-Timing и /api/v1/stats/requests/ для доли запросов
+INSTRUMENTATION_ENABLED = config('INSTRUMENTATION_ENABLED', default=True, cast=bool)
+INSTRUMENTATION_SAMPLE_RATE = config('INSTRUMENTATION_SAMPLE_RATE', default=0.1, cast=float)
+INSTRUMENTATION_WINDOW = config('INSTRUMENTATION_WINDOW', default=1000, cast=int)
+
+# Асинхронные представления списка, поста и чтения /api/v1/posts/; имеет смысл только под ASGI
+ASYNC_VIEWS = config('ASYNC_VIEWS', default=False, cast=bool)
+
+# Ширины уменьшенных копий изображений постов (manage.py generate_images, задача image.variants)
+IMAGE_WIDTHS = (320, 640, 960, 1280)
+
+# Ограничение частоты записи: вёдра токенов по IP и пользователю в кеше THROTTLE_CACHE.
+# Формат лимита — «число/период», например 5/min или 10/5m; пустое значение отключает лимит
+THROTTLE_CACHE = config('THROTTLE_CACHE', default='default')
+THROTTLE_RATES = {
+    'comment': config('COMMENT_THROTTLE_RATE', default='5/min'),
+    'like': config('LIKE_THROTTLE_RATE', default='30/min'),
+}
+# Число доверенных прокси перед приложением: IP клиента берётся из X-Forwarded-For с конца;
+# 0 — заголовок игнорируется, пусто — первый адрес заголовка (клиент может его подделать)
+NUM_PROXIES = config('NUM_PROXIES', default=None, cast=lambda value: None if value in (None, '') else int(value))
+
+# Статическая публикация (manage.py render_static, задача prerender.pages): страницы для анонимного
+# чтения пишутся в PRERENDER_ROOT для фронтового веб-сервера; при включении правки перерисовываются из очереди
+PRERENDER_ENABLED = config('PRERENDER_ENABLED', default=False, cast=bool)
+PRERENDER_ROOT = config('PRERENDER_ROOT', default=str(BASE_DIR / 'prerendered'))
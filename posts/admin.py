@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Post, Category, Tag, Comment, Subscription, Like
+from .models import Post, Category, Tag, Comment, Subscription, Like, Job, NewsletterDelivery
+from .prerender import post_path, schedule_prerender
 
 
 @admin.register(Category)
@@ -52,12 +53,16 @@ class CommentAdmin(admin.ModelAdmin):
     actions = ['approve_comments', 'reject_comments']
 
     def approve_comments(self, request, queryset):
+        post_ids = set(queryset.values_list('post_id', flat=True))
         queryset.update(approved=True, is_spam=False)
+        schedule_prerender(paths=[post_path(pk) for pk in post_ids])
 
     approve_comments.short_description = 'Одобрить выбранные комментарии'
 
     def reject_comments(self, request, queryset):
+        post_ids = set(queryset.values_list('post_id', flat=True))
         queryset.update(approved=False)
+        schedule_prerender(paths=[post_path(pk) for pk in post_ids])
 
     reject_comments.short_description = 'Отклонить выбранные комментарии'
 
@@ -73,4 +78,18 @@ class SubscriptionAdmin(admin.ModelAdmin):
 class LikeAdmin(admin.ModelAdmin):
     list_display = ['user', 'post', 'created_at']
     list_filter = ['created_at']
-    search_fields = ['user__username', 'post__title']
\ No newline at end of file
+    search_fields = ['user__username', 'post__title']
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['task', 'status', 'attempts', 'run_at', 'locked_by', 'created_at']
+    list_filter = ['status', 'task']
+    readonly_fields = ['locked_at', 'locked_by', 'last_error', 'created_at', 'updated_at']
+
+
+@admin.register(NewsletterDelivery)
+class NewsletterDeliveryAdmin(admin.ModelAdmin):
+    list_display = ['post', 'status', 'sent_count', 'last_subscription_id', 'finished_at']
+    list_filter = ['status']
+    readonly_fields = ['last_subscription_id', 'sent_count', 'finished_at', 'created_at', 'updated_at']
\ No newline at end of file
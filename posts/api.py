@@ -1,43 +1,184 @@
 from rest_framework import viewsets, status
-from rest_framework.decorators import action
+from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated
-from django_filters.rest_framework import DjangoFilterBackend
-from .models import Post, Category, Tag, Comment, Like, Subscription
+from rest_framework.permissions import AllowAny, IsAuthenticatedOrReadOnly, IsAuthenticated, IsAdminUser
+from rest_framework.exceptions import NotFound, ValidationError
+from django_filters.rest_framework import DjangoFilterBackend, FilterSet
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.http import StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from .counters import get_client_ip
+from .importer import import_posts
+from .instrumentation import request_stats
+from .throttling import CommentRateThrottle, LikeRateThrottle, throttle_stats
+from .navigation import get_navigation
+from .ranking import get_rankings, record_activity
+from .related import related_queryset
+from .export import CONTENT_TYPES, RESOURCES, accepts_gzip, encode_stream, export_lines, gzip_stream, parse_since
+from .pagination import PostCursorPagination
+from .comment_tree import load_thread, load_subtree
+from .conditional import ResourceState, conditional_get, collection_state, post_state
+from .models import Post, Category, Tag, Comment, Like, Subscription, RankedPost
 from .serializers import (
     PostListSerializer, PostDetailSerializer, CategorySerializer,
-    TagSerializer, CommentSerializer, LikeSerializer, SubscriptionSerializer
+    TagSerializer, CommentSerializer, LikeSerializer, SubscriptionSerializer,
+    CommentTreeSerializer, Fieldset, PostRowSerializer, RelatedPostSerializer
 )
 
 
+class PostFilter(FilterSet):
+    class Meta:
+        model = Post
+        fields = ['category', 'tags', 'status']
+
+
 class PostViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticatedOrReadOnly]
     filter_backends = [DjangoFilterBackend]
-    filterset_fields = ['category', 'tags', 'status']
+    filterset_class = PostFilter
+    pagination_class = PostCursorPagination
 
     def get_queryset(self):
-        queryset = Post.objects.select_related('author', 'category').prefetch_related('tags')
+        queryset = Post.objects.all()
         if not self.request.user.is_authenticated:
             queryset = queryset.filter(status=Post.STATUS_PUBLISHED)
-        return queryset
+        if self.action == 'list':
+            # Колонки списка выбирает PostRowSerializer через values()
+            return queryset
+        if self.action != 'retrieve':
+            return queryset.select_related('author', 'category').prefetch_related('tags')
+        return self.get_fieldset().narrow(queryset)
 
     def get_serializer_class(self):
         if self.action == 'list':
             return PostListSerializer
         return PostDetailSerializer
 
-    @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
+    def get_fieldset(self):
+        return Fieldset.from_request(self.request, self.get_serializer_class().Meta.fields)
+
+    def get_serializer(self, *args, **kwargs):
+        if self.action == 'retrieve':
+            kwargs.setdefault('fieldset', self.get_fieldset())
+        return super().get_serializer(*args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        return conditional_get(
+            request,
+            lambda: collection_state(self.filter_queryset(self.get_queryset()), request.user.is_authenticated),
+            lambda: self.list_rows(request),
+        )
+
+    def list_rows(self, request):
+        serializer = PostRowSerializer(self.get_fieldset(), request=request)
+        rows = serializer.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(rows)
+        if page is None:
+            return Response(serializer.serialize(rows))
+        return self.get_paginated_response(serializer.serialize(page))
+
+    def retrieve(self, request, *args, **kwargs):
+        return conditional_get(
+            request,
+            lambda: post_state(self.get_queryset(), kwargs['pk'], approved_only=False),
+            lambda: super(PostViewSet, self).retrieve(request, *args, **kwargs),
+        )
+
+    @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated], throttle_classes=[LikeRateThrottle])
     def like(self, request, pk=None):
         post = self.get_object()
-        like, created = Like.objects.get_or_create(post=post, user=request.user)
+        posts = Post.objects.filter(pk=post.pk)
+
+        with transaction.atomic():
+            deleted, _ = Like.objects.filter(post=post, user=request.user).delete()
+            if deleted:
+                # Счётчик мог отстать от таблицы лайков: не уходим ниже нуля
+                posts.update(likes_count=Greatest(F('likes_count') - 1, 0))
+                record_activity(likes={post.pk: -1})
+                action = 'unliked'
+            else:
+                _, created = Like.objects.get_or_create(
+                    post=post, user=request.user, defaults={'ip_address': get_client_ip(request)}
+                )
+                if created:
+                    posts.update(likes_count=F('likes_count') + 1)
+                    record_activity(likes={post.pk: 1})
+                action = 'liked'
+            likes_count = posts.values_list('likes_count', flat=True).get()
+
+        return Response({'action': action, 'likes_count': likes_count})
+
+    @action(detail=False, methods=['post'], permission_classes=[IsAdminUser])
+    def bulk(self, request):
+        # Тело читается построчно как NDJSON, без разбора парсерами DRF
+        result = import_posts(request.stream or [], default_author=request.user)
+        return Response(
+            {'created': result.created, 'errors': result.errors},
+            status=status.HTTP_201_CREATED if result.created or not result.errors else status.HTTP_400_BAD_REQUEST,
+        )
+
+    @action(detail=True, methods=['get'])
+    def related(self, request, pk=None):
+        # Без get_object(): список читается одним запросом по индексу (post, rank)
+        try:
+            pk = int(pk)
+        except ValueError:
+            raise NotFound()
+        links = list(related_queryset(pk))
+        if not links and not self.get_queryset().filter(pk=pk).exists():
+            raise NotFound()
+        return Response(RelatedPostSerializer(links, many=True).data)
+
+    @action(detail=False, methods=['get'])
+    def trending(self, request):
+        # Готовый топ из кеша: запрос не сортирует таблицу постов
+        kind = request.query_params.get('list', RankedPost.LIST_TRENDING)
+        if kind not in dict(RankedPost.LIST_CHOICES):
+            raise ValidationError({'list': f'Допустимые значения: {", ".join(dict(RankedPost.LIST_CHOICES))}'})
+        category_id = self._int_param('category')
+        rankings = get_rankings()
+        items = rankings.top(kind, category_id, limit=self._int_param('limit'))
+        return conditional_get(
+            request,
+            lambda: ResourceState(None, rankings.version),
+            lambda: Response({
+                'list': kind,
+                'category': category_id,
+                'computed_at': rankings.computed_at,
+                'results': [item._asdict() for item in items],
+            }),
+        )
+
+    @action(detail=True, methods=['get'], url_path='comments/tree')
+    def comment_tree(self, request, pk=None):
+        post = self.get_object()
+        max_depth = self._int_param('max_depth')
 
-        if not created:
-            like.delete()
-            action = 'unliked'
-        else:
-            action = 'liked'
+        root_id = self._int_param('root')
+        if root_id is not None:
+            root = Comment.objects.filter(pk=root_id, post=post, approved=True).only('post', 'path', 'depth').first()
+            node = load_subtree(root, max_depth=max_depth) if root else None
+            if node is None:
+                raise NotFound('Комментарий не найден')
+            return Response(CommentTreeSerializer(node, context={'request': request}).data)
 
-        return Response({'action': action, 'likes_count': post.likes.count()})
+        thread = load_thread(post, page=self._int_param('page') or 1,
+                             per_page=self._int_param('page_size') or 50, max_depth=max_depth)
+        return Response({
+            'count': thread.total,
+            'page': thread.page,
+            'num_pages': thread.num_pages,
+            'results': CommentTreeSerializer(thread.roots, many=True, context={'request': request}).data,
+        })
+
+    def _int_param(self, name):
+        try:
+            value = int(self.request.query_params[name])
+        except (KeyError, ValueError):
+            return None
+        return value if value >= 0 else None
 
 
 class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
@@ -53,10 +194,15 @@ class TagViewSet(viewsets.ReadOnlyModelViewSet):
 class CommentViewSet(viewsets.ModelViewSet):
     serializer_class = CommentSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    throttle_classes = [CommentRateThrottle]
 
     def get_queryset(self):
         return Comment.objects.filter(approved=True)
 
+    def perform_create(self, serializer):
+        serializer.save(ip_address=get_client_ip(self.request),
+                        user_agent=self.request.META.get('HTTP_USER_AGENT', ''))
+
 
 class SubscriptionViewSet(viewsets.ModelViewSet):
     serializer_class = SubscriptionSerializer
@@ -64,4 +210,57 @@ class SubscriptionViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         if self.request.user.is_authenticated:
             return Subscription.objects.filter(email=self.request.user.email)
-        return Subscription.objects.none()
\ No newline at end of file
+        return Subscription.objects.none()
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def export(request, resource, export_format):
+    if resource not in RESOURCES or export_format not in CONTENT_TYPES:
+        raise NotFound('Неизвестный формат выгрузки')
+    since = request.query_params.get('since')
+    if since:
+        try:
+            since = parse_since(since)
+        except ValueError as exc:
+            raise ValidationError({'since': str(exc)})
+
+    stream = encode_stream(export_lines(resource, export_format, since=since or None))
+    gzipped = accepts_gzip(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    response = StreamingHttpResponse(
+        gzip_stream(stream) if gzipped else stream, content_type=CONTENT_TYPES[export_format]
+    )
+    if gzipped:
+        response.headers['Content-Encoding'] = 'gzip'
+    patch_vary_headers(response, ['Accept-Encoding'])
+    response.headers['Content-Disposition'] = f'attachment; filename="{resource}.{export_format}"'
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def navigation_view(request):
+    navigation = get_navigation()
+    return conditional_get(
+        request,
+        lambda: ResourceState(None, navigation.version),
+        lambda: Response(navigation.as_dict()),
+    )
+
+
+@api_view(['GET', 'DELETE'])
+@permission_classes([IsAdminUser])
+def request_stats_view(request):
+    if request.method == 'DELETE':
+        request_stats.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    return Response(request_stats.snapshot())
+
+
+@api_view(['GET', 'DELETE'])
+@permission_classes([IsAdminUser])
+def throttle_stats_view(request):
+    if request.method == 'DELETE':
+        throttle_stats.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    return Response(throttle_stats.snapshot())
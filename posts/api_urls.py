@@ -1,14 +1,33 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .api import PostViewSet, CategoryViewSet, TagViewSet, CommentViewSet, SubscriptionViewSet
+from .api import (
+    PostViewSet, CategoryViewSet, TagViewSet, CommentViewSet, SubscriptionViewSet,
+    export, navigation_view, request_stats_view, throttle_stats_view,
+)
 
 router = DefaultRouter()
-router.register(r'posts', PostViewSet)
+router.register(r'posts', PostViewSet, basename='post')
 router.register(r'categories', CategoryViewSet)
 router.register(r'tags', TagViewSet)
-router.register(r'comments', CommentViewSet)
-router.register(r'subscriptions', SubscriptionViewSet)
+router.register(r'comments', CommentViewSet, basename='comment')
+router.register(r'subscriptions', SubscriptionViewSet, basename='subscription')
 
-urlpatterns = [
+urlpatterns = []
+
+if getattr(settings, 'ASYNC_VIEWS', False):
+    from .async_views import post_detail, post_list
+
+    # Стоят раньше маршрутов роутера; всё, кроме анонимного чтения, они передают PostViewSet
+    urlpatterns += [
+        path('posts/', post_list, name='post-list'),
+        path('posts/<int:pk>/', post_detail, name='post-detail'),
+    ]
+
+urlpatterns += [
     path('', include(router.urls)),
-]
\ No newline at end of file
+    path('export/<slug:resource>.<slug:export_format>', export, name='export'),
+    path('navigation/', navigation_view, name='navigation'),
+    path('stats/requests/', request_stats_view, name='request-stats'),
+    path('stats/throttle/', throttle_stats_view, name='throttle-stats'),
+]
@@ -7,4 +7,6 @@ class PostsConfig(AppConfig):
     verbose_name = 'Блог'
 
     def ready(self):
-        import posts.signals
\ No newline at end of file
+        import posts.db
+        import posts.signals
+        import posts.tasks
\ No newline at end of file
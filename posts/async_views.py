@@ -0,0 +1,215 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.template.response import TemplateResponse
+from django.utils.cache import patch_vary_headers
+from django_filters.utils import translate_validation
+from rest_framework.exceptions import APIException, NotFound
+from rest_framework.renderers import JSONRenderer
+
+from .api import PostFilter, PostViewSet
+from .cache import fragment_cache
+from .comment_tree import aload_thread
+from .conditional import aconditional_get, acollection_state, apage_state, apost_state
+from .counters import view_counter
+from .forms import CommentForm
+from .models import Category, Post, Tag
+from .related import arelated_posts, arelated_versions
+from .prerender import is_prerender
+from .pagination import CursorPaginator, InvalidCursor, PostCursorPagination
+from .serializers import Fieldset, PostDetailSerializer, PostListSerializer, PostRowSerializer
+from .views import PostDetailView, PostListView
+
+
+async def aget_object_or_404(queryset, **lookup):
+    try:
+        return await queryset.aget(**lookup)
+    except queryset.model.DoesNotExist:
+        raise Http404(f'Нет объекта «{queryset.model._meta.verbose_name}» по запросу')
+
+
+class AsyncPostListView(PostListView):
+    """
+    Список постов для ASGI: запросы к базе идут через асинхронный ORM, а
+    страница и приблизительный count читаются параллельно.
+    """
+
+    async def get(self, request, *args, **kwargs):
+        category_slug = kwargs.get('category_slug')
+        if category_slug:
+            self.category = await aget_object_or_404(Category.objects, slug=category_slug)
+        tag_slug = kwargs.get('tag_slug')
+        if tag_slug:
+            self.tag = await aget_object_or_404(Tag.objects, slug=tag_slug)
+
+        queryset = self.filter_posts()
+        extra = [obj.updated_at for obj in (getattr(self, 'category', None), getattr(self, 'tag', None)) if obj]
+        return await aconditional_get(
+            request, lambda: self.aresource_state(queryset, extra), lambda: self.render_page(queryset)
+        )
+
+    async def aresource_state(self, queryset, extra):
+        return await apage_state(await acollection_state(queryset, *extra))
+
+    async def render_page(self, queryset):
+        paginator = CursorPaginator(queryset, self.paginate_by, count_cache_key=self.get_count_cache_key())
+        try:
+            page, count = await asyncio.gather(
+                paginator.apage(self.request.GET.get(self.cursor_query_param)),
+                paginator.aapproximate_count(),
+            )
+        except InvalidCursor:
+            raise Http404('Неверный курсор страницы')
+        page.approximate_count = count
+
+        posts = page.object_list
+        cards = await sync_to_async(fragment_cache.render_many)('post-card', 'posts/includes/post_card.html', posts)
+        context = {
+            'view': self,
+            'paginator': paginator,
+            'page_obj': page,
+            'is_paginated': page.has_other_pages(),
+            'object_list': posts,
+            'posts': posts,
+            'post_cards': list(zip(posts, cards)),
+        }
+        if hasattr(self, 'category'):
+            context['category'] = self.category
+        if hasattr(self, 'tag'):
+            context['tag'] = self.tag
+        return TemplateResponse(self.request, self.template_name, context)
+
+
+class AsyncPostDetailView(PostDetailView):
+    """Страница поста для ASGI: пост, ветка комментариев и похожие посты читаются параллельно."""
+
+    async def get(self, request, *args, **kwargs):
+        pk = kwargs['pk']
+        response = await aconditional_get(request, lambda: self.aresource_state(pk), lambda: self.render_post(pk))
+        if response.status_code in (200, 304) and not is_prerender(request):
+            await view_counter.arecord(request, pk)
+        return response
+
+    async def aresource_state(self, pk):
+        csrf_cookie = self.request.COOKIES.get(settings.CSRF_COOKIE_NAME)
+        if csrf_cookie is None:
+            return None
+        state, related = await asyncio.gather(apost_state(self.get_queryset(), pk), arelated_versions(pk))
+        return await apage_state(state, related, csrf_cookie)
+
+    async def render_post(self, pk):
+        self.object, thread, related = await asyncio.gather(
+            aget_object_or_404(self.get_queryset(), pk=pk),
+            aload_thread(pk, page=self.get_comments_page(), per_page=self.comments_per_page,
+                         max_depth=self.comments_max_depth),
+            arelated_posts(pk),
+        )
+        post_body = await sync_to_async(fragment_cache.render)(
+            'post-body', 'posts/includes/post_body.html', self.object
+        )
+        # Контекст DetailView без переопределения из PostDetailView, которое читает базу синхронно
+        context = super(PostDetailView, self).get_context_data(
+            post_body=post_body,
+            comment_thread=thread,
+            comment_form=CommentForm(post=self.object, initial={'parent': self.request.GET.get('reply_to')}),
+            related_posts=related,
+            prerendered=is_prerender(self.request),
+        )
+        return TemplateResponse(self.request, self.template_name, context)
+
+    async def post(self, request, *args, **kwargs):
+        # Отправка комментария остаётся синхронной
+        return await sync_to_async(PostDetailView.as_view())(request, *args, **kwargs)
+
+
+sync_post_list = PostViewSet.as_view({'get': 'list', 'post': 'create'}, basename='post', detail=False)
+sync_post_detail = PostViewSet.as_view({
+    'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy',
+}, basename='post', detail=True)
+
+
+def use_sync_api(request):
+    """
+    Асинхронно обслуживается только анонимное чтение JSON — основная часть
+    трафика. Запись, запросы с учётными данными (им нужны аутентификация и
+    права DRF) и браузерный API уходят в обычный PostViewSet.
+    """
+    return (
+        request.method not in ('GET', 'HEAD')
+        or 'HTTP_AUTHORIZATION' in request.META
+        or settings.SESSION_COOKIE_NAME in request.COOKIES
+        or 'format' in request.GET
+        or 'text/html' in request.META.get('HTTP_ACCEPT', '')
+    )
+
+
+def json_response(data, status=200):
+    response = HttpResponse(JSONRenderer().render(data), status=status, content_type='application/json')
+    patch_vary_headers(response, ['Accept'])
+    return response
+
+
+def api_error(exc):
+    # Тот же формат, что у обработчика исключений DRF
+    detail = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+    return json_response(detail, status=exc.status_code)
+
+
+def filter_posts(request):
+    filterset = PostFilter(request.GET, queryset=Post.objects.filter(status=Post.STATUS_PUBLISHED))
+    # Проверка фильтров category/tags читает базу, поэтому выполняется в потоке
+    if not filterset.is_valid():
+        raise translate_validation(filterset.errors)
+    return filterset.qs
+
+
+async def post_list(request):
+    if use_sync_api(request):
+        return await sync_to_async(sync_post_list)(request)
+    try:
+        fieldset = Fieldset.from_request(request, PostListSerializer.Meta.fields)
+        queryset = await sync_to_async(filter_posts)(request)
+    except APIException as exc:
+        return api_error(exc)
+
+    async def render():
+        serializer = PostRowSerializer(fieldset, request=request)
+        pagination = PostCursorPagination()
+        try:
+            rows = await pagination.apaginate_queryset(serializer.values(queryset), request)
+        except APIException as exc:
+            return api_error(exc)
+        return json_response(pagination.get_paginated_data(await serializer.aserialize(rows)))
+
+    # Второй элемент состояния — request.user.is_authenticated, как в PostViewSet.list
+    return await aconditional_get(request, lambda: acollection_state(queryset, False), render)
+
+
+async def post_detail(request, pk):
+    if use_sync_api(request):
+        return await sync_to_async(sync_post_detail)(request, pk=pk)
+    try:
+        fieldset = Fieldset.from_request(request, PostDetailSerializer.Meta.fields)
+    except APIException as exc:
+        return api_error(exc)
+    queryset = fieldset.narrow(Post.objects.filter(status=Post.STATUS_PUBLISHED))
+
+    async def render():
+        try:
+            post = await queryset.aget(pk=pk)
+        except Post.DoesNotExist:
+            return api_error(NotFound())
+        serializer = PostDetailSerializer(post, fieldset=fieldset, context={'request': request})
+        # Вычисляемые поля могут дочитывать отложенные колонки, поэтому данные собираются в потоке
+        return json_response(await sync_to_async(lambda: serializer.data)())
+
+    return await aconditional_get(
+        request, lambda: apost_state(queryset, pk, approved_only=False), render
+    )
+
+
+# CSRF проверяет DRF внутри PostViewSet; csrf_exempt из Django 4.2 не сохраняет корутинность
+post_list.csrf_exempt = True
+post_detail.csrf_exempt = True
@@ -0,0 +1,86 @@
+import threading
+import time
+
+from django.core.cache import caches
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+FRAGMENT_CACHE_ALIAS = 'fragments'
+GENERATION_KEY = 'fragment-generation'
+
+
+class FragmentCache:
+    """
+    Кеш отрендеренных фрагментов постов. Ключ строится из (pk, updated_at)
+    и общего поколения, которое сдвигается сигналами при изменении тегов
+    и категорий, поэтому старые фрагменты просто перестают запрашиваться
+    и вытесняются бэкендом по LRU.
+    """
+
+    def __init__(self, alias=FRAGMENT_CACHE_ALIAS):
+        self.alias = alias
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def generation(self):
+        generation = self.cache.get(GENERATION_KEY)
+        if generation is None:
+            self.cache.add(GENERATION_KEY, time.time_ns(), None)
+            generation = self.cache.get(GENERATION_KEY, 0)
+        return generation
+
+    def invalidate(self):
+        self.cache.set(GENERATION_KEY, time.time_ns(), None)
+
+    def make_key(self, kind, post, generation):
+        return f'{kind}:{post.pk}:{post.updated_at.timestamp()}:{generation}'
+
+    def render_many(self, kind, template_name, posts):
+        posts = list(posts)
+        if not posts:
+            return []
+
+        generation = self.generation()
+        keys = [self.make_key(kind, post, generation) for post in posts]
+        cached = self.cache.get_many(keys)
+
+        fragments = []
+        rendered = {}
+        for key, post in zip(keys, posts):
+            html = cached.get(key)
+            if html is None:
+                html = render_to_string(template_name, {'post': post})
+                rendered[key] = html
+            fragments.append(mark_safe(html))
+
+        if rendered:
+            self.cache.set_many(rendered)
+        with self._lock:
+            self.hits += len(posts) - len(rendered)
+            self.misses += len(rendered)
+        return fragments
+
+    def render(self, kind, template_name, post):
+        return self.render_many(kind, template_name, [post])[0]
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+
+fragment_cache = FragmentCache()
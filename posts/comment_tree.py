@@ -0,0 +1,114 @@
+from .models import Comment
+
+COMMENT_TREE_FIELDS = ('id', 'post', 'parent', 'author_name', 'author_website',
+                       'content', 'created_at', 'depth', 'path')
+
+
+class CommentThread:
+    """
+    Дерево одобренных комментариев поста. Вся ветка читается одним запросом,
+    упорядоченным по материализованному пути, и собирается за один проход:
+    родитель всегда идёт раньше своих ответов.
+    """
+
+    def __init__(self, roots, total, page=1, per_page=None, max_depth=None):
+        self.total = total
+        self.page = page
+        self.per_page = per_page
+        self.max_depth = max_depth
+        self.root_count = len(roots)
+
+        if per_page:
+            start = (page - 1) * per_page
+            roots = roots[start:start + per_page]
+        self.roots = roots
+
+    @property
+    def num_pages(self):
+        if not self.per_page:
+            return 1
+        return max(1, -(-self.root_count // self.per_page))
+
+    def has_next(self):
+        return self.page < self.num_pages
+
+    def has_previous(self):
+        return self.page > 1
+
+    def __iter__(self):
+        # Обход в глубину без рекурсии — удобно для шаблона с отступами по depth
+        stack = list(reversed(self.roots))
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(node.children))
+
+    def __len__(self):
+        return self.total
+
+
+def build_tree(comments, max_depth=None, root_id=None):
+    by_id = {}
+    collapsed = {}
+    roots = []
+    for comment in comments:
+        comment.children = []
+        comment.hidden_replies = 0
+        if comment.parent_id is None or comment.pk == root_id:
+            by_id[comment.pk] = comment
+            roots.append(comment)
+            continue
+
+        parent = by_id.get(comment.parent_id)
+        if parent is None and comment.parent_id not in collapsed:
+            # Родитель не одобрен — ветка не показывается
+            continue
+        if parent is None or (max_depth is not None and comment.depth > max_depth):
+            # Слишком глубокие ответы сворачиваются в счётчик у ближайшего видимого предка
+            anchor = parent or collapsed[comment.parent_id]
+            anchor.hidden_replies += 1
+            collapsed[comment.pk] = anchor
+            continue
+        by_id[comment.pk] = comment
+        parent.children.append(comment)
+    return roots
+
+
+def thread_comments(post):
+    return Comment.objects.filter(post=post, approved=True).order_by('path').only(*COMMENT_TREE_FIELDS)
+
+
+def make_thread(comments, page=1, per_page=None, max_depth=None):
+    roots = build_tree(comments, max_depth=max_depth)
+    return CommentThread(roots, total=count_visible(roots), page=page, per_page=per_page, max_depth=max_depth)
+
+
+def load_thread(post, page=1, per_page=None, max_depth=None):
+    return make_thread(list(thread_comments(post)), page=page, per_page=per_page, max_depth=max_depth)
+
+
+async def aload_thread(post, page=1, per_page=None, max_depth=None):
+    comments = [comment async for comment in thread_comments(post)]
+    return make_thread(comments, page=page, per_page=per_page, max_depth=max_depth)
+
+
+def count_visible(roots):
+    count = 0
+    stack = list(roots)
+    while stack:
+        node = stack.pop()
+        count += 1 + node.hidden_replies
+        stack.extend(node.children)
+    return count
+
+
+def load_subtree(comment, max_depth=None):
+    comments = list(
+        Comment.objects.filter(post_id=comment.post_id, approved=True, path__startswith=comment.path)
+        .order_by('path')
+        .only(*COMMENT_TREE_FIELDS)
+    )
+    if not comments or comments[0].pk != comment.pk:
+        return None
+    max_depth = None if max_depth is None else comment.depth + max_depth
+    return build_tree(comments, max_depth=max_depth, root_id=comment.pk)[0]
@@ -0,0 +1,168 @@
+import hashlib
+from calendar import timegm
+
+from asgiref.sync import sync_to_async
+from django.contrib.messages import get_messages
+from django.db.models import Count, Max, Q, Sum
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from .navigation import get_navigation
+from .ranking import get_rankings
+
+
+class ResourceState:
+    """Версия ресурса для условных запросов: ETag и Last-Modified из одного агрегата."""
+
+    def __init__(self, last_modified, *parts):
+        self.last_modified = last_modified
+        self.parts = parts
+
+    def etag(self, request):
+        # URL и Accept входят в ETag: у одного ресурса разные страницы и представления
+        raw = repr((request.get_full_path(), request.META.get('HTTP_ACCEPT', ''),
+                    self.last_modified and self.last_modified.timestamp()) + self.parts)
+        return quote_etag(hashlib.md5(raw.encode()).hexdigest())
+
+    def timestamp(self):
+        if self.last_modified is None:
+            return None
+        return timegm(self.last_modified.utctimetuple())
+
+
+def latest(*values):
+    values = [value for value in values if value is not None]
+    return max(values) if values else None
+
+
+def collection_aggregates(counters=True):
+    aggregates = {
+        'last_modified': Max('updated_at'),
+        'category_modified': Max('category__updated_at'),
+        'count': Count('pk'),
+    }
+    if counters:
+        # Счётчики меняются без сохранения поста, поэтому учитываются отдельно
+        aggregates.update(views=Sum('views_count'), likes=Sum('likes_count'))
+    return aggregates
+
+
+def make_collection_state(state, extra):
+    return ResourceState(
+        latest(state['last_modified'], state['category_modified']),
+        state['count'], state.get('views'), state.get('likes'), *extra
+    )
+
+
+def collection_state(queryset, *extra, counters=True):
+    state = queryset.order_by().aggregate(**collection_aggregates(counters))
+    return make_collection_state(state, extra)
+
+
+async def acollection_state(queryset, *extra, counters=True):
+    state = await queryset.order_by().aaggregate(**collection_aggregates(counters))
+    return make_collection_state(state, extra)
+
+
+def post_state_rows(queryset, pk, approved_only=True):
+    comments = Q(comments__approved=True) if approved_only else Q()
+    return queryset.filter(pk=pk).order_by().values('updated_at', 'views_count', 'likes_count').annotate(
+        comment_count=Count('comments', filter=comments),
+        comments_modified=Max('comments__updated_at', filter=comments),
+    )[:1]
+
+
+def make_post_state(rows):
+    if not rows:
+        return None
+    state = rows[0]
+    return ResourceState(
+        latest(state['updated_at'], state['comments_modified']),
+        state['comment_count'], state['views_count'], state['likes_count']
+    )
+
+
+def post_state(queryset, pk, approved_only=True):
+    return make_post_state(list(post_state_rows(queryset, pk, approved_only)))
+
+
+async def apost_state(queryset, pk, approved_only=True):
+    return make_post_state([row async for row in post_state_rows(queryset, pk, approved_only)])
+
+
+def sidebar_versions():
+    # Навигация и рейтинги из кеша выводятся на каждой HTML-странице
+    return get_navigation().version, get_rankings().version
+
+
+def make_page_state(state, parts, sidebar):
+    if state is None:
+        return None
+    # Время изменения входит в ETag, но Last-Modified не отдаётся: у сайдбара и
+    # прочих входов шаблона нет общей даты, и If-Modified-Since дал бы 304 на устаревшую страницу
+    return ResourceState(None, state.timestamp(), *state.parts, *parts, *sidebar)
+
+
+def page_state(state, *parts):
+    """Версия HTML-страницы: данные ресурса, входы шаблона parts и сайдбар."""
+    return make_page_state(state, parts, sidebar_versions())
+
+
+async def apage_state(state, *parts):
+    return make_page_state(state, parts, await sync_to_async(sidebar_versions)())
+
+
+def has_pending_messages(request):
+    # Страница с флеш-сообщением должна отрендериться, иначе сообщение не покажется
+    return hasattr(request, '_messages') and len(get_messages(request)) > 0
+
+
+def check_conditional(request, state):
+    """ETag, Last-Modified и готовый ответ 304/412, если клиентская копия актуальна."""
+    etag = state.etag(request)
+    last_modified = state.timestamp()
+    return etag, last_modified, get_conditional_response(request, etag=etag, last_modified=last_modified)
+
+
+def add_validators(response, etag, last_modified):
+    if response.status_code in (200, 304):
+        response.headers.setdefault('ETag', etag)
+        if last_modified is not None:
+            response.headers.setdefault('Last-Modified', http_date(last_modified))
+        patch_cache_control(response, no_cache=True)
+    return response
+
+
+def conditional_get(request, get_state, render):
+    if request.method not in ('GET', 'HEAD') or has_pending_messages(request):
+        return render()
+
+    state = get_state()
+    if state is None:
+        return render()
+
+    etag, last_modified, response = check_conditional(request, state)
+    return add_validators(response or render(), etag, last_modified)
+
+
+async def aconditional_get(request, get_state, render):
+    """То же, что conditional_get, но get_state и render — корутины."""
+    if request.method not in ('GET', 'HEAD') or await sync_to_async(has_pending_messages)(request):
+        return await render()
+
+    state = await get_state()
+    if state is None:
+        return await render()
+
+    etag, last_modified, response = check_conditional(request, state)
+    return add_validators(response or await render(), etag, last_modified)
+
+
+class ConditionalGetMixin:
+    def get_resource_state(self):
+        return None
+
+    def get(self, request, *args, **kwargs):
+        return conditional_get(request, self.get_resource_state, lambda: super(ConditionalGetMixin, self).get(
+            request, *args, **kwargs
+        ))
@@ -0,0 +1,13 @@
+from django.utils.functional import SimpleLazyObject
+
+from .navigation import get_navigation
+from .ranking import get_rankings
+
+
+def navigation(request):
+    # Кеш читается, только если шаблон действительно выводит навигацию
+    return {'navigation': SimpleLazyObject(get_navigation)}
+
+
+def rankings(request):
+    return {'rankings': SimpleLazyObject(get_rankings)}
@@ -0,0 +1,131 @@
+import atexit
+import logging
+import threading
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from django.db.models import F
+
+from .models import Post
+from .ranking import record_activity
+
+logger = logging.getLogger(__name__)
+
+
+def get_client_ip(request):
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
+    proxies = getattr(settings, 'NUM_PROXIES', None)
+    if forwarded and proxies != 0:
+        addresses = [address.strip() for address in forwarded.split(',')]
+        # Левые адреса клиент подставляет сам; при NUM_PROXIES берётся адрес, записанный нашим прокси
+        return addresses[-min(proxies, len(addresses))] if proxies else addresses[0]
+    return request.META.get('REMOTE_ADDR')
+
+
+def get_visitor_key(request):
+    session = getattr(request, 'session', None)
+    if session is not None and session.session_key:
+        return f's:{session.session_key}'
+    return f'ip:{get_client_ip(request)}'
+
+
+class ViewCounter:
+    """
+    Буфер просмотров постов. Просмотры копятся в памяти процесса и
+    периодически сбрасываются в базу одним UPDATE с F() на каждое
+    значение прироста, поэтому запрос страницы не ждёт записи.
+    """
+
+    def __init__(self, flush_interval=None, dedup_window=None, max_pending=None):
+        self.flush_interval = flush_interval or getattr(settings, 'VIEW_COUNT_FLUSH_INTERVAL', 10)
+        self.dedup_window = dedup_window if dedup_window is not None else getattr(
+            settings, 'VIEW_COUNT_DEDUP_WINDOW', 30 * 60)
+        self.max_pending = max_pending or getattr(settings, 'VIEW_COUNT_MAX_PENDING', 1000)
+        self._pending = Counter()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def record(self, request, post_id):
+        if self.dedup_window:
+            key = f'post-view:{post_id}:{get_visitor_key(request)}'
+            if not cache.add(key, 1, self.dedup_window):
+                return False
+        self.hit(post_id)
+        return True
+
+    async def arecord(self, request, post_id):
+        if self.dedup_window:
+            key = f'post-view:{post_id}:{get_visitor_key(request)}'
+            if not await cache.aadd(key, 1, self.dedup_window):
+                return False
+        self.hit(post_id)
+        return True
+
+    def hit(self, post_id, count=1):
+        with self._lock:
+            self._pending[post_id] += count
+            overflow = len(self._pending) >= self.max_pending
+        self._ensure_flusher()
+        if overflow:
+            self._wakeup.set()
+
+    def pending(self):
+        with self._lock:
+            return dict(self._pending)
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+        if not pending:
+            return 0
+
+        by_delta = defaultdict(list)
+        for post_id, delta in pending.items():
+            by_delta[delta].append(post_id)
+
+        try:
+            # Счётчик поста и часовая корзина рейтинга сохраняются вместе или не сохраняются вовсе
+            with transaction.atomic():
+                for delta, post_ids in by_delta.items():
+                    Post.objects.filter(pk__in=post_ids).update(views_count=F('views_count') + delta)
+                record_activity(views=pending)
+        except Exception:
+            # Возвращаем просмотры в буфер, чтобы не потерять их при сбое базы
+            with self._lock:
+                self._pending.update(pending)
+            raise
+        return sum(pending.values())
+
+    def _ensure_flusher(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='view-counter-flusher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Не удалось сохранить счётчики просмотров')
+            finally:
+                close_old_connections()
+
+
+view_counter = ViewCounter()
+
+
+@atexit.register
+def _flush_on_exit():
+    try:
+        view_counter.flush()
+    except Exception:
+        logger.exception('Не удалось сохранить счётчики просмотров при завершении')
@@ -0,0 +1,123 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+REPLICA_ALIAS = 'replica'
+
+# Чтение этих страниц и эндпоинтов допускает отставание реплики
+REPLICA_VIEW_NAMES = frozenset({
+    'posts:post-list', 'posts:post-detail', 'posts:comment-thread', 'posts:category-posts', 'posts:tag-posts',
+    'posts:post-search', 'posts:post-rss', 'posts:post-rss-full', 'posts:post-atom', 'posts:post-atom-full',
+    'posts:category-rss', 'posts:category-atom', 'posts:tag-rss', 'posts:tag-atom',
+    'post-list', 'post-detail', 'post-related', 'post-trending', 'post-comment-tree',
+    'category-list', 'category-detail', 'tag-list', 'tag-detail', 'navigation',
+})
+
+# Изменяемый объект, а не флаг: process_view под ASGI выполняется в скопированном контексте
+_replica_state = ContextVar('replica_state', default=None)
+
+
+def sqlite_pragmas():
+    # WAL: читатели не ждут писателя, а писатель — читателей. Режим сохраняется в файле базы,
+    # поэтому включается только явно
+    journal_mode = getattr(settings, 'SQLITE_JOURNAL_MODE', '')
+    wal = str(journal_mode).upper() == 'WAL'
+    return {
+        'journal_mode': journal_mode,
+        # В режиме WAL NORMAL не теряет целостность, только последние транзакции при отключении питания
+        'synchronous': getattr(settings, 'SQLITE_SYNCHRONOUS', '') or ('NORMAL' if wal else ''),
+        'mmap_size': getattr(settings, 'SQLITE_MMAP_SIZE', 256 * 1024 * 1024),
+        'busy_timeout': getattr(settings, 'SQLITE_BUSY_TIMEOUT', 5000),
+    }
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in sqlite_pragmas().items():
+            if value not in (None, ''):
+                cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def replica_configured():
+    return REPLICA_ALIAS in settings.DATABASES
+
+
+@contextmanager
+def replica_reads():
+    """Чтение внутри блока идёт с реплики, пока в нём ничего не записано."""
+    token = _replica_state.set({'replica': True})
+    try:
+        yield
+    finally:
+        _replica_state.reset(token)
+
+
+class PrimaryReplicaRouter:
+    """
+    Запись — всегда в основную базу. Чтение уходит на реплику только в
+    помеченных запросах (ReplicaRoutingMiddleware, replica_reads) и не внутри
+    транзакции; после первой записи запрос читает из основной базы, чтобы
+    видеть свои изменения.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _replica_state.get()
+        if not state or not state['replica'] or connections['default'].in_atomic_block:
+            return 'default'
+        return REPLICA_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = _replica_state.get()
+        if state:
+            state['replica'] = False
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплика — копия основной базы, объекты из обеих связываются свободно
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA_ALIAS
+
+
+class ReplicaRoutingMiddleware:
+    """Помечает GET/HEAD запросы страниц и API из REPLICA_VIEW_NAMES для чтения с реплики."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = replica_configured()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _replica_state.set({'replica': False})
+        try:
+            return self.get_response(request)
+        finally:
+            _replica_state.reset(token)
+
+    async def __acall__(self, request):
+        token = _replica_state.set({'replica': False})
+        try:
+            return await self.get_response(request)
+        finally:
+            _replica_state.reset(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = _replica_state.get()
+        if self.enabled and state is not None and request.method in ('GET', 'HEAD'):
+            state['replica'] = request.resolver_match.view_name in REPLICA_VIEW_NAMES
+        return None
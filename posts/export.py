@@ -0,0 +1,193 @@
+import csv
+import json
+import zlib
+from datetime import datetime, time
+from itertools import islice
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Comment, Post
+
+EXPORT_CHUNK_SIZE = 1000
+STREAM_BUFFER_SIZE = 64 * 1024
+
+# Выходное поле -> колонка values(); связи выгружаются по slug/username, как их принимает импорт
+POST_EXPORT_COLUMNS = {
+    'id': 'id',
+    'title': 'title',
+    'slug': 'slug',
+    'content': 'content',
+    'excerpt': 'excerpt',
+    'author': 'author__username',
+    'category': 'category__slug',
+    'image': 'image',
+    'image_alt': 'image_alt',
+    'status': 'status',
+    'pub_date': 'pub_date',
+    'is_featured': 'is_featured',
+    'allow_comments': 'allow_comments',
+    'views_count': 'views_count',
+    'likes_count': 'likes_count',
+    'reading_time': 'reading_time',
+    'created_at': 'created_at',
+    'updated_at': 'updated_at',
+}
+
+COMMENT_EXPORT_COLUMNS = {
+    'id': 'id',
+    'post': 'post_id',
+    'parent': 'parent_id',
+    'author_name': 'author_name',
+    'author_email': 'author_email',
+    'author_website': 'author_website',
+    'content': 'content',
+    'ip_address': 'ip_address',
+    'user_agent': 'user_agent',
+    'approved': 'approved',
+    'is_spam': 'is_spam',
+    'depth': 'depth',
+    'created_at': 'created_at',
+    'updated_at': 'updated_at',
+}
+
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+
+def parse_since(value):
+    since = parse_datetime(value)
+    if since is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f'Неверная дата: {value}')
+        since = datetime.combine(day, time.min)
+    if timezone.is_naive(since):
+        since = timezone.make_aware(since)
+    return since
+
+
+def iter_chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def iter_rows(queryset, columns, since=None, chunk_size=EXPORT_CHUNK_SIZE):
+    if since is not None:
+        queryset = queryset.filter(updated_at__gte=since)
+    # iterator() читает серверным курсором: в памяти не больше одной пачки
+    rows = queryset.order_by('pk').values_list(*columns.values()).iterator(chunk_size=chunk_size)
+    for chunk in iter_chunks(rows, chunk_size):
+        yield [dict(zip(columns, row)) for row in chunk]
+
+
+def post_rows(since=None, chunk_size=EXPORT_CHUNK_SIZE):
+    for chunk in iter_rows(Post.objects.all(), POST_EXPORT_COLUMNS, since, chunk_size):
+        # Теги одной пачки постов читаются одним запросом
+        tags = {}
+        links = (
+            Post.tags.through.objects.filter(post_id__in=[row['id'] for row in chunk])
+            .order_by('tag__slug')
+            .values_list('post_id', 'tag__slug')
+        )
+        for post_id, slug in links:
+            tags.setdefault(post_id, []).append(slug)
+        for row in chunk:
+            row['tags'] = tags.get(row['id'], [])
+            yield row
+
+
+def comment_rows(since=None, chunk_size=EXPORT_CHUNK_SIZE):
+    for chunk in iter_rows(Comment.objects.all(), COMMENT_EXPORT_COLUMNS, since, chunk_size):
+        yield from chunk
+
+
+RESOURCES = {
+    'posts': (post_rows, list(POST_EXPORT_COLUMNS) + ['tags']),
+    'comments': (comment_rows, list(COMMENT_EXPORT_COLUMNS)),
+}
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def csv_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, list):
+        return ','.join(value)
+    return value
+
+
+def ndjson_lines(rows, fieldnames):
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+
+def csv_lines(rows, fieldnames):
+    writer = csv.writer(Echo())
+    yield writer.writerow(fieldnames)
+    for row in rows:
+        yield writer.writerow([csv_value(row[name]) for name in fieldnames])
+
+
+FORMATS = {
+    'ndjson': ndjson_lines,
+    'csv': csv_lines,
+}
+
+
+def export_lines(resource, export_format, since=None, chunk_size=EXPORT_CHUNK_SIZE):
+    rows, fieldnames = RESOURCES[resource]
+    return FORMATS[export_format](rows(since=since, chunk_size=chunk_size), fieldnames)
+
+
+def encode_stream(lines, buffer_size=STREAM_BUFFER_SIZE):
+    # Строки склеиваются в блоки, чтобы не отдавать ответ мелкими кусками
+    buffer = []
+    size = 0
+    for line in lines:
+        data = line.encode()
+        buffer.append(data)
+        size += len(data)
+        if size >= buffer_size:
+            yield b''.join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def accepts_gzip(accept_encoding):
+    """Разбирает Accept-Encoding с q-значениями: gzip;q=0 — отказ, x-gzip не считается gzip."""
+    weights = {}
+    for item in accept_encoding.split(','):
+        coding, _, params = item.partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        weights[coding] = quality
+    return weights.get('gzip', weights.get('*', 0.0)) > 0
+
+
+def gzip_stream(blocks, level=6):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for block in blocks:
+        data = compressor.compress(block)
+        if data:
+            yield data
+    yield compressor.flush()
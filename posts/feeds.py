@@ -1,21 +1,125 @@
+import hashlib
+
 from django.contrib.syndication.views import Feed
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
 from django.urls import reverse
-from .models import Post
+from django.utils.feedgenerator import Atom1Feed
+from .models import Category, Post, Tag
+from .conditional import conditional_get, collection_state
+
+FEED_CACHE_ALIAS = 'feeds'
+FEED_ITEM_FIELDS = ('id', 'title', 'pub_date', 'updated_at', 'author__username', 'category__name')
 
 
 class LatestPostsFeed(Feed):
+    """
+    Лента последних постов. XML строится один раз на каждое состояние ленты
+    (публикация, правка, удаление поста) и дальше отдаётся из кеша 'feeds'.
+    """
+
     title = "Мой Блог - Последние посты"
-    link = "/rss/"
     description = "Последние посты из моего блога"
+    items_count = 10
+
+    def __init__(self, atom=False, full=False):
+        self.full = full
+        if atom:
+            self.feed_type = Atom1Feed
+
+    def __call__(self, request, *args, **kwargs):
+        obj = self.get_object(request, *args, **kwargs)
+        state = self.get_state(obj)
+        return conditional_get(request, lambda: state, lambda: self.render(request, obj, state))
+
+    def get_queryset(self, obj):
+        return Post.published.all()
+
+    def get_state(self, obj):
+        # Просмотры и лайки в ленту не попадают и не должны её перестраивать
+        extra = (obj.updated_at,) if obj is not None else ()
+        return collection_state(self.get_queryset(obj), *extra, counters=False)
 
-    def items(self):
-        return Post.published.all()[:10]
+    def cache_key(self, request, state):
+        # Без строки запроса: ?utm_source=… и подобные не должны плодить копии XML в кеше
+        raw = repr((request.path, self.feed_type.__name__, self.full, state.timestamp()) + state.parts)
+        return 'feed:' + hashlib.md5(raw.encode()).hexdigest()
+
+    def render(self, request, obj, state):
+        cache = caches[FEED_CACHE_ALIAS]
+        key = self.cache_key(request, state)
+        cached = cache.get(key)
+        if cached is None:
+            feedgen = self.get_feed(obj, request)
+            cached = (feedgen.content_type, feedgen.writeString('utf-8'))
+            cache.set(key, cached)
+        content_type, content = cached
+        return HttpResponse(content, content_type=content_type)
+
+    def link(self, obj):
+        return reverse('posts:post-list')
+
+    def subtitle(self, obj):
+        # Atom берёт описание ленты из subtitle
+        return self._get_dynamic_attr('description', obj)
+
+    def items(self, obj):
+        # Тяжёлые content/content_html читаются только для полнотекстовой ленты
+        fields = FEED_ITEM_FIELDS + (('content_html',) if self.full else ('excerpt_html',))
+        return self.get_queryset(obj).select_related('author', 'category').only(*fields)[:self.items_count]
 
     def item_title(self, item):
         return item.title
 
     def item_description(self, item):
-        return item.excerpt or item.content[:200]
+        return item.content_html if self.full else item.excerpt_html
 
     def item_link(self, item):
-        return reverse('post-detail', args=[item.pk])
\ No newline at end of file
+        return reverse('posts:post-detail', args=[item.pk])
+
+    def item_pubdate(self, item):
+        return item.pub_date
+
+    def item_updateddate(self, item):
+        return item.updated_at
+
+    def item_author_name(self, item):
+        return item.author.username if item.author else None
+
+    def item_categories(self, item):
+        return [item.category.name] if item.category else []
+
+
+class CategoryPostsFeed(LatestPostsFeed):
+    def get_object(self, request, category_slug):
+        return get_object_or_404(Category, slug=category_slug)
+
+    def get_queryset(self, obj):
+        return Post.published.filter(category=obj)
+
+    def title(self, obj):
+        return f"Мой Блог - {obj.name}"
+
+    def description(self, obj):
+        return f"Последние посты в категории «{obj.name}»"
+
+    def link(self, obj):
+        return obj.get_absolute_url()
+
+
+class TagPostsFeed(LatestPostsFeed):
+    def get_object(self, request, tag_slug):
+        return get_object_or_404(Tag, slug=tag_slug)
+
+    def get_queryset(self, obj):
+        return Post.published.filter(tags=obj)
+
+    def title(self, obj):
+        return f"Мой Блог - Тег: {obj.name}"
+
+    def description(self, obj):
+        return f"Последние посты с тегом «{obj.name}»"
+
+    def link(self, obj):
+        return obj.get_absolute_url()
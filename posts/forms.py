@@ -4,8 +4,9 @@ from .models import Comment, Subscription, Post
 class CommentForm(forms.ModelForm):
     class Meta:
         model = Comment
-        fields = ['author_name', 'author_email', 'author_website', 'content']
+        fields = ['author_name', 'author_email', 'author_website', 'content', 'parent']
         widgets = {
+            'parent': forms.HiddenInput(),
             'author_name': forms.TextInput(attrs={
                 'class': 'form-control',
                 'placeholder': 'Ваше имя'
@@ -25,6 +26,18 @@ class CommentForm(forms.ModelForm):
             })
         }
 
+    def __init__(self, *args, post=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.post = post
+
+    def clean_parent(self):
+        parent = self.cleaned_data.get('parent')
+        if parent and (self.post is None or parent.post_id != self.post.pk or not parent.approved):
+            raise forms.ValidationError('Нельзя ответить на этот комментарий.')
+        if parent and parent.depth >= Comment.MAX_DEPTH:
+            raise forms.ValidationError('Слишком глубокая ветка: ответьте на комментарий выше.')
+        return parent
+
 class SubscriptionForm(forms.ModelForm):
     class Meta:
         model = Subscription
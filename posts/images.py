@@ -0,0 +1,88 @@
+import hashlib
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+DERIVED_DIR = 'posts/images/derived'
+
+# Формат -> (расширение, MIME-тип, параметры сохранения Pillow)
+IMAGE_FORMATS = {
+    'webp': ('webp', 'image/webp', {'format': 'WEBP', 'quality': 80, 'method': 4}),
+    'jpeg': ('jpg', 'image/jpeg', {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def image_widths():
+    return sorted(getattr(settings, 'IMAGE_WIDTHS', (320, 640, 960, 1280)))
+
+
+def content_hash(file):
+    digest = hashlib.sha256()
+    for chunk in file.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+def variant_widths(original_width):
+    widths = image_widths()
+    # Исходник не увеличивается: самая крупная версия — не шире оригинала
+    largest = min(original_width, widths[-1])
+    return [width for width in widths if width < largest] + [largest]
+
+
+def prepare(image, fmt):
+    has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+    if fmt == 'webp':
+        return image.convert('RGBA' if has_alpha else 'RGB')
+    if has_alpha:
+        # У JPEG нет прозрачности: подкладываем белый фон
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image.convert('RGBA'), mask=image.convert('RGBA').getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def generate_variants(field_file):
+    """
+    Создаёт уменьшенные копии изображения в WebP и JPEG. Имена производных
+    файлов строятся от имени исходника, которое уже содержит хеш содержимого,
+    поэтому повторный запуск не пишет файлы заново.
+    """
+    storage = field_file.storage
+    stem = os.path.splitext(os.path.basename(field_file.name))[0]
+    with field_file.open('rb'):
+        image = ImageOps.exif_transpose(Image.open(field_file))
+        image.load()
+
+    variants = {'width': image.width, 'height': image.height}
+    for fmt, (ext, _, options) in IMAGE_FORMATS.items():
+        variants[fmt] = []
+        prepared = None
+        for width in variant_widths(image.width):
+            name = f'{DERIVED_DIR}/{stem}-{width}w.{ext}'
+            if not storage.exists(name):
+                if prepared is None:
+                    prepared = prepare(image, fmt)
+                resized = prepared
+                if width < image.width:
+                    height = round(image.height * width / image.width)
+                    resized = resized.resize((width, height), Image.LANCZOS)
+                buffer = BytesIO()
+                resized.save(buffer, **options)
+                name = storage.save(name, ContentFile(buffer.getvalue()))
+            variants[fmt].append([width, name])
+    return variants
+
+
+def srcset(variants, fmt, url):
+    return ', '.join(f'{url(name)} {width}w' for width, name in variants.get(fmt, []))
+
+
+def variant_urls(variants, url):
+    return {
+        fmt: [{'width': width, 'url': url(name)} for width, name in variants.get(fmt, [])]
+        for fmt in IMAGE_FORMATS if variants.get(fmt)
+    }
@@ -0,0 +1,229 @@
+import json
+import re
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.text import slugify
+
+from . import search
+from .models import Category, Post, Tag
+from .navigation import invalidate_navigation
+from .queue import enqueue
+from .rendering import render_post
+
+IMPORT_CHUNK_SIZE = 500
+
+IMPORT_FIELDS = ('title', 'content', 'excerpt', 'image', 'image_alt', 'status',
+                 'is_featured', 'allow_comments', 'views_count')
+
+SLUG_MAX_LENGTH = Post._meta.get_field('slug').max_length
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.errors = []
+
+    def add_error(self, line, message):
+        self.errors.append({'line': line, 'error': message})
+
+
+def parse_lines(lines, result):
+    for number, line in enumerate(lines, start=1):
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as exc:
+            result.add_error(number, f'Неверный JSON: {exc}')
+            continue
+        if not isinstance(record, dict):
+            result.add_error(number, 'Ожидается JSON-объект')
+            continue
+        yield number, record
+
+
+def parse_ref(value):
+    """Категория или тег: строка-slug либо объект {"slug", "name"}."""
+    if isinstance(value, dict):
+        name = str(value.get('name') or value.get('slug') or '').strip()
+        slug = value.get('slug') or slugify(name)
+    else:
+        name = str(value).strip()
+        slug = slugify(name)
+    if not slug:
+        raise ValueError(f'Пустой slug: {value!r}')
+    return slug, name or slug
+
+
+def clean_field(name, value):
+    """Приводит значение к типу поля модели и проверяет его валидаторами поля."""
+    field = Post._meta.get_field(name)
+    if name == 'image':
+        # Путь к уже загруженному файлу: валидаторы ImageField ждут объект файла
+        value = str(value)
+        if len(value) > field.max_length:
+            raise ValueError(f'{name}: слишком длинное значение')
+        return value
+    try:
+        value = field.clean(value, None)
+    except ValidationError as exc:
+        raise ValueError(f'{name}: {"; ".join(exc.messages)}')
+    # SQLite не задаёт полям границ, и валидатор минимума не добавляется
+    if field.get_internal_type().startswith('Positive') and value < 0:
+        raise ValueError(f'{name}: значение не может быть отрицательным')
+    return value
+
+
+def clean_record(record):
+    if not str(record.get('title') or '').strip() or not str(record.get('content') or '').strip():
+        raise ValueError('Поля title и content обязательны')
+    data = {field: clean_field(field, record[field]) for field in IMPORT_FIELDS if record.get(field) is not None}
+
+    if record.get('pub_date'):
+        pub_date = parse_datetime(str(record['pub_date']))
+        if pub_date is None:
+            raise ValueError(f'Неверная pub_date: {record["pub_date"]}')
+        data['pub_date'] = timezone.make_aware(pub_date) if timezone.is_naive(pub_date) else pub_date
+
+    tags = record.get('tags') or []
+    if isinstance(tags, str):
+        tags = [tag for tag in tags.split(',') if tag.strip()]
+    return {
+        'fields': data,
+        'slug': record.get('slug') or '',
+        'author': str(record['author']) if record.get('author') else None,
+        'category': parse_ref(record['category']) if record.get('category') else None,
+        'tags': [parse_ref(tag) for tag in tags],
+    }
+
+
+def resolve_refs(model, refs):
+    """
+    slug -> объект: один запрос на пачку, недостающие создаются одним
+    bulk_create. У тегов уникально и название: тег с тем же названием под
+    другим slug берётся существующий, а не создаётся второй.
+    """
+    by_name = model._meta.get_field('name').unique
+    lookup = Q(slug__in=refs) | Q(name__in=refs.values()) if by_name else Q(slug__in=refs)
+    existing = list(model.objects.filter(lookup))
+    slugs = {obj.slug: obj for obj in existing}
+    names = {obj.name: obj for obj in existing} if by_name else {}
+
+    objects = {}
+    missing = {}
+    for slug, name in refs.items():
+        obj = slugs.get(slug) or names.get(name)
+        if obj is not None:
+            objects[slug] = obj
+        elif by_name and name in missing:
+            missing[name].append(slug)
+        else:
+            missing[name if by_name else slug] = [slug]
+    if missing:
+        created = [model(slug=aliases[0], name=refs[aliases[0]]) for aliases in missing.values()]
+        model.objects.bulk_create(created)
+        created = {obj.slug: obj for obj in model.objects.filter(slug__in=[obj.slug for obj in created])}
+        for aliases in missing.values():
+            objects.update((slug, created[aliases[0]]) for slug in aliases)
+    return objects
+
+
+def unique_slugs(bases):
+    """
+    Подбирает свободные slug для пачки одним запросом: читаются все занятые
+    slug вида base и base-N, дальше суффиксы назначаются в памяти.
+    """
+    bases = [(slugify(base) or 'post')[:SLUG_MAX_LENGTH - 6] for base in bases]
+    pattern = '^(%s)(-[0-9]+)?$' % '|'.join(re.escape(base) for base in set(bases))
+    taken = set(Post.objects.filter(slug__regex=pattern).values_list('slug', flat=True))
+
+    counters = {}
+    slugs = []
+    for base in bases:
+        slug = base
+        while slug in taken:
+            counters[base] = counters.get(base, 1) + 1
+            slug = f'{base}-{counters[base]}'
+        taken.add(slug)
+        slugs.append(slug)
+    return slugs
+
+
+@transaction.atomic
+def import_chunk(records, default_author=None):
+    categories = resolve_refs(Category, {
+        record['category'][0]: record['category'][1] for record in records if record['category']
+    })
+    tags = resolve_refs(Tag, {slug: name for record in records for slug, name in record['tags']})
+    usernames = {record['author'] for record in records if record['author']}
+    authors = {user.username: user for user in User.objects.filter(username__in=usernames)}
+
+    slugs = unique_slugs([record['slug'] or record['fields']['title'] for record in records])
+    posts = []
+    for record, slug in zip(records, slugs):
+        post = Post(slug=slug, **record['fields'])
+        post.author = authors.get(record['author'], default_author)
+        post.category = categories[record['category'][0]] if record['category'] else None
+        # Производные поля считаются так же, как в Post.save()
+        render_post(post)
+        if not post.excerpt:
+            post.excerpt = post.content[:497] + '...' if len(post.content) > 500 else post.content
+        posts.append(post)
+
+    # bulk_create не вызывает сигналы: поисковый индекс обновляется здесь,
+    # а рассылка о старых постах при импорте не нужна
+    Post.objects.bulk_create(posts)
+    links = []
+    documents = []
+    for post, record in zip(posts, records):
+        post_tags = [tags[slug] for slug, _ in record['tags']]
+        links.extend(Post.tags.through(post_id=post.pk, tag_id=tag.pk) for tag in post_tags)
+        documents.append((post, [tag.name for tag in post_tags]))
+    Post.tags.through.objects.bulk_create(links, ignore_conflicts=True)
+    search.get_backend().index_many(documents)
+    transaction.on_commit(invalidate_navigation)
+    enqueue('related.update', {'post_ids': [post.pk for post in posts]})
+    return posts
+
+
+def import_records(numbered, default_author, result):
+    """
+    Пишет пачку; если база её отвергла, пачка откатывается и записи
+    повторяются по одной, чтобы пропустить только ошибочные.
+    """
+    try:
+        result.created += len(import_chunk([record for _, record in numbered], default_author))
+        return
+    except DatabaseError as exc:
+        if len(numbered) == 1:
+            result.add_error(numbered[0][0], f'Ошибка базы данных: {exc}')
+            return
+    for item in numbered:
+        import_records([item], default_author, result)
+
+
+def import_posts(lines, chunk_size=IMPORT_CHUNK_SIZE, default_author=None):
+    """Импортирует посты из NDJSON. Каждая пачка пишется в своей транзакции."""
+    result = ImportResult()
+    chunk = []
+    for number, record in parse_lines(lines, result):
+        try:
+            chunk.append((number, clean_record(record)))
+        except (TypeError, ValueError) as exc:
+            result.add_error(number, str(exc))
+            continue
+        if len(chunk) >= chunk_size:
+            import_records(chunk, default_author, result)
+            chunk = []
+    if chunk:
+        import_records(chunk, default_author, result)
+    result.errors.sort(key=lambda error: error['line'])
+    return result
@@ -0,0 +1,180 @@
+import math
+import random
+import re
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+IN_LIST_RE = re.compile(r'\bIN \((?:%s|\?)(?:, (?:%s|\?))*\)', re.IGNORECASE)
+
+
+def fingerprint(sql):
+    """SQL без литералов и с одинаковыми IN (...): одинаковые запросы с разными параметрами совпадают."""
+    sql = STRING_RE.sub('?', sql)
+    sql = NUMBER_RE.sub('?', sql)
+    return IN_LIST_RE.sub('IN (...)', sql)
+
+
+class QueryRecorder:
+    """Обёртка connection.execute_wrapper: число запросов, время в БД и повторы."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    def duplicates(self):
+        return [(sql, count) for sql, count in self.fingerprints.most_common() if count > 1]
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[max(0, math.ceil(fraction * len(values)) - 1)]
+
+
+class RequestStats:
+    """Скользящее окно последних замеров по имени URL; хранится в памяти процесса."""
+
+    def __init__(self, window=None):
+        self.window = window
+        self._samples = defaultdict(self._new_window)
+        self._lock = threading.Lock()
+
+    def _new_window(self):
+        return deque(maxlen=self.window or getattr(settings, 'INSTRUMENTATION_WINDOW', 1000))
+
+    def add(self, name, total, db, queries, render, duplicates):
+        with self._lock:
+            self._samples[name].append((total, db, queries, render, tuple(duplicates)))
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+
+    def snapshot(self):
+        with self._lock:
+            samples = {name: list(window) for name, window in self._samples.items()}
+
+        report = {}
+        for name, rows in sorted(samples.items()):
+            totals, dbs, queries, renders, duplicates = zip(*rows)
+            repeated = Counter()
+            for request_duplicates in duplicates:
+                repeated.update(dict(request_duplicates))
+            report[name] = {
+                'requests': len(rows),
+                'total_ms': {'p50': percentile(totals, 0.5), 'p95': percentile(totals, 0.95)},
+                'db_ms': {'p50': percentile(dbs, 0.5), 'p95': percentile(dbs, 0.95)},
+                'render_ms': {'p50': percentile(renders, 0.5), 'p95': percentile(renders, 0.95)},
+                'queries': {'p50': percentile(queries, 0.5), 'p95': percentile(queries, 0.95),
+                            'max': max(queries)},
+                'duplicate_queries': [
+                    {'sql': sql, 'count': count} for sql, count in repeated.most_common(5)
+                ],
+            }
+        return report
+
+
+request_stats = RequestStats()
+
+
+class InstrumentationMiddleware:
+    """
+    Замеряет выборку запросов: число SQL-запросов, время в БД, повторяющиеся
+    запросы и время рендеринга. Результат уходит в заголовок Server-Timing
+    и в request_stats (GET /api/v1/stats/requests/).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # Под ASGI с асинхронными представлениями middleware не должен заставлять цепочку уходить в поток
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def sampled(self):
+        if not getattr(settings, 'INSTRUMENTATION_ENABLED', True):
+            return False
+        return random.random() < getattr(settings, 'INSTRUMENTATION_SAMPLE_RATE', 0.1)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.sampled():
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        request._render_time = 0.0
+        started = time.perf_counter()
+        with self.recording(recorder):
+            response = self.get_response(request)
+        return self.finish(request, response, recorder, started)
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+
+        recorder = QueryRecorder()
+        request._render_time = 0.0
+        started = time.perf_counter()
+        # Соединения с БД принадлежат потоку, а асинхронный ORM ходит в базу через поток
+        # sync_to_async, общий для всего запроса: обёртка ставится и снимается в нём
+        recording = await sync_to_async(self.recording)(recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(recording.close)()
+        return self.finish(request, response, recorder, started)
+
+    def recording(self, recorder):
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+        return stack
+
+    def finish(self, request, response, recorder, started):
+        total = (time.perf_counter() - started) * 1000
+        db = recorder.duration * 1000
+        render = request._render_time * 1000
+        duplicates = recorder.duplicates()
+        response.headers['Server-Timing'] = ', '.join([
+            f'db;dur={db:.1f};desc="{recorder.count} queries"',
+            f'render;dur={render:.1f}',
+            f'dup;desc="{sum(count - 1 for _, count in duplicates)} duplicate queries"',
+            f'total;dur={total:.1f}',
+        ])
+
+        match = request.resolver_match
+        name = match.view_name if match else '<unresolved>'
+        request_stats.add(name, total, db, recorder.count, render, duplicates)
+        return response
+
+    def process_template_response(self, request, response):
+        if hasattr(request, '_render_time'):
+            started = time.perf_counter()
+
+            def finished(response):
+                request._render_time += time.perf_counter() - started
+
+            response.add_post_render_callback(finished)
+        return response
@@ -0,0 +1,143 @@
+import json
+import random
+import threading
+import time
+from contextlib import nullcontext
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, close_old_connections, connection, connections, transaction
+from django.db.models import F
+from django.test.utils import override_settings
+
+from posts.db import replica_configured, replica_reads
+from posts.instrumentation import percentile
+from posts.models import Comment, Post
+from posts.ranking import record_activity
+
+# Настройки «как раньше»: журнал отката, полная синхронизация, без mmap и новое соединение на операцию
+PROFILES = {
+    'baseline': ({'SQLITE_JOURNAL_MODE': 'DELETE', 'SQLITE_SYNCHRONOUS': 'FULL', 'SQLITE_MMAP_SIZE': 0}, False),
+    'tuned': ({'SQLITE_JOURNAL_MODE': 'WAL'}, True),
+}
+
+
+def read_list(rng, post_ids):
+    return list(Post.published.select_related('category').order_by('-pub_date', '-id')[:10])
+
+
+def read_detail(rng, post_ids):
+    pk = rng.choice(post_ids)
+    post = Post.objects.select_related('author', 'category').get(pk=pk)
+    return post, Comment.objects.filter(post_id=pk, approved=True).count()
+
+
+def write_view(rng, post_ids):
+    # Как сброс буфера просмотров: счётчик поста и часовая корзина рейтинга в одной транзакции
+    pk = rng.choice(post_ids)
+    with transaction.atomic():
+        Post.objects.filter(pk=pk).update(views_count=F('views_count') + 1)
+        record_activity(views={pk: 1})
+
+
+OPERATIONS = {'list': read_list, 'detail': read_detail, 'write': write_view}
+
+
+class Command(BaseCommand):
+    help = ('Пропускная способность базы при одновременном чтении (список, пост) и записи (просмотры): '
+            'исходные настройки SQLite против WAL/PRAGMA и постоянных соединений')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profiles', default=','.join(PROFILES))
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument('--duration', type=float, default=10, help='Секунд на профиль')
+        parser.add_argument('--replica', action='store_true', help='Читать с реплики (нужен DATABASE_REPLICA_NAME)')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--save', help='Записать результаты в JSON')
+
+    def handle(self, *args, **options):
+        profiles = [name.strip() for name in options['profiles'].split(',') if name.strip()]
+        unknown = [name for name in profiles if name not in PROFILES]
+        if unknown:
+            raise CommandError(f'Неизвестные профили: {", ".join(unknown)}')
+        if options['replica'] and not replica_configured():
+            raise CommandError('Реплика не настроена: задайте DATABASE_REPLICA_NAME')
+        post_ids = list(Post.published.values_list('pk', flat=True))
+        if not post_ids:
+            raise CommandError('Нет опубликованных постов: сначала запустите seed_data')
+
+        results = {}
+        self.stdout.write(f'{"профиль":<10}{"операция":<10}{"оп/с":>9}{"p50":>9}{"p95":>9}{"ошибок":>8}')
+        for name in profiles:
+            overrides, persistent = PROFILES[name]
+            if connection.vendor != 'sqlite':
+                overrides = {}
+            with override_settings(**overrides):
+                # Режим журнала меняется только без других соединений
+                connections.close_all()
+                results[name] = self.run_profile(post_ids, persistent, options)
+                connections.close_all()
+            for operation, row in results[name].items():
+                p50, p95 = ('-' if row[key] is None else row[key] for key in ('p50_ms', 'p95_ms'))
+                self.stdout.write(f'{name:<10}{operation:<10}{row["ops_per_second"]:>9}'
+                                  f'{p50:>9}{p95:>9}{row["errors"]:>8}')
+
+        if options['save']:
+            with open(options['save'], 'w', encoding='utf-8') as fh:
+                json.dump(results, fh, ensure_ascii=False, indent=2, sort_keys=True)
+                fh.write('\n')
+            self.stdout.write(self.style.SUCCESS(f'Результаты записаны в {options["save"]}'))
+
+    def run_profile(self, post_ids, persistent, options):
+        deadline = time.monotonic() + options['duration']
+        samples = {'list': [], 'detail': [], 'write': []}
+        errors = {operation: 0 for operation in samples}
+        lock = threading.Lock()
+
+        def worker(seed, operations):
+            rng = random.Random(seed)
+            reads = replica_reads() if options['replica'] else nullcontext()
+            with reads:
+                while time.monotonic() < deadline:
+                    operation = rng.choice(operations)
+                    started = time.perf_counter()
+                    try:
+                        OPERATIONS[operation](rng, post_ids)
+                    except OperationalError:
+                        with lock:
+                            errors[operation] += 1
+                    else:
+                        with lock:
+                            samples[operation].append((time.perf_counter() - started) * 1000)
+                    finally:
+                        # Конец «запроса»: постоянное соединение остаётся, иначе закрывается
+                        if persistent:
+                            close_old_connections()
+                        else:
+                            connection.close()
+            connection.close()
+
+        threads = [
+            threading.Thread(target=worker, args=(options['seed'] + i, ['list', 'detail']))
+            for i in range(options['readers'])
+        ] + [
+            threading.Thread(target=worker, args=(options['seed'] + 1000 + i, ['write']))
+            for i in range(options['writers'])
+        ]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        duration = time.monotonic() - started
+
+        return {
+            operation: {
+                'operations': len(latencies),
+                'ops_per_second': round(len(latencies) / duration, 1),
+                'p50_ms': round(percentile(latencies, 0.5), 2) if latencies else None,
+                'p95_ms': round(percentile(latencies, 0.95), 2) if latencies else None,
+                'errors': errors[operation],
+            }
+            for operation, latencies in samples.items()
+        }
@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from posts.models import Post
+from posts.serializers import Fieldset, PostListSerializer, PostRowSerializer
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает скорость сериализации списка постов: ModelSerializer и строки values()'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--fields', default=None, help='Набор полей, как в ?fields=')
+        parser.add_argument('--expand', default=None, help='Раскрываемые связи, как в ?expand=')
+
+    def handle(self, *args, **options):
+        params = {key: options[key] for key in ('fields', 'expand') if options[key] is not None}
+        request = Request(APIRequestFactory().get('/api/v1/posts/', params))
+        fieldset = Fieldset.from_request(request, PostListSerializer.Meta.fields)
+        queryset = Post.objects.order_by('-pub_date', '-id')
+        rows = options['rows']
+        if not queryset[:rows].exists():
+            raise CommandError('Нет постов для замера')
+
+        def serializer_path():
+            posts = queryset.select_related('author', 'category').prefetch_related('tags')[:rows]
+            return PostListSerializer(posts, many=True, fieldset=fieldset, context={'request': request}).data
+
+        def values_path():
+            serializer = PostRowSerializer(fieldset, request=request)
+            return serializer.serialize(serializer.values(queryset)[:rows])
+
+        before = self.measure(serializer_path, options['repeat'])
+        after = self.measure(values_path, options['repeat'])
+        self.stdout.write(f'ModelSerializer: {before:,.0f} строк/с')
+        self.stdout.write(f'values():        {after:,.0f} строк/с')
+        self.stdout.write(self.style.SUCCESS(f'Ускорение: {after / before:.1f}x'))
+
+    def measure(self, func, repeat):
+        # Лучший из повторов: меньше всего шума от GC и планировщика
+        best = None
+        count = 0
+        for _ in range(repeat):
+            started = time.perf_counter()
+            count = len(func())
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return count / best
@@ -0,0 +1,120 @@
+import importlib.util
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.replay import HTTPTransport, Replay, load_traffic
+
+# Один процесс на сервер: сравнивается обслуживание конкурентных запросов, а не число воркеров
+SERVERS = {
+    'wsgi': (
+        ['-m', 'gunicorn', 'Blog.wsgi:application', '--workers', '1', '--threads', '{threads}',
+         '--bind', '127.0.0.1:{port}', '--log-level', 'warning'],
+        {'ASYNC_VIEWS': 'False'},
+    ),
+    'asgi': (
+        ['-m', 'uvicorn', 'Blog.asgi:application', '--port', '{port}', '--log-level', 'warning', '--no-access-log'],
+        {'ASYNC_VIEWS': 'False'},
+    ),
+    'asgi-async': (
+        ['-m', 'uvicorn', 'Blog.asgi:application', '--port', '{port}', '--log-level', 'warning', '--no-access-log'],
+        {'ASYNC_VIEWS': 'True'},
+    ),
+}
+
+
+def wait_for_port(port, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            return False
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает WSGI (gunicorn, потоки), ASGI с синхронными представлениями и ASGI '
+            'с ASYNC_VIEWS на смеси запросов чтения при разной конкурентности')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--traffic', default=str(settings.BASE_DIR / 'benchmarks' / 'traffic.jsonl'))
+        parser.add_argument('--servers', default=','.join(SERVERS))
+        parser.add_argument('--concurrency', default='1,8,32', help='Уровни конкурентности через запятую')
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--warmup', type=int, default=100)
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--save', help='Записать результаты в JSON')
+
+    def handle(self, *args, **options):
+        servers = [name.strip() for name in options['servers'].split(',') if name.strip()]
+        unknown = [name for name in servers if name not in SERVERS]
+        if unknown:
+            raise CommandError(f'Неизвестные серверы: {", ".join(unknown)}')
+        # gunicorn — необязательная зависимость: без него сервер пропускается
+        missing = [name for name in servers if importlib.util.find_spec(SERVERS[name][0][1]) is None]
+        for name in missing:
+            self.stderr.write(self.style.WARNING(f'Пропущен {name}: не установлен пакет {SERVERS[name][0][1]}'))
+        servers = [name for name in servers if name not in missing]
+        if not servers:
+            raise CommandError('Нет доступных серверов')
+        levels = [int(level) for level in options['concurrency'].split(',')]
+        traffic = load_traffic(options['traffic'])
+
+        results = {}
+        self.stdout.write(f'{"сервер":<12}{"потоков":>9}{"запросов/с":>12}{"p50":>9}{"p95":>9}{"5xx":>6}')
+        for name in servers:
+            results[name] = {}
+            with self.server(name, options['port'], max(levels)) as base_url:
+                for level in levels:
+                    replay = Replay(traffic, HTTPTransport(base_url), concurrency=level, seed=options['seed'])
+                    report = replay.run(options['requests'], warmup=options['warmup'])
+                    results[name][level] = report
+                    errors = sum(endpoint['errors'] for endpoint in report['endpoints'].values())
+                    self.stdout.write(f'{name:<12}{level:>9}{report["throughput_rps"]:>12}'
+                                      f'{report["p50_ms"]:>9}{report["p95_ms"]:>9}{errors:>6}')
+
+        if options['save']:
+            with open(options['save'], 'w', encoding='utf-8') as fh:
+                json.dump(results, fh, ensure_ascii=False, indent=2, sort_keys=True)
+                fh.write('\n')
+            self.stdout.write(self.style.SUCCESS(f'Результаты записаны в {options["save"]}'))
+
+    def server(self, name, port, threads):
+        args, env = SERVERS[name]
+        command = [sys.executable] + [arg.format(port=port, threads=threads) for arg in args]
+        # Настройки (DATABASE_NAME и прочие) наследуются из окружения команды
+        environ = dict(os.environ, DEBUG='False', **env)
+        return ServerProcess(command, environ, port, settings.BASE_DIR)
+
+
+class ServerProcess:
+    def __init__(self, command, env, port, cwd):
+        self.command = command
+        self.env = env
+        self.port = port
+        self.cwd = cwd
+
+    def __enter__(self):
+        self.process = subprocess.Popen(self.command, env=self.env, cwd=self.cwd)
+        if not wait_for_port(self.port, self.process):
+            self.process.kill()
+            raise CommandError(f'Сервер не запустился: {" ".join(self.command)}')
+        return f'http://127.0.0.1:{self.port}'
+
+    def __exit__(self, *exc_info):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
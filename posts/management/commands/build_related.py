@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.related import rebuild_related
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает похожие посты (TF-IDF текста и общие теги) для всех опубликованных постов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=None, help='Соседей на пост (по умолчанию RELATED_POSTS_COUNT)')
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = rebuild_related(limit=options['top'], chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Похожие посты пересчитаны для {count} постов за {time.perf_counter() - started:.1f} с'
+        ))
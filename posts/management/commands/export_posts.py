@@ -0,0 +1,49 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.export import (
+    EXPORT_CHUNK_SIZE, FORMATS, RESOURCES, encode_stream, export_lines, gzip_stream, parse_since
+)
+
+
+class Command(BaseCommand):
+    help = 'Потоково выгружает посты или комментарии в NDJSON/CSV (для бэкапов и аналитики)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--resource', choices=sorted(RESOURCES), default='posts')
+        parser.add_argument('--format', dest='export_format', choices=sorted(FORMATS), default='ndjson')
+        parser.add_argument('--since', help='Только записи, изменённые начиная с этой даты (ISO 8601)')
+        parser.add_argument('--output', default='-', help='Файл выгрузки; "-" — stdout, .gz — со сжатием')
+        parser.add_argument('--gzip', action='store_true')
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = parse_since(options['since'])
+            except ValueError as exc:
+                raise CommandError(str(exc))
+
+        output = options['output']
+        stream = encode_stream(export_lines(
+            options['resource'], options['export_format'], since=since, chunk_size=options['chunk_size']
+        ))
+        if options['gzip'] or output.endswith('.gz'):
+            stream = gzip_stream(stream)
+
+        if output == '-':
+            self.write(sys.stdout.buffer, stream)
+            sys.stdout.buffer.flush()
+        else:
+            with open(output, 'wb') as fh:
+                size = self.write(fh, stream)
+            self.stderr.write(self.style.SUCCESS(f'Выгружено в {output}: {size} байт'))
+
+    def write(self, fh, stream):
+        size = 0
+        for block in stream:
+            fh.write(block)
+            size += len(block)
+        return size
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from PIL import Image
+
+from posts.images import generate_variants
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Создаёт уменьшенные копии изображений постов (WebP/JPEG) для srcset'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Пересоздать копии и для уже обработанных постов')
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').exclude(image__isnull=True).only('id', 'image').order_by('pk')
+        if not options['all']:
+            posts = posts.filter(image_variants={})
+
+        total = 0
+        for post in posts.iterator(chunk_size=100):
+            try:
+                variants = generate_variants(post.image)
+            except (OSError, ValueError, Image.DecompressionBombError) as exc:
+                self.stderr.write(f'Пост {post.pk}: {exc}')
+                continue
+            Post.objects.filter(pk=post.pk, image=post.image.name).update(
+                image_variants=variants, updated_at=timezone.now()
+            )
+            total += 1
+        self.stdout.write(self.style.SUCCESS(f'Обработано изображений: {total}'))
@@ -0,0 +1,36 @@
+import gzip
+import sys
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.importer import IMPORT_CHUNK_SIZE, import_posts
+
+
+class Command(BaseCommand):
+    help = 'Импортирует посты из NDJSON (формат export_posts); каждая пачка — отдельная транзакция'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл NDJSON; "-" — stdin, .gz читается со сжатием')
+        parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE)
+        parser.add_argument('--author', help='Автор для записей без известного author')
+
+    def handle(self, *args, **options):
+        author = None
+        if options['author']:
+            try:
+                author = User.objects.get(username=options['author'])
+            except User.DoesNotExist:
+                raise CommandError(f'Пользователь {options["author"]} не найден')
+
+        path = options['path']
+        if path == '-':
+            result = import_posts(sys.stdin, options['chunk_size'], author)
+        else:
+            opener = gzip.open if path.endswith('.gz') else open
+            with opener(path, 'rt', encoding='utf-8') as fh:
+                result = import_posts(fh, options['chunk_size'], author)
+
+        for error in result.errors:
+            self.stderr.write(f'Строка {error["line"]}: {error["error"]}')
+        self.stdout.write(self.style.SUCCESS(f'Импортировано постов: {result.created}, ошибок: {len(result.errors)}'))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from posts.models import Like, Post
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает Post.likes_count по таблице лайков'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        likes = (
+            Like.objects.filter(post=OuterRef('pk'))
+            .order_by()
+            .values('post')
+            .annotate(total=Count('pk'))
+            .values('total')
+        )
+        actual = Coalesce(Subquery(likes, output_field=IntegerField()), 0)
+
+        last_pk = 0
+        updated = 0
+        while True:
+            chunk = list(
+                Post.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:chunk_size]
+            )
+            if not chunk:
+                break
+            with transaction.atomic():
+                updated += Post.objects.filter(pk__in=chunk).update(likes_count=actual)
+            last_pk = chunk[-1]
+
+        self.stdout.write(self.style.SUCCESS(f'Пересчитано постов: {updated}'))
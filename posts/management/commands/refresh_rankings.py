@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.ranking import refresh_rankings, rollup_activity
+
+
+class Command(BaseCommand):
+    help = ('Сворачивает часовую активность постов в суточную и пересчитывает топы «популярное» '
+            'и «самое читаемое»; обычно это делает периодическая задача ranking.refresh')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=None, help='Постов в списке (по умолчанию RANKING_SIZE)')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        rolled = rollup_activity()
+        rows = refresh_rankings(size=options['size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Свёрнуто суточных корзин: {rolled}, строк в топах: {rows} за {time.perf_counter() - started:.1f} с'
+        ))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.cache import fragment_cache
+from posts.models import Post
+from posts.rendering import render_post, RENDERED_FIELDS
+
+
+class Command(BaseCommand):
+    help = 'Перерендеривает HTML содержания и краткого описания всех постов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        posts = Post.objects.only('id', 'content', 'excerpt').order_by('pk')
+
+        batch = []
+        total = 0
+        for post in posts.iterator(chunk_size=chunk_size):
+            batch.append(render_post(post))
+            if len(batch) >= chunk_size:
+                total += self.save(batch)
+                batch = []
+        if batch:
+            total += self.save(batch)
+
+        # bulk_update не меняет updated_at, поэтому сбрасываем кеш фрагментов явно
+        fragment_cache.invalidate()
+        self.stdout.write(self.style.SUCCESS(f'Перерендерено постов: {total}'))
+
+    def save(self, posts):
+        with transaction.atomic():
+            Post.objects.bulk_update(posts, RENDERED_FIELDS)
+        return len(posts)
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.prerender import PageRenderer
+
+
+class Command(BaseCommand):
+    help = ('Рендерит страницы и ленты для анонимного чтения в PRERENDER_ROOT (с копиями .gz/.br); '
+            'без путей — полный прогон с удалением исчезнувших страниц')
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*', help='Перерисовать только эти пути, например /post/5/')
+        parser.add_argument('--root', help='Каталог публикации (по умолчанию PRERENDER_ROOT)')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        renderer = PageRenderer(options['root'])
+        if options['paths']:
+            total, removed = len(options['paths']), 0
+            changed = renderer.render_many(options['paths'])
+        else:
+            total, changed, removed = renderer.render_all()
+        self.stdout.write(self.style.SUCCESS(
+            f'Страниц: {total}, изменено: {changed}, удалено: {removed} '
+            f'за {time.perf_counter() - started:.1f} с ({renderer.root})'
+        ))
@@ -0,0 +1,60 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.replay import ClientTransport, HTTPTransport, Replay, compare, load_traffic
+
+
+class Command(BaseCommand):
+    help = 'Прогоняет смесь запросов (benchmarks/traffic.jsonl) и сравнивает результат с базовым JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--traffic', default=str(settings.BASE_DIR / 'benchmarks' / 'traffic.jsonl'))
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--warmup', type=int, default=100)
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--base-url', help='Адрес запущенного сервера; по умолчанию — тестовый клиент в процессе')
+        parser.add_argument('--save', help='Записать отчёт как базовый JSON')
+        parser.add_argument('--compare', help='Базовый JSON для сравнения')
+        parser.add_argument('--tolerance', type=float, default=0.2, help='Допустимый рост p95 (доля)')
+
+    def handle(self, *args, **options):
+        if settings.DEBUG and not options['base_url']:
+            self.stderr.write(self.style.WARNING('DEBUG=True: Django хранит все SQL-запросы, замеры будут завышены'))
+
+        transport = HTTPTransport(options['base_url']) if options['base_url'] else ClientTransport()
+        replay = Replay(load_traffic(options['traffic']), transport,
+                        concurrency=options['concurrency'], seed=options['seed'])
+        try:
+            report = replay.run(options['requests'], warmup=options['warmup'])
+        except LookupError as exc:
+            raise CommandError(str(exc))
+
+        self.stdout.write(f'{report["requests"]} запросов, {report["throughput_rps"]} запросов/с, '
+                          f'потоков: {report["concurrency"]}')
+        self.stdout.write(f'{"эндпоинт":<22}{"n":>6}{"p50":>9}{"p95":>9}{"p99":>9}{"SQL":>7}{"5xx":>5}')
+        for name, row in report['endpoints'].items():
+            self.stdout.write(f'{name:<22}{row["requests"]:>6}{row["p50_ms"]:>9}{row["p95_ms"]:>9}'
+                              f'{row["p99_ms"]:>9}{row["queries"] if row["queries"] is not None else "-":>7}'
+                              f'{row["errors"]:>5}')
+
+        if options['save']:
+            with open(options['save'], 'w', encoding='utf-8') as fh:
+                json.dump(report, fh, ensure_ascii=False, indent=2, sort_keys=True)
+                fh.write('\n')
+            self.stdout.write(self.style.SUCCESS(f'Базовый отчёт записан в {options["save"]}'))
+
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as fh:
+                baseline = json.load(fh)
+            rows, regressions = compare(baseline, report, options['tolerance'])
+            self.stdout.write(f'\n{"эндпоинт":<22}{"p95 было":>10}{"p95 стало":>11}{"SQL было":>10}{"SQL стало":>11}')
+            for name, p95_before, p95_now, queries_before, queries_now, note in rows:
+                self.stdout.write(f'{name:<22}{p95_before if p95_before is not None else "-":>10}{p95_now:>11}'
+                                  f'{queries_before if queries_before is not None else "-":>10}'
+                                  f'{queries_now if queries_now is not None else "-":>11}  {note}')
+            if regressions:
+                raise CommandError(f'Регрессии: {", ".join(regressions)}')
+            self.stdout.write(self.style.SUCCESS('Регрессий нет'))
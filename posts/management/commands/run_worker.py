@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from posts.queue import Worker
+
+
+class Command(BaseCommand):
+    help = 'Обрабатывает фоновые задачи из очереди'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=4)
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--poll-interval', type=float, default=5)
+        parser.add_argument('--once', action='store_true', help='Выйти, когда очередь опустеет')
+
+    def handle(self, *args, **options):
+        worker = Worker(threads=options['threads'], batch_size=options['batch_size'])
+        try:
+            processed = worker.run(poll_interval=options['poll_interval'], once=options['once'])
+        except KeyboardInterrupt:
+            worker.stop()
+            return
+        self.stdout.write(self.style.SUCCESS(f'Обработано задач: {processed}'))
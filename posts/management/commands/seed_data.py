@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from posts.ranking import refresh_rankings
+from posts.seed import Seeder
+
+
+class Command(BaseCommand):
+    help = 'Заполняет базу тестовыми постами, тегами, категориями, ветками комментариев и лайками'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=1000)
+        parser.add_argument('--categories', type=int, default=10)
+        parser.add_argument('--tags', type=int, default=50)
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--comments', type=float, default=8.0, help='Среднее число комментариев на пост')
+        parser.add_argument('--likes', type=float, default=5.0, help='Среднее число лайков на пост')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        seeder = Seeder(
+            seed=options['seed'],
+            categories=options['categories'],
+            tags=options['tags'],
+            users=options['users'],
+            comments_per_post=options['comments'],
+            likes_per_post=options['likes'],
+            chunk_size=options['chunk_size'],
+        )
+        stats = seeder.run(options['posts'])
+        refresh_rankings()
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано постов: {stats["posts"]}, комментариев: {stats["comments"]}, лайков: {stats["likes"]}'
+        ))
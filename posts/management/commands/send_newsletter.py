@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.models import Post
+from posts.newsletter import send_newsletter
+
+
+class Command(BaseCommand):
+    help = 'Рассылает пост подписчикам (прерванная рассылка продолжается с контрольной точки)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('post_id', type=int)
+        parser.add_argument('--batch-size', type=int)
+        parser.add_argument('--workers', type=int)
+
+    def handle(self, *args, **options):
+        try:
+            post = Post.published.get(pk=options['post_id'])
+        except Post.DoesNotExist:
+            raise CommandError('Опубликованный пост не найден')
+
+        delivery = send_newsletter(post, batch_size=options['batch_size'], workers=options['workers'])
+        if delivery is None:
+            self.stdout.write(self.style.WARNING('Рассылка уже выполняется или завершена'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Отправлено писем: {delivery.sent_count}'))
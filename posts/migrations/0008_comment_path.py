@@ -0,0 +1,42 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:47
+
+from django.db import migrations, models
+
+
+def fill_comment_paths(apps, schema_editor):
+    Comment = apps.get_model('posts', 'Comment')
+    parents = dict(Comment.objects.values_list('pk', 'parent_id'))
+    paths = {}
+
+    def build(pk):
+        if pk not in paths:
+            parent_id = parents.get(pk)
+            prefix = build(parent_id) if parent_id in parents else ''
+            paths[pk] = f"{prefix}{pk:010d}/"
+        return paths[pk]
+
+    comments = []
+    for pk in parents:
+        path = build(pk)
+        comments.append(Comment(pk=pk, path=path, depth=path.count('/') - 1))
+    Comment.objects.bulk_update(comments, ['path', 'depth'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0007_post_rendered_content'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='path',
+            field=models.CharField(blank=True, editable=False, max_length=255, verbose_name='Путь в дереве'),
+        ),
+        migrations.RunPython(fill_comment_paths, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'approved', 'path'], name='comment_thread_idx'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.2.7 on 2026-10-18 05:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_related_posts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RankedPost',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('trending', 'Популярное сейчас'), ('popular', 'Самое читаемое')], max_length=10, verbose_name='Список')),
+                ('rank', models.PositiveSmallIntegerField(verbose_name='Позиция')),
+                ('score', models.FloatField(verbose_name='Оценка')),
+                ('computed_at', models.DateTimeField(verbose_name='Дата расчёта')),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='posts.category')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='posts.post')),
+            ],
+            options={
+                'verbose_name': 'Пост в рейтинге',
+                'verbose_name_plural': 'Рейтинги постов',
+                'indexes': [models.Index(fields=['kind', 'category', 'rank'], name='ranked_post_list_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='PostActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('hour', 'Час'), ('day', 'Сутки')], default='hour', max_length=4, verbose_name='Период')),
+                ('started_at', models.DateTimeField(verbose_name='Начало периода')),
+                ('views', models.PositiveIntegerField(default=0, verbose_name='Просмотры')),
+                ('likes', models.IntegerField(default=0, verbose_name='Лайки')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activity', to='posts.post')),
+            ],
+            options={
+                'verbose_name': 'Активность поста',
+                'verbose_name_plural': 'Активность постов',
+                'indexes': [models.Index(fields=['period', 'started_at'], name='post_activity_period_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='postactivity',
+            constraint=models.UniqueConstraint(fields=('post', 'period', 'started_at'), name='post_activity_bucket_uniq'),
+        ),
+    ]
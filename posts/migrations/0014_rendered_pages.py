@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-18 05:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_post_rankings'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RenderedPage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=255, unique=True, verbose_name='Путь')),
+                ('file_name', models.CharField(max_length=20, verbose_name='Имя файла')),
+                ('content_hash', models.CharField(max_length=32, verbose_name='Хеш содержимого')),
+                ('rendered_at', models.DateTimeField(auto_now=True, verbose_name='Дата рендеринга')),
+                ('posts', models.ManyToManyField(blank=True, related_name='+', to='posts.post', verbose_name='Посты на странице')),
+            ],
+            options={
+                'verbose_name': 'Статическая страница',
+                'verbose_name_plural': 'Статические страницы',
+            },
+        ),
+    ]
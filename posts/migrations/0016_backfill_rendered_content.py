@@ -0,0 +1,20 @@
+from django.db import migrations
+
+from posts.rendering import render_post, RENDERED_FIELDS
+
+
+def fill_rendered_content(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    posts = [render_post(post) for post in Post.objects.only('id', 'content', 'excerpt').iterator(chunk_size=500)]
+    Post.objects.bulk_update(posts, RENDERED_FIELDS, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_backfill_likes_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_rendered_content, migrations.RunPython.noop),
+    ]
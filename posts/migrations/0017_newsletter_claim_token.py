@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_backfill_rendered_content'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='newsletterdelivery',
+            name='claim_token',
+            field=models.UUIDField(blank=True, editable=False, null=True, verbose_name='Токен отправителя'),
+        ),
+    ]
@@ -6,6 +6,9 @@ from django.utils.text import slugify
 from django.core.exceptions import ValidationError
 import os
 
+from .images import content_hash
+from .rendering import render_post, RENDERED_FIELDS
+
 
 class TimeStampedModel(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
@@ -33,7 +36,7 @@ class Category(TimeStampedModel):
         return self.name
 
     def get_absolute_url(self):
-        return reverse('category-posts', kwargs={'category_slug': self.slug})
+        return reverse('posts:category-posts', kwargs={'category_slug': self.slug})
 
     def save(self, *args, **kwargs):
         if not self.slug:
@@ -56,7 +59,7 @@ class Tag(TimeStampedModel):
         return self.name
 
     def get_absolute_url(self):
-        return reverse('tag-posts', kwargs={'tag_slug': self.slug})
+        return reverse('posts:tag-posts', kwargs={'tag_slug': self.slug})
 
     def save(self, *args, **kwargs):
         if not self.slug:
@@ -65,11 +68,17 @@ class Tag(TimeStampedModel):
 
 
 def post_image_path(instance, filename):
-    ext = filename.split('.')[-1]
-    filename = f"{slugify(instance.title)}_{instance.pk}.{ext}"
+    ext = filename.split('.')[-1].lower()
+    # Имя по хешу содержимого: у нового поста ещё нет pk
+    filename = f"{slugify(instance.title) or 'image'}_{content_hash(instance.image)}.{ext}"
     return os.path.join('posts/images', filename)
 
 
+class PublishedManager(models.Manager):
+    def get_queryset(self):
+        return super().get_queryset().filter(status=Post.STATUS_PUBLISHED, pub_date__lte=timezone.now())
+
+
 class Post(TimeStampedModel):
     STATUS_DRAFT = 'draft'
     STATUS_PUBLISHED = 'published'
@@ -85,11 +94,16 @@ class Post(TimeStampedModel):
     slug = models.SlugField(max_length=200, unique=True, verbose_name="URL-адрес")
     content = models.TextField(verbose_name="Содержание поста")
     excerpt = models.TextField(max_length=500, blank=True, verbose_name="Краткое описание")
+    content_html = models.TextField(blank=True, editable=False, verbose_name="HTML содержания")
+    excerpt_html = models.TextField(blank=True, editable=False, verbose_name="HTML краткого описания")
+    word_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="Количество слов")
     author = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='posts')
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, related_name='posts')
     tags = models.ManyToManyField(Tag, blank=True, related_name='posts')
     image = models.ImageField(upload_to=post_image_path, blank=True, null=True, verbose_name="Главное изображение")
     image_alt = models.CharField(max_length=200, blank=True, verbose_name="Alt текст изображения")
+    image_variants = models.JSONField(default=dict, blank=True, editable=False,
+                                      verbose_name="Уменьшенные копии изображения")
 
     pub_date = models.DateTimeField(default=timezone.now, verbose_name="Дата публикации")
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_DRAFT)
@@ -100,23 +114,50 @@ class Post(TimeStampedModel):
     likes_count = models.PositiveIntegerField(default=0, verbose_name="Количество лайков")
     reading_time = models.PositiveIntegerField(default=0, verbose_name="Время чтения (минуты)")
 
+    objects = models.Manager()
+    published = PublishedManager()
+
     class Meta:
         verbose_name = "Пост"
         verbose_name_plural = "Посты"
-        ordering = ['-pub_date', '-created_at']
+        ordering = ['-pub_date', '-id']
+        indexes = [
+            models.Index(fields=['status', '-pub_date', '-id'], name='post_status_pub_date_idx'),
+            models.Index(fields=['category', 'status', '-pub_date', '-id'],
+                         name='post_category_pub_date_idx'),
+            models.Index(fields=['is_featured', 'status', '-pub_date', '-id'],
+                         name='post_featured_pub_date_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'status' in field_names:
+            instance._loaded_status = values[field_names.index('status')]
+        if 'image' in field_names:
+            instance._loaded_image = values[field_names.index('image')] or ''
+        return instance
+
+    @property
+    def was_just_published(self):
+        return (self.status == self.STATUS_PUBLISHED and
+                getattr(self, '_loaded_status', None) != self.STATUS_PUBLISHED)
+
     def get_absolute_url(self):
-        return reverse('post-detail', kwargs={'pk': self.pk})
+        return reverse('posts:post-detail', kwargs={'pk': self.pk})
 
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.title)
 
-        word_count = len(self.content.split())
-        self.reading_time = max(1, word_count // 200)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or {'content', 'excerpt'} & set(update_fields):
+            render_post(self)
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | set(RENDERED_FIELDS)
 
         if not self.excerpt and self.content:
             self.excerpt = self.content[:497] + '...' if len(self.content) > 500 else self.content
@@ -129,8 +170,8 @@ class Post(TimeStampedModel):
                 self.pub_date <= timezone.now())
 
     def increment_views(self):
-        self.views_count += 1
-        self.save(update_fields=['views_count'])
+        Post.objects.filter(pk=self.pk).update(views_count=models.F('views_count') + 1)
+        self.refresh_from_db(fields=['views_count'])
 
 
 class Comment(TimeStampedModel):
@@ -148,19 +189,51 @@ class Comment(TimeStampedModel):
     parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True,
                                related_name='replies', verbose_name="Родительский комментарий")
     depth = models.PositiveIntegerField(default=0, verbose_name="Уровень вложенности")
+    path = models.CharField(max_length=255, blank=True, editable=False, verbose_name="Путь в дереве")
+
+    PATH_STEP = 10
+    # Каждый уровень добавляет к пути PATH_STEP цифр и разделитель; глубже путь не помещается в поле
+    MAX_DEPTH = path.max_length // (PATH_STEP + 1) - 1
 
     class Meta:
         verbose_name = "Комментарий"
         verbose_name_plural = "Комментарии"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['post', 'approved', 'path'], name='comment_thread_idx'),
+        ]
 
     def __str__(self):
         return f"Комментарий от {self.author_name} к посту '{self.post.title}'"
 
+    @classmethod
+    def make_path(cls, parent_path, pk):
+        return f"{parent_path}{pk:0{cls.PATH_STEP}d}/"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'approved' in field_names:
+            instance._loaded_approved = values[field_names.index('approved')]
+        return instance
+
+    def get_parent_path(self):
+        if not self.parent_id:
+            return '', -1
+        if Comment.parent.is_cached(self):
+            return self.parent.path, self.parent.depth
+        return Comment.objects.values_list('path', 'depth').get(pk=self.parent_id)
+
     def save(self, *args, **kwargs):
-        if self.parent:
-            self.depth = self.parent.depth + 1
+        parent_path = None
+        if not self.path:
+            parent_path, parent_depth = self.get_parent_path()
+            self.depth = parent_depth + 1
         super().save(*args, **kwargs)
+        if parent_path is not None:
+            # Путь содержит собственный pk, поэтому записывается после вставки
+            self.path = self.make_path(parent_path, self.pk)
+            Comment.objects.filter(pk=self.pk).update(path=self.path)
 
 
 class Subscription(TimeStampedModel):
@@ -187,4 +260,173 @@ class Like(TimeStampedModel):
         unique_together = ['post', 'user']
 
     def __str__(self):
-        return f"Лайк от {self.user.username} к посту '{self.post.title}'"
\ No newline at end of file
+        return f"Лайк от {self.user.username} к посту '{self.post.title}'"
+
+
+class Job(TimeStampedModel):
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'В очереди'),
+        (STATUS_RUNNING, 'Выполняется'),
+        (STATUS_DONE, 'Выполнена'),
+        (STATUS_FAILED, 'Ошибка'),
+    ]
+
+    task = models.CharField(max_length=100, verbose_name="Задача")
+    payload = models.JSONField(default=dict, blank=True, verbose_name="Параметры")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name="Попыток")
+    max_attempts = models.PositiveSmallIntegerField(default=5, verbose_name="Максимум попыток")
+    run_at = models.DateTimeField(default=timezone.now, verbose_name="Запустить после")
+    locked_at = models.DateTimeField(null=True, blank=True, verbose_name="Взята в работу")
+    locked_by = models.CharField(max_length=100, blank=True, verbose_name="Обработчик")
+    last_error = models.TextField(blank=True, verbose_name="Последняя ошибка")
+
+    class Meta:
+        verbose_name = "Фоновая задача"
+        verbose_name_plural = "Фоновые задачи"
+        ordering = ['run_at', 'id']
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='job_status_run_at_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.task} #{self.pk} ({self.status})"
+
+
+class NewsletterDelivery(TimeStampedModel):
+    STATUS_PENDING = 'pending'
+    STATUS_SENDING = 'sending'
+    STATUS_INTERRUPTED = 'interrupted'
+    STATUS_DONE = 'done'
+
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Ожидает'),
+        (STATUS_SENDING, 'Отправляется'),
+        (STATUS_INTERRUPTED, 'Прервана'),
+        (STATUS_DONE, 'Отправлена'),
+    ]
+
+    post = models.OneToOneField(Post, on_delete=models.CASCADE, related_name='newsletter')
+    status = models.CharField(max_length=12, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    last_subscription_id = models.BigIntegerField(default=0, verbose_name="Последний обработанный подписчик")
+    sent_count = models.PositiveIntegerField(default=0, verbose_name="Отправлено писем")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Дата завершения")
+    # Меняется при каждом захвате: отправитель, потерявший рассылку, больше ничего в неё не пишет
+    claim_token = models.UUIDField(null=True, blank=True, editable=False, verbose_name="Токен отправителя")
+
+    class Meta:
+        verbose_name = "Рассылка"
+        verbose_name_plural = "Рассылки"
+
+    def __str__(self):
+        return f"Рассылка поста '{self.post.title}' ({self.status})"
+
+
+class PostTerms(models.Model):
+    """Частоты термов поста для похожих постов: индексы хешей и веса как массивы NumPy в байтах."""
+    post = models.OneToOneField(Post, on_delete=models.CASCADE, primary_key=True, related_name='terms')
+    indices = models.BinaryField(verbose_name="Индексы термов")
+    counts = models.BinaryField(verbose_name="Частоты термов")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
+
+    class Meta:
+        verbose_name = "Термы поста"
+        verbose_name_plural = "Термы постов"
+
+
+class RelatedPost(models.Model):
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='related_links')
+    related = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='+')
+    rank = models.PositiveSmallIntegerField(verbose_name="Позиция")
+    score = models.FloatField(verbose_name="Сходство")
+
+    class Meta:
+        verbose_name = "Похожий пост"
+        verbose_name_plural = "Похожие посты"
+        constraints = [
+            # Индекс (post, rank) обслуживает выборку похожих постов одним запросом
+            models.UniqueConstraint(fields=['post', 'rank'], name='related_post_rank_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.post_id} → {self.related_id} ({self.score:.3f})"
+
+
+class PostActivity(models.Model):
+    """Просмотры и лайки поста за час или сутки — скользящее окно для рейтингов."""
+    PERIOD_HOUR = 'hour'
+    PERIOD_DAY = 'day'
+
+    PERIOD_CHOICES = [
+        (PERIOD_HOUR, 'Час'),
+        (PERIOD_DAY, 'Сутки'),
+    ]
+
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='activity')
+    period = models.CharField(max_length=4, choices=PERIOD_CHOICES, default=PERIOD_HOUR, verbose_name="Период")
+    started_at = models.DateTimeField(verbose_name="Начало периода")
+    views = models.PositiveIntegerField(default=0, verbose_name="Просмотры")
+    # Отмена лайка вычитается из корзины текущего часа, поэтому значение может быть отрицательным
+    likes = models.IntegerField(default=0, verbose_name="Лайки")
+
+    class Meta:
+        verbose_name = "Активность поста"
+        verbose_name_plural = "Активность постов"
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'period', 'started_at'], name='post_activity_bucket_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['period', 'started_at'], name='post_activity_period_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.post_id} {self.period} {self.started_at:%Y-%m-%d %H:%M}"
+
+
+class RankedPost(models.Model):
+    LIST_TRENDING = 'trending'
+    LIST_POPULAR = 'popular'
+
+    LIST_CHOICES = [
+        (LIST_TRENDING, 'Популярное сейчас'),
+        (LIST_POPULAR, 'Самое читаемое'),
+    ]
+
+    kind = models.CharField(max_length=10, choices=LIST_CHOICES, verbose_name="Список")
+    # Пустая категория — общий топ по всем постам
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    rank = models.PositiveSmallIntegerField(verbose_name="Позиция")
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField(verbose_name="Оценка")
+    computed_at = models.DateTimeField(verbose_name="Дата расчёта")
+
+    class Meta:
+        verbose_name = "Пост в рейтинге"
+        verbose_name_plural = "Рейтинги постов"
+        indexes = [
+            models.Index(fields=['kind', 'category', 'rank'], name='ranked_post_list_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind}/{self.category_id or '*'} #{self.rank}: {self.post_id}"
+
+
+class RenderedPage(models.Model):
+    """Страница статической публикации и посты, показанные на ней, — карта зависимостей для перерисовки."""
+    path = models.CharField(max_length=255, unique=True, verbose_name="Путь")
+    file_name = models.CharField(max_length=20, verbose_name="Имя файла")
+    content_hash = models.CharField(max_length=32, verbose_name="Хеш содержимого")
+    posts = models.ManyToManyField(Post, blank=True, related_name='+', verbose_name="Посты на странице")
+    rendered_at = models.DateTimeField(auto_now=True, verbose_name="Дата рендеринга")
+
+    class Meta:
+        verbose_name = "Статическая страница"
+        verbose_name_plural = "Статические страницы"
+
+    def __str__(self):
+        return self.path
@@ -0,0 +1,108 @@
+import math
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .models import Category, Post, Tag
+
+NAVIGATION_CACHE_KEY = 'navigation'
+TAG_CLOUD_LEVELS = 5
+
+CategoryNode = namedtuple('CategoryNode', 'id name slug post_count total_count depth children')
+TagCloudItem = namedtuple('TagCloudItem', 'id name slug color post_count weight')
+
+
+class Navigation(namedtuple('Navigation', 'categories tags version')):
+    """
+    Данные сайдбара: дерево активных категорий с числом опубликованных постов
+    (total_count включает подкатегории) и облако тегов. Структура неизменяемая:
+    один экземпляр из кеша разделяется всеми запросами.
+    """
+
+    def flat_categories(self):
+        # Обход в глубину без рекурсии — шаблон рисует дерево отступами по depth
+        stack = list(reversed(self.categories))
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(node.children))
+
+    def as_dict(self):
+        def category(node):
+            return {
+                'id': node.id, 'name': node.name, 'slug': node.slug,
+                'post_count': node.post_count, 'total_count': node.total_count,
+                'children': [category(child) for child in node.children],
+            }
+
+        return {
+            'categories': [category(node) for node in self.categories],
+            'tags': [tag._asdict() for tag in self.tags],
+            'version': self.version,
+        }
+
+
+def published_filter(prefix):
+    return Q(**{f'{prefix}__status': Post.STATUS_PUBLISHED, f'{prefix}__pub_date__lte': timezone.now()})
+
+
+def build_category_tree():
+    rows = list(
+        Category.objects.filter(is_active=True)
+        .annotate(post_count=Count('posts', filter=published_filter('posts')))
+        .order_by(*Category._meta.ordering)
+        .values('id', 'name', 'slug', 'parent_id', 'post_count')
+    )
+    children = {}
+    for row in rows:
+        children.setdefault(row['parent_id'], []).append(row)
+
+    def build(row, depth):
+        # Подкатегории неактивной категории не показываются; циклы в parent недостижимы от корней
+        nodes = tuple(build(child, depth + 1) for child in children.get(row['id'], ()))
+        total = row['post_count'] + sum(node.total_count for node in nodes)
+        return CategoryNode(row['id'], row['name'], row['slug'], row['post_count'], total, depth, nodes)
+
+    return tuple(build(row, 0) for row in children.get(None, ()))
+
+
+def build_tag_cloud(size=None):
+    size = size or getattr(settings, 'TAG_CLOUD_SIZE', 50)
+    rows = list(
+        Tag.objects.annotate(post_count=Count('posts', filter=published_filter('posts')))
+        .filter(post_count__gt=0)
+        .order_by('-post_count', 'name')
+        .values('id', 'name', 'slug', 'color', 'post_count')[:size]
+    )
+    if not rows:
+        return ()
+
+    # Вес по логарифму числа постов: несколько популярных тегов не сжимают остальные в один размер
+    low = math.log(rows[-1]['post_count'])
+    spread = math.log(rows[0]['post_count']) - low
+    items = []
+    for row in rows:
+        weight = 1 + round((math.log(row['post_count']) - low) / spread * (TAG_CLOUD_LEVELS - 1)) if spread else 1
+        items.append(TagCloudItem(weight=weight, **row))
+    return tuple(sorted(items, key=lambda item: item.name))
+
+
+def build_navigation():
+    return Navigation(build_category_tree(), build_tag_cloud(), time.time_ns())
+
+
+def get_navigation():
+    navigation = cache.get(NAVIGATION_CACHE_KEY)
+    if navigation is None:
+        navigation = build_navigation()
+        # Отложенные посты публикуются без сигнала, поэтому запись живёт ограниченное время
+        cache.set(NAVIGATION_CACHE_KEY, navigation, getattr(settings, 'NAVIGATION_CACHE_TIMEOUT', 600))
+    return navigation
+
+
+def invalidate_navigation():
+    cache.delete(NAVIGATION_CACHE_KEY)
@@ -0,0 +1,168 @@
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db.models import Q
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .models import NewsletterDelivery, Subscription
+
+logger = logging.getLogger(__name__)
+
+# Отправка, не обновлявшая контрольную точку дольше этого времени, считается упавшей
+STALE_AFTER = timedelta(minutes=5)
+# Как часто живая отправка обновляет updated_at, даже если ни одна пачка не завершилась
+HEARTBEAT_INTERVAL = STALE_AFTER / 5
+
+
+class NewsletterInterrupted(Exception):
+    pass
+
+
+def active_subscriptions():
+    return Subscription.objects.filter(is_active=True, confirmed_at__isnull=False)
+
+
+def render_newsletter(post):
+    context = {'post': post, 'post_url': settings.SITE_URL.rstrip('/') + post.get_absolute_url()}
+    return {
+        'subject': post.title,
+        'body': render_to_string('posts/email/newsletter.txt', context),
+        'html': render_to_string('posts/email/newsletter.html', context),
+    }
+
+
+def send_batch(message, emails):
+    connection = get_connection()
+    messages = []
+    for email in emails:
+        mail = EmailMultiAlternatives(
+            message['subject'], message['body'], settings.DEFAULT_FROM_EMAIL, [email], connection=connection
+        )
+        mail.attach_alternative(message['html'], 'text/html')
+        messages.append(mail)
+    # Одно SMTP-соединение на всю пачку
+    return connection.send_messages(messages) or 0
+
+
+def iter_batches(after_id, batch_size):
+    batch = []
+    subscriptions = (
+        active_subscriptions().filter(pk__gt=after_id).order_by('pk').values_list('pk', 'email')
+    )
+    for pk, email in subscriptions.iterator(chunk_size=batch_size):
+        batch.append((pk, email))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def claim_delivery(post):
+    delivery, _ = NewsletterDelivery.objects.get_or_create(post=post)
+    stale = timezone.now() - STALE_AFTER
+    claimed = NewsletterDelivery.objects.filter(pk=delivery.pk).filter(
+        Q(status__in=[NewsletterDelivery.STATUS_PENDING, NewsletterDelivery.STATUS_INTERRUPTED]) |
+        Q(status=NewsletterDelivery.STATUS_SENDING, updated_at__lt=stale)
+    ).update(status=NewsletterDelivery.STATUS_SENDING, claim_token=uuid.uuid4(), updated_at=timezone.now())
+    if not claimed:
+        return None
+    delivery.refresh_from_db()
+    return delivery
+
+
+def save_delivery(delivery, **fields):
+    """
+    Сохраняет поля рассылки и продлевает захват, только пока токен не сменился.
+    False значит, что рассылку перехватил другой отправитель.
+    """
+    fields['updated_at'] = timezone.now()
+    saved = NewsletterDelivery.objects.filter(pk=delivery.pk, claim_token=delivery.claim_token).update(**fields)
+    for name, value in fields.items():
+        setattr(delivery, name, value)
+    return bool(saved)
+
+
+def send_newsletter(post, batch_size=None, workers=None):
+    """
+    Рассылает пост подтверждённым подписчикам. Пачки отправляются параллельно,
+    контрольная точка (pk последнего подписчика) сдвигается только по непрерывному
+    префиксу завершённых пачек, поэтому прерванная рассылка продолжается с неё.
+    """
+    batch_size = batch_size or getattr(settings, 'NEWSLETTER_BATCH_SIZE', 500)
+    workers = workers or getattr(settings, 'NEWSLETTER_WORKERS', 4)
+
+    delivery = claim_delivery(post)
+    if delivery is None:
+        logger.info('Рассылка поста %s уже выполняется или завершена', post.pk)
+        return None
+
+    message = render_newsletter(post)
+    batches = {}
+    order = []
+    done = set()
+    failed = None
+    lost = False
+
+    def checkpoint():
+        nonlocal lost
+        while order and order[0] in done:
+            batch_id = order.pop(0)
+            last_id, sent = batches.pop(batch_id)
+            delivery.last_subscription_id = last_id
+            delivery.sent_count += sent
+        # Пишется на каждом проходе: updated_at служит пульсом, даже если голова очереди ещё отправляется
+        if not save_delivery(delivery, last_subscription_id=delivery.last_subscription_id,
+                             sent_count=delivery.sent_count):
+            lost = True
+
+    def collect(futures, return_when):
+        nonlocal failed
+        finished, _ = wait(futures, timeout=HEARTBEAT_INTERVAL.total_seconds(), return_when=return_when)
+        for future in finished:
+            batch_id = futures.pop(future)
+            if future.cancelled():
+                continue
+            try:
+                batches[batch_id] = (batches[batch_id][0], future.result())
+                done.add(batch_id)
+            except Exception as exc:
+                logger.exception('Не удалось отправить пачку рассылки поста %s', post.pk)
+                failed = exc
+        checkpoint()
+
+    futures = {}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='newsletter') as executor:
+        for batch_id, batch in enumerate(iter_batches(delivery.last_subscription_id, batch_size)):
+            # Не больше 2 * workers пачек в памяти одновременно
+            while len(futures) >= workers * 2 and not lost:
+                collect(futures, FIRST_COMPLETED)
+            if failed is not None or lost:
+                break
+            batches[batch_id] = (batch[-1][0], 0)
+            order.append(batch_id)
+            futures[executor.submit(send_batch, message, [email for _, email in batch])] = batch_id
+        if lost:
+            # Ещё не начатые пачки отправит новый владелец рассылки
+            for future in futures:
+                future.cancel()
+        while futures:
+            collect(futures, FIRST_COMPLETED)
+
+    if lost:
+        logger.warning('Рассылку поста %s перехватил другой отправитель', post.pk)
+        return None
+
+    if failed is not None:
+        save_delivery(delivery, status=NewsletterDelivery.STATUS_INTERRUPTED)
+        raise NewsletterInterrupted(f'Рассылка поста {post.pk} прервана') from failed
+
+    if not save_delivery(delivery, status=NewsletterDelivery.STATUS_DONE, finished_at=timezone.now()):
+        logger.warning('Рассылку поста %s перехватил другой отправитель', post.pk)
+        return None
+    return delivery
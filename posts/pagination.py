@@ -0,0 +1,235 @@
+import asyncio
+import base64
+import binascii
+import hashlib
+import json
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.http import Http404
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+ORDERING = ('-pub_date', '-id')
+REVERSE_ORDERING = ('pub_date', 'id')
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def encode_cursor(post, reverse=False):
+    if isinstance(post, dict):
+        # Строка из values()
+        data = {'d': post['pub_date'].isoformat(), 'i': post['id']}
+    else:
+        data = {'d': post.pub_date.isoformat(), 'i': post.pk}
+    if reverse:
+        data['r'] = 1
+    raw = json.dumps(data, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(value):
+    try:
+        raw = base64.urlsafe_b64decode(value + '=' * (-len(value) % 4))
+        data = json.loads(raw)
+        pub_date = parse_datetime(data['d'])
+        pk = int(data['i'])
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise InvalidCursor(value)
+    if pub_date is None:
+        raise InvalidCursor(value)
+    return pub_date, pk, bool(data.get('r'))
+
+
+class CursorPage:
+    def __init__(self, paginator, object_list, next_cursor=None, previous_cursor=None):
+        self.paginator = paginator
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    @cached_property
+    def approximate_count(self):
+        return self.paginator.approximate_count()
+
+
+class CursorPaginator:
+    """
+    Keyset-пагинация по (pub_date, id): страница выбирается условием
+    «строго после курсора» по индексу, без COUNT(*) и OFFSET.
+    """
+
+    def __init__(self, queryset, per_page, count_cache_key=None, count_timeout=None):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.count_cache_key = count_cache_key
+        self.count_timeout = count_timeout or getattr(settings, 'POST_COUNT_CACHE_TIMEOUT', 300)
+
+    def window(self, cursor=None):
+        """Запрос строк страницы (на одну больше, чтобы узнать о следующей) и направление обхода."""
+        limit = self.per_page + 1
+        if not cursor:
+            return self.queryset.order_by(*ORDERING)[:limit], None
+
+        pub_date, pk, reverse = decode_cursor(cursor)
+        if not reverse:
+            # Условие pub_date <= курсора оставлено для диапазонного поиска по индексу
+            queryset = self.queryset.filter(pub_date__lte=pub_date).filter(
+                Q(pub_date__lt=pub_date) | Q(id__lt=pk)
+            )
+            return queryset.order_by(*ORDERING)[:limit], False
+
+        queryset = self.queryset.filter(pub_date__gte=pub_date).filter(
+            Q(pub_date__gt=pub_date) | Q(id__gt=pk)
+        )
+        return queryset.order_by(*REVERSE_ORDERING)[:limit], True
+
+    def make_page(self, rows, reverse):
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if reverse is None:
+            return CursorPage(self, rows, next_cursor=encode_cursor(rows[-1]) if has_more else None)
+        if not reverse:
+            return CursorPage(
+                self, rows,
+                next_cursor=encode_cursor(rows[-1]) if has_more else None,
+                previous_cursor=encode_cursor(rows[0], reverse=True) if rows else None,
+            )
+        rows = rows[::-1]
+        return CursorPage(
+            self, rows,
+            next_cursor=encode_cursor(rows[-1]) if rows else None,
+            previous_cursor=encode_cursor(rows[0], reverse=True) if has_more else None,
+        )
+
+    def page(self, cursor=None):
+        queryset, reverse = self.window(cursor)
+        return self.make_page(list(queryset), reverse)
+
+    async def apage(self, cursor=None):
+        queryset, reverse = self.window(cursor)
+        return self.make_page([row async for row in queryset], reverse)
+
+    def approximate_count(self):
+        if self.count_cache_key is None:
+            return None
+        return cache.get_or_set(self.count_cache_key, self.queryset.count, self.count_timeout)
+
+    async def aapproximate_count(self):
+        if self.count_cache_key is None:
+            return None
+        count = await cache.aget(self.count_cache_key)
+        if count is None:
+            count = await self.queryset.acount()
+            await cache.aset(self.count_cache_key, count, self.count_timeout)
+        return count
+
+
+class CursorPaginationMixin:
+    cursor_query_param = 'cursor'
+
+    def get_count_cache_key(self):
+        return None
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = CursorPaginator(queryset, page_size, count_cache_key=self.get_count_cache_key())
+        try:
+            page = paginator.page(self.request.GET.get(self.cursor_query_param))
+        except InvalidCursor:
+            raise Http404('Неверный курсор страницы')
+        return paginator, page, page.object_list, page.has_other_pages()
+
+
+class PostCursorPagination(BasePagination):
+    page_size = api_settings.PAGE_SIZE
+    cursor_query_param = 'cursor'
+
+    def get_count_cache_key(self, query_params, is_authenticated):
+        params = sorted(
+            (key, value) for key, value in query_params.lists() if key != self.cursor_query_param
+        )
+        raw = json.dumps([params, is_authenticated])
+        return 'api-post-count:' + hashlib.md5(raw.encode()).hexdigest()
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        paginator = CursorPaginator(queryset, self.page_size, count_cache_key=self.get_count_cache_key(
+            request.query_params, request.user.is_authenticated
+        ))
+        try:
+            self.page = paginator.page(request.query_params.get(self.cursor_query_param))
+        except InvalidCursor:
+            raise NotFound('Неверный курсор страницы')
+        return list(self.page)
+
+    async def apaginate_queryset(self, queryset, request, is_authenticated=False):
+        """Асинхронный вариант для HttpRequest: страница и приблизительный count читаются параллельно."""
+        self.request = request
+        paginator = CursorPaginator(queryset, self.page_size, count_cache_key=self.get_count_cache_key(
+            request.GET, is_authenticated
+        ))
+        try:
+            self.page, count = await asyncio.gather(
+                paginator.apage(request.GET.get(self.cursor_query_param)), paginator.aapproximate_count()
+            )
+        except InvalidCursor:
+            raise NotFound('Неверный курсор страницы')
+        self.page.approximate_count = count
+        return list(self.page)
+
+    def get_link(self, cursor):
+        if cursor is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, cursor)
+
+    def get_next_link(self):
+        return self.get_link(self.page.next_cursor)
+
+    def get_previous_link(self):
+        return self.get_link(self.page.previous_cursor)
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_paginated_data(self, data):
+        return OrderedDict([
+            ('count', self.page.approximate_count),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ])
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'count': {'type': 'integer', 'nullable': True},
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,189 @@
+"""
+Статическая публикация: готовые HTML-страницы и ленты для анонимного
+чтения, которые фронтовой веб-сервер отдаёт без обращения к приложению.
+Страница пути /post/5/ лежит в PRERENDER_ROOT/post/5/index.html (ленты —
+index.xml) вместе со сжатыми копиями .gz и, если установлен пакет brotli,
+.br. Пример для nginx: статика только для запросов без строки запроса и
+без cookie сессии и сообщений, остальное — приложению::
+
+    location / {
+        if ($args) { return 418; }
+        if ($http_cookie ~* "(sessionid|messages)=") { return 418; }
+        gzip_static on;
+        try_files $uri/index.html $uri/index.xml @django;
+        error_page 418 = @django;
+    }
+
+Какие посты попали на страницу, записывается при рендеринге (RenderedPage),
+поэтому правка поста перерисовывает только его страницу, страницы, где он
+показан, и списки и ленты его категории и тегов. Сайдбар (навигация и
+рейтинги) и чужие списки похожих постов обновляет полный прогон render_static.
+"""
+import gzip
+import hashlib
+import os
+import threading
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_init
+from django.test import Client
+from django.urls import reverse
+
+from .models import Category, Post, RenderedPage, Tag
+from .queue import enqueue
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Ключ окружения WSGI, а не заголовок: клиент не может его подставить
+PRERENDER_ENVIRON_KEY = 'posts.prerender'
+SITE_FEEDS = ('posts:post-rss', 'posts:post-rss-full', 'posts:post-atom', 'posts:post-atom-full')
+
+_rendering = threading.local()
+
+
+def is_prerender(request):
+    return PRERENDER_ENVIRON_KEY in request.META
+
+
+def _collect_post(sender, instance, **kwargs):
+    collected = getattr(_rendering, 'posts', None)
+    if collected is not None and instance.pk is not None:
+        collected.add(instance.pk)
+
+
+def schedule_prerender(post_ids=(), paths=()):
+    """Ставит перерисовку в очередь (задача prerender.pages), если публикация включена."""
+    if getattr(settings, 'PRERENDER_ENABLED', False) and (post_ids or paths):
+        enqueue('prerender.pages', {'post_ids': sorted(post_ids), 'paths': sorted(paths)})
+
+
+def site_paths():
+    return [reverse('posts:post-list')] + [reverse(name) for name in SITE_FEEDS]
+
+
+def category_paths(slug):
+    return [reverse(name, kwargs={'category_slug': slug})
+            for name in ('posts:category-posts', 'posts:category-rss', 'posts:category-atom')]
+
+
+def tag_paths(slug):
+    return [reverse(name, kwargs={'tag_slug': slug}) for name in ('posts:tag-posts', 'posts:tag-rss', 'posts:tag-atom')]
+
+
+def post_path(pk):
+    return reverse('posts:post-detail', kwargs={'pk': pk})
+
+
+def all_paths():
+    paths = site_paths()
+    for slug in Category.objects.filter(is_active=True, posts__in=Post.published.all()).distinct().values_list(
+            'slug', flat=True):
+        paths += category_paths(slug)
+    for slug in Tag.objects.filter(posts__in=Post.published.all()).distinct().values_list('slug', flat=True):
+        paths += tag_paths(slug)
+    paths += [post_path(pk) for pk in Post.published.order_by('pk').values_list('pk', flat=True)]
+    return paths
+
+
+def affected_paths(post_ids):
+    """Страницы, которые нужно перерисовать после изменения постов post_ids."""
+    # Страница неопубликованного поста отдаёт 404 при рендеринге и удаляется
+    paths = set(RenderedPage.objects.filter(posts__in=post_ids).values_list('path', flat=True))
+    paths.update(post_path(pk) for pk in post_ids)
+    posts = Post.published.filter(pk__in=post_ids).select_related('category').prefetch_related('tags')
+    for post in posts:
+        paths.update(site_paths())
+        if post.category is not None:
+            paths.update(category_paths(post.category.slug))
+        for tag in post.tags.all():
+            paths.update(tag_paths(tag.slug))
+    return paths
+
+
+class PageRenderer:
+    """Рендерит страницы через обработчик Django (с middleware и контекстом) и пишет файлы."""
+
+    def __init__(self, root=None):
+        self.root = os.path.abspath(root or settings.PRERENDER_ROOT)
+        site = urlsplit(settings.SITE_URL)
+        self.client = Client(HTTP_HOST=site.netloc, secure=site.scheme == 'https')
+        post_init.connect(_collect_post, sender=Post, dispatch_uid='prerender-collect-post')
+
+    def file_base(self, path):
+        target = os.path.abspath(os.path.join(self.root, path.strip('/')))
+        if os.path.commonpath([self.root, target]) != self.root:
+            raise ValueError(f'Путь вне каталога публикации: {path}')
+        return target
+
+    def fetch(self, path):
+        _rendering.posts = set()
+        try:
+            response = self.client.get(path, **{PRERENDER_ENVIRON_KEY: True})
+            content = b''.join(response.streaming_content) if response.streaming else response.content
+            return response, content, _rendering.posts
+        finally:
+            _rendering.posts = None
+
+    def render(self, path):
+        """Перерисовывает страницу; True, если файл изменился. Исчезнувшая страница удаляется."""
+        response, content, post_ids = self.fetch(path)
+        if response.status_code != 200:
+            self.remove(path)
+            return False
+
+        name = 'index.html' if 'html' in response.get('Content-Type', '') else 'index.xml'
+        digest = hashlib.md5(content).hexdigest()
+        page = RenderedPage.objects.filter(path=path).first()
+        filename = os.path.join(self.file_base(path), name)
+        if page is not None and (page.content_hash, page.file_name) == (digest, name) and os.path.exists(filename):
+            return False
+
+        self.write(filename, content)
+        with transaction.atomic():
+            page, _ = RenderedPage.objects.update_or_create(
+                path=path, defaults={'content_hash': digest, 'file_name': name}
+            )
+            page.posts.set(post_ids)
+        return True
+
+    def write(self, filename, content):
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        variants = {filename: content, filename + '.gz': gzip.compress(content, 9, mtime=0)}
+        if brotli is not None:
+            variants[filename + '.br'] = brotli.compress(content)
+        for name, data in variants.items():
+            # Запись во временный файл и переименование: сервер не увидит недописанную страницу
+            temporary = f'{name}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(temporary, 'wb') as fh:
+                fh.write(data)
+            os.replace(temporary, name)
+
+    def remove(self, path):
+        base = self.file_base(path)
+        for name in ('index.html', 'index.xml'):
+            for suffix in ('', '.gz', '.br'):
+                try:
+                    os.remove(os.path.join(base, name + suffix))
+                except FileNotFoundError:
+                    pass
+        RenderedPage.objects.filter(path=path).delete()
+
+    def render_many(self, paths):
+        changed = 0
+        for path in sorted(paths):
+            changed += self.render(path)
+        return changed
+
+    def render_all(self):
+        """Полный прогон: все страницы и удаление тех, что больше не существуют."""
+        paths = all_paths()
+        changed = self.render_many(paths)
+        stale = set(RenderedPage.objects.values_list('path', flat=True)) - set(paths)
+        for path in stale:
+            self.remove(path)
+        return len(paths), changed, len(stale)
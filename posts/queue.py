@@ -0,0 +1,176 @@
+import logging
+import os
+import socket
+import threading
+import traceback
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+TASKS = {}
+PERIODIC = {}
+
+RETRY_BASE_DELAY = 30
+LOCK_TIMEOUT = timedelta(minutes=10)
+
+
+def task(name, every=None):
+    """
+    Регистрирует обработчик задачи. Обработчик получает список payload одной
+    пачки. С every (секунды) задача периодическая: её ставит в очередь Worker.
+    """
+
+    def decorator(func):
+        TASKS[name] = func
+        if every:
+            PERIODIC[name] = timedelta(seconds=every)
+        return func
+
+    return decorator
+
+
+def enqueue(task_name, payload=None, run_at=None, max_attempts=5):
+    return Job.objects.create(
+        task=task_name,
+        payload=payload or {},
+        run_at=run_at or timezone.now(),
+        max_attempts=max_attempts,
+    )
+
+
+def schedule_periodic(now=None):
+    """
+    Для каждой периодической задачи держит одну строку Job: выполненная или
+    упавшая задача снова ставится в очередь через интервал после прошлого запуска.
+    """
+    now = now or timezone.now()
+    for name, interval in PERIODIC.items():
+        job = Job.objects.filter(task=name).order_by('-run_at').only('status', 'run_at').first()
+        if job is None:
+            enqueue(name, run_at=now)
+        elif job.status in (Job.STATUS_DONE, Job.STATUS_FAILED):
+            # Условие на статус не даёт двум обработчикам перезапустить задачу дважды
+            Job.objects.filter(pk=job.pk, status=job.status).update(
+                status=Job.STATUS_PENDING, run_at=max(now, job.run_at + interval), attempts=0
+            )
+
+
+def purge_finished(now=None, batch_size=1000):
+    """
+    Удаляет выполненные задачи, срок которых наступил раньше JOB_RETENTION_DAYS
+    назад. Строки периодических задач остаются: по ним планируется следующий запуск.
+    """
+    now = now or timezone.now()
+    cutoff = now - timedelta(days=getattr(settings, 'JOB_RETENTION_DAYS', 7))
+    finished = Job.objects.filter(status=Job.STATUS_DONE, run_at__lt=cutoff).exclude(task__in=list(PERIODIC))
+    deleted = 0
+    while True:
+        # Пачками: удаление не держит блокировку записи долго
+        ids = list(finished.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += Job.objects.filter(pk__in=ids).delete()[0]
+
+
+def retry_delay(attempts):
+    return timedelta(seconds=RETRY_BASE_DELAY * 2 ** (attempts - 1))
+
+
+class Worker:
+    def __init__(self, threads=4, batch_size=50):
+        self.threads = threads
+        self.batch_size = batch_size
+        self.name = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        self._stop = threading.Event()
+
+    def stop(self):
+        self._stop.set()
+
+    def release_stale(self):
+        # Задачи упавших обработчиков возвращаются в очередь
+        return Job.objects.filter(
+            status=Job.STATUS_RUNNING, locked_at__lt=timezone.now() - LOCK_TIMEOUT
+        ).update(status=Job.STATUS_PENDING, locked_at=None, locked_by='')
+
+    def claim(self):
+        now = timezone.now()
+        ids = list(
+            Job.objects.filter(status=Job.STATUS_PENDING, run_at__lte=now)
+            .order_by('run_at', 'id')
+            .values_list('pk', flat=True)[:self.batch_size]
+        )
+        if not ids:
+            return []
+        # Условие status=pending не даёт двум обработчикам забрать одну задачу
+        Job.objects.filter(pk__in=ids, status=Job.STATUS_PENDING).update(
+            status=Job.STATUS_RUNNING, locked_at=now, locked_by=self.name, attempts=F('attempts') + 1
+        )
+        return list(Job.objects.filter(pk__in=ids, status=Job.STATUS_RUNNING, locked_by=self.name))
+
+    def execute(self, task_name, jobs):
+        try:
+            handler = TASKS.get(task_name)
+            if handler is None:
+                raise LookupError(f'Неизвестная задача: {task_name}')
+            handler([job.payload for job in jobs])
+        except Exception:
+            logger.exception('Задача %s завершилась с ошибкой', task_name)
+            self.fail(jobs, traceback.format_exc())
+        else:
+            Job.objects.filter(pk__in=[job.pk for job in jobs]).update(
+                status=Job.STATUS_DONE, locked_at=None, locked_by='', last_error=''
+            )
+        finally:
+            connection.close()
+
+    def fail(self, jobs, error):
+        now = timezone.now()
+        for job in jobs:
+            if job.attempts >= job.max_attempts:
+                job.status = Job.STATUS_FAILED
+            else:
+                job.status = Job.STATUS_PENDING
+                job.run_at = now + retry_delay(job.attempts)
+            job.locked_at = None
+            job.locked_by = ''
+            job.last_error = error
+        Job.objects.bulk_update(jobs, ['status', 'run_at', 'locked_at', 'locked_by', 'last_error'])
+
+    def run_once(self, executor):
+        jobs = self.claim()
+        groups = defaultdict(list)
+        for job in jobs:
+            groups[job.task].append(job)
+        futures = []
+        for task_name, group in groups.items():
+            # Пачка одной задачи делится между потоками поровну
+            size = max(1, -(-len(group) // self.threads))
+            for start in range(0, len(group), size):
+                futures.append(executor.submit(self.execute, task_name, group[start:start + size]))
+        wait(futures)
+        return len(jobs)
+
+    def run(self, poll_interval=5, once=False):
+        processed = 0
+        with ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix='job-worker') as executor:
+            while not self._stop.is_set():
+                close_old_connections()
+                self.release_stale()
+                schedule_periodic()
+                count = self.run_once(executor)
+                processed += count
+                if once and not count:
+                    break
+                if not count:
+                    self._stop.wait(poll_interval)
+        return processed
@@ -0,0 +1,233 @@
+import time
+from collections import defaultdict, namedtuple
+from datetime import timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Sum
+from django.db.models.functions import TruncDay
+from django.utils import timezone
+
+from .models import Post, PostActivity, RankedPost
+
+RANKINGS_CACHE_KEY = 'rankings'
+
+# Возраст корзины считается от её середины
+BUCKET_MIDPOINT = {
+    PostActivity.PERIOD_HOUR: timedelta(minutes=30),
+    PostActivity.PERIOD_DAY: timedelta(hours=12),
+}
+
+RankedItem = namedtuple('RankedItem', 'id title slug pub_date category_id score')
+
+
+class Rankings(namedtuple('Rankings', 'lists computed_at version')):
+    """
+    Готовые топы постов: {(список, id категории или None): (RankedItem, ...)}.
+    Один экземпляр из кеша разделяется всеми запросами.
+    """
+
+    def top(self, kind, category_id=None, limit=None):
+        items = self.lists.get((kind, category_id), ())
+        return items[:limit] if limit else items
+
+    @property
+    def trending(self):
+        return self.top(RankedPost.LIST_TRENDING)
+
+    @property
+    def popular(self):
+        return self.top(RankedPost.LIST_POPULAR)
+
+
+def ranking_size():
+    return getattr(settings, 'RANKING_SIZE', 10)
+
+
+def trending_window():
+    return timedelta(days=getattr(settings, 'TRENDING_WINDOW_DAYS', 7))
+
+
+def popular_window():
+    return timedelta(days=getattr(settings, 'POPULAR_WINDOW_DAYS', 30))
+
+
+def hour_start(moment):
+    return moment.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def day_start(moment):
+    return hour_start(moment).replace(hour=0)
+
+
+def record_activity(views=None, likes=None, now=None):
+    """
+    Прибавляет просмотры и лайки ({id поста: прирост}) к корзинам текущего
+    часа: недостающие корзины создаются одним INSERT, затем по UPDATE с F()
+    на каждое значение прироста.
+    """
+    deltas = {'views': views or {}, 'likes': likes or {}}
+    # Пост мог быть удалён, пока его просмотры копились в буфере
+    touched = set(deltas['views']) | set(deltas['likes'])
+    post_ids = set(Post.objects.filter(pk__in=touched).values_list('pk', flat=True))
+    if not post_ids:
+        return
+    started_at = hour_start(now or timezone.now())
+    PostActivity.objects.bulk_create(
+        [PostActivity(post_id=post_id, period=PostActivity.PERIOD_HOUR, started_at=started_at) for post_id in post_ids],
+        ignore_conflicts=True,
+    )
+    buckets = PostActivity.objects.filter(period=PostActivity.PERIOD_HOUR, started_at=started_at)
+    for field, values in deltas.items():
+        by_delta = defaultdict(list)
+        for post_id, delta in values.items():
+            if delta and post_id in post_ids:
+                by_delta[delta].append(post_id)
+        for delta, ids in by_delta.items():
+            buckets.filter(post_id__in=ids).update(**{field: F(field) + delta})
+
+
+@transaction.atomic
+def rollup_activity(now=None):
+    """
+    Сворачивает часовые корзины старше ACTIVITY_HOURLY_RETENTION_HOURS в
+    суточные (только целые сутки) и удаляет корзины, выпавшие из всех окон.
+    """
+    now = now or timezone.now()
+    cutoff = day_start(now - timedelta(hours=getattr(settings, 'ACTIVITY_HOURLY_RETENTION_HOURS', 48)))
+    hourly = PostActivity.objects.filter(period=PostActivity.PERIOD_HOUR, started_at__lt=cutoff)
+    totals = {
+        (row['post_id'], row['day']): (row['total_views'], row['total_likes'])
+        for row in hourly.annotate(day=TruncDay('started_at', tzinfo=dt_timezone.utc))
+        .values('post_id', 'day').annotate(total_views=Sum('views'), total_likes=Sum('likes'))
+    }
+    if totals:
+        existing = PostActivity.objects.filter(
+            period=PostActivity.PERIOD_DAY,
+            post_id__in={post_id for post_id, _ in totals},
+            started_at__in={day for _, day in totals},
+        ).values_list('post_id', 'started_at', 'views', 'likes')
+        for post_id, day, views, likes in existing:
+            if (post_id, day) in totals:
+                total_views, total_likes = totals[post_id, day]
+                totals[post_id, day] = (total_views + views, total_likes + likes)
+        PostActivity.objects.bulk_create(
+            [
+                PostActivity(post_id=post_id, period=PostActivity.PERIOD_DAY, started_at=day, views=views, likes=likes)
+                for (post_id, day), (views, likes) in totals.items()
+            ],
+            update_conflicts=True, unique_fields=['post', 'period', 'started_at'], update_fields=['views', 'likes'],
+            batch_size=500,
+        )
+        hourly.delete()
+
+    expired = day_start(now - max(trending_window(), popular_window()))
+    PostActivity.objects.filter(started_at__lt=expired).delete()
+    return len(totals)
+
+
+def load_activity(since, now):
+    """Корзины с since: id постов, возраст в часах, просмотры и лайки — массивы NumPy."""
+    rows = list(
+        PostActivity.objects.filter(started_at__gte=since)
+        .values_list('post_id', 'period', 'started_at', 'views', 'likes')
+    )
+    post_ids = np.array([row[0] for row in rows], dtype=np.int64)
+    ages = np.array(
+        [(now - row[2] - BUCKET_MIDPOINT[row[1]]).total_seconds() / 3600 for row in rows], dtype=np.float64
+    )
+    views = np.array([row[3] for row in rows], dtype=np.float64)
+    likes = np.array([row[4] for row in rows], dtype=np.float64)
+    return post_ids, np.maximum(ages, 0), views, likes
+
+
+def activity_scores(activity, window, half_life=None, like_weight=0):
+    """
+    {id поста: оценка} по корзинам моложе window: просмотры плюс взвешенные
+    лайки, с half_life — с экспоненциальным затуханием по возрасту корзины.
+    """
+    post_ids, ages, views, likes = activity
+    inside = ages < window.total_seconds() / 3600
+    weights = views[inside] + like_weight * likes[inside]
+    if half_life:
+        weights = weights * 0.5 ** (ages[inside] / half_life)
+    ids, inverse = np.unique(post_ids[inside], return_inverse=True)
+    totals = np.bincount(inverse, weights=weights, minlength=len(ids))
+    return dict(zip(ids.tolist(), totals.tolist()))
+
+
+def top_lists(scores, categories, size):
+    """Лучшие size постов по оценке: общий список (ключ None) и по каждой категории."""
+    lists = {}
+    for post_id, score in sorted(scores.items(), key=lambda item: (-item[1], item[0])):
+        if score <= 0 or post_id not in categories:
+            continue
+        for key in {None, categories[post_id]}:
+            items = lists.setdefault(key, [])
+            if len(items) < size:
+                items.append((post_id, score))
+    return lists
+
+
+@transaction.atomic
+def refresh_rankings(now=None, size=None):
+    """Пересчитывает оценки и заменяет материализованные топы; возвращает число строк."""
+    now = now or timezone.now()
+    size = size or ranking_size()
+    activity = load_activity(day_start(now - max(trending_window(), popular_window())), now)
+    # Только опубликованные посты; отложенные попадут в топ при следующем пересчёте
+    categories = dict(Post.published.values_list('pk', 'category_id'))
+    scores = {
+        RankedPost.LIST_TRENDING: activity_scores(
+            activity, trending_window(),
+            half_life=getattr(settings, 'TRENDING_HALF_LIFE_HOURS', 24),
+            like_weight=getattr(settings, 'RANKING_LIKE_WEIGHT', 5),
+        ),
+        RankedPost.LIST_POPULAR: activity_scores(activity, popular_window()),
+    }
+
+    rows = []
+    for kind, kind_scores in scores.items():
+        for category_id, items in top_lists(kind_scores, categories, size).items():
+            rows.extend(
+                RankedPost(kind=kind, category_id=category_id, rank=rank, post_id=post_id, score=score, computed_at=now)
+                for rank, (post_id, score) in enumerate(items)
+            )
+    RankedPost.objects.all().delete()
+    RankedPost.objects.bulk_create(rows, batch_size=500)
+    transaction.on_commit(invalidate_rankings)
+    return len(rows)
+
+
+def load_rankings():
+    rows = (
+        RankedPost.objects.filter(post__status=Post.STATUS_PUBLISHED, post__pub_date__lte=timezone.now())
+        .select_related('post')
+        .only('kind', 'category_id', 'rank', 'score', 'computed_at',
+              'post__id', 'post__title', 'post__slug', 'post__pub_date', 'post__category_id')
+        .order_by('kind', 'category_id', 'rank')
+    )
+    lists = defaultdict(list)
+    computed_at = None
+    for row in rows:
+        post = row.post
+        lists[row.kind, row.category_id].append(
+            RankedItem(post.id, post.title, post.slug, post.pub_date, post.category_id, row.score)
+        )
+        computed_at = row.computed_at
+    return Rankings({key: tuple(items) for key, items in lists.items()}, computed_at, time.time_ns())
+
+
+def get_rankings():
+    rankings = cache.get(RANKINGS_CACHE_KEY)
+    if rankings is None:
+        rankings = load_rankings()
+        # Пересчёт идёт в обработчике очереди, а кеш может быть у каждого процесса свой
+        cache.set(RANKINGS_CACHE_KEY, rankings, getattr(settings, 'RANKINGS_CACHE_TIMEOUT', 300))
+    return rankings
+
+
+def invalidate_rankings():
+    cache.delete(RANKINGS_CACHE_KEY)
@@ -0,0 +1,324 @@
+import zlib
+from collections import Counter
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Min
+from django.utils import timezone
+
+from .models import Post, PostTerms, RelatedPost
+from .search import stem, tokenize
+
+HASH_BITS = 20
+# Теги — отдельные столбцы после хешей слов, чтобы не пересекаться с ними
+TAG_COLUMN_OFFSET = 1 << HASH_BITS
+TITLE_WEIGHT = 3
+MAX_TERMS = 64
+MIN_SCORE = 0.05
+# Сколько памяти (байт) может занять промежуточный массив при пакетном расчёте
+BATCH_MEMORY = 64 * 1024 * 1024
+
+
+def related_count():
+    return getattr(settings, 'RELATED_POSTS_COUNT', 8)
+
+
+def text_weight():
+    return getattr(settings, 'RELATED_POSTS_TEXT_WEIGHT', 0.7)
+
+
+def term_index(term):
+    # crc32, а не hash(): индексы должны совпадать между процессами
+    return zlib.crc32(term.encode()) & (TAG_COLUMN_OFFSET - 1)
+
+
+def extract_terms(post):
+    """Частоты основ слов заголовка и текста; слова заголовка весят больше."""
+    counts = Counter()
+    for text, weight in ((post.title, TITLE_WEIGHT), (post.content, 1)):
+        for word in tokenize(text):
+            if len(word) > 2 and not word.isdigit():
+                counts[term_index(stem(word))] += weight
+    indices = np.fromiter(counts.keys(), dtype=np.int32, count=len(counts))
+    values = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+    return indices, values
+
+
+def save_terms(posts):
+    rows = []
+    for post in posts:
+        indices, counts = extract_terms(post)
+        rows.append(PostTerms(post=post, indices=indices.tobytes(), counts=counts.tobytes()))
+    PostTerms.objects.bulk_create(
+        rows, update_conflicts=True, unique_fields=['post'], update_fields=['indices', 'counts', 'updated_at']
+    )
+
+
+def is_candidate(post):
+    return post.status == Post.STATUS_PUBLISHED
+
+
+class SimilarityMatrix:
+    """
+    Разреженная матрица постов в формате CSR на массивах NumPy: TF-IDF основ
+    слов и IDF-взвешенные теги, каждая часть нормирована отдельно. Скалярное
+    произведение строк — взвешенная сумма косинусных мер текста и тегов.
+    """
+
+    def __init__(self, post_ids, indptr, indices, data):
+        self.post_ids = post_ids
+        self.rows = {post_id: row for row, post_id in enumerate(post_ids.tolist())}
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.width = int(indices.max()) + 1 if len(indices) else 0
+
+    @classmethod
+    def load(cls, weight=None):
+        weight = text_weight() if weight is None else weight
+        terms = list(
+            PostTerms.objects.filter(post__status=Post.STATUS_PUBLISHED)
+            .order_by('post_id').values_list('post_id', 'indices', 'counts')
+        )
+        post_ids = np.array([row[0] for row in terms], dtype=np.int64)
+        rows = {post_id: row for row, post_id in enumerate(post_ids.tolist())}
+        tag_rows = [
+            (rows[post_id], tag_id) for post_id, tag_id in
+            Post.tags.through.objects.filter(post_id__in=list(rows)).values_list('post_id', 'tag_id')
+        ]
+
+        text = [
+            (np.frombuffer(bytes(indices), dtype=np.int32), np.frombuffer(bytes(counts), dtype=np.float32))
+            for _, indices, counts in terms
+        ]
+        text_parts = cls.weigh([indices for indices, _ in text], [counts for _, counts in text], MAX_TERMS)
+
+        tags = [[] for _ in terms]
+        for row, tag_id in tag_rows:
+            tags[row].append(TAG_COLUMN_OFFSET + tag_id)
+        tag_parts = cls.weigh(
+            [np.array(row, dtype=np.int32) for row in tags],
+            [np.ones(len(row), dtype=np.float32) for row in tags],
+        )
+
+        indptr = [0]
+        indices = []
+        data = []
+        text_scale, tag_scale = np.float32(np.sqrt(weight)), np.float32(np.sqrt(1 - weight))
+        for (text_indices, text_data), (tag_indices, tag_data) in zip(text_parts, tag_parts):
+            indices.extend((text_indices, tag_indices))
+            data.extend((text_data * text_scale, tag_data * tag_scale))
+            indptr.append(indptr[-1] + len(text_indices) + len(tag_indices))
+
+        if not terms:
+            return cls(post_ids, np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.int64),
+                       np.zeros(0, dtype=np.float32))
+        # Столбцы сжимаются до реально встречающихся термов
+        _, columns = np.unique(np.concatenate(indices), return_inverse=True)
+        return cls(post_ids, np.array(indptr, dtype=np.int64), columns.astype(np.int64), np.concatenate(data))
+
+    @staticmethod
+    def weigh(rows, counts, limit=None):
+        """Сублинейный TF x сглаженный IDF, не больше limit сильнейших термов, L2-нормировка."""
+        total = len(rows)
+        if total == 0:
+            return []
+        _, inverse, df = np.unique(np.concatenate(rows), return_inverse=True, return_counts=True)
+        idf = (np.log((1 + total) / (1 + df)) + 1).astype(np.float32)
+        flat = (1 + np.log(np.concatenate(counts))) * idf[inverse]
+        bounds = np.cumsum([len(indices) for indices in rows])[:-1]
+
+        weighted = []
+        for indices, weights in zip(rows, np.split(flat.astype(np.float32), bounds)):
+            if limit and len(weights) > limit:
+                keep = np.argpartition(weights, -limit)[-limit:]
+                indices, weights = indices[keep], weights[keep]
+            if len(weights):
+                weights = weights / np.linalg.norm(weights)
+            weighted.append((indices, weights))
+        return weighted
+
+    def __len__(self):
+        return len(self.post_ids)
+
+    def row_sums(self, values):
+        """Суммы values (по одному значению на ненулевой элемент) по строкам матрицы."""
+        out = np.zeros((len(self),) + values.shape[1:], dtype=np.float32)
+        starts = self.indptr[:-1]
+        nonempty = starts < self.indptr[1:]
+        if nonempty.any():
+            out[nonempty] = np.add.reduceat(values, starts[nonempty], axis=0)
+        return out
+
+    def row(self, row):
+        start, stop = self.indptr[row], self.indptr[row + 1]
+        return self.indices[start:stop], self.data[start:stop]
+
+    def scores(self, row):
+        """Сходство строки row со всеми постами."""
+        query = np.zeros(self.width, dtype=np.float32)
+        indices, data = self.row(row)
+        query[indices] = data
+        scores = self.row_sums(query[self.indices] * self.data)
+        scores[row] = 0
+        return scores
+
+    def batches(self):
+        """Сходство всех пар по блокам строк: (номера строк блока, матрица len(self) x блок)."""
+        per_column = (len(self.indices) + self.width) * 4
+        size = max(1, min(256, BATCH_MEMORY // max(per_column, 1)))
+        for start in range(0, len(self), size):
+            rows = np.arange(start, min(start + size, len(self)))
+            block = np.zeros((self.width, len(rows)), dtype=np.float32)
+            for column, row in enumerate(rows):
+                indices, data = self.row(row)
+                block[indices, column] = data
+            scores = self.row_sums(block[self.indices] * self.data[:, None])
+            scores[rows, np.arange(len(rows))] = 0
+            yield rows, scores
+
+
+def top_related(scores, limit):
+    """Индексы и значения limit лучших ненулевых оценок по убыванию."""
+    candidates = np.flatnonzero(scores >= MIN_SCORE)
+    if len(candidates) > limit:
+        candidates = candidates[np.argpartition(scores[candidates], -limit)[-limit:]]
+    order = candidates[np.argsort(-scores[candidates], kind='stable')]
+    return order, scores[order]
+
+
+def make_links(post_id, related_ids, scores):
+    return [
+        RelatedPost(post_id=post_id, related_id=related_id, rank=rank, score=score)
+        for rank, (related_id, score) in enumerate(zip(related_ids, scores))
+    ]
+
+
+@transaction.atomic
+def rebuild_related(limit=None, chunk_size=500):
+    """Полный пересчёт: термы всех опубликованных постов и top-k соседей для каждого."""
+    limit = limit or related_count()
+    PostTerms.objects.exclude(post__status=Post.STATUS_PUBLISHED).delete()
+    posts = Post.objects.filter(status=Post.STATUS_PUBLISHED).only('id', 'title', 'content', 'status')
+    batch = []
+    for post in posts.iterator(chunk_size=chunk_size):
+        batch.append(post)
+        if len(batch) >= chunk_size:
+            save_terms(batch)
+            batch = []
+    save_terms(batch)
+
+    matrix = SimilarityMatrix.load()
+    RelatedPost.objects.all().delete()
+    links = []
+    for rows, scores in matrix.batches():
+        for column, row in enumerate(rows):
+            order, values = top_related(scores[:, column], limit)
+            links.extend(make_links(int(matrix.post_ids[row]), matrix.post_ids[order].tolist(), values.tolist()))
+        if len(links) >= chunk_size:
+            RelatedPost.objects.bulk_create(links)
+            links = []
+    RelatedPost.objects.bulk_create(links)
+    return len(matrix)
+
+
+@transaction.atomic
+def update_related(post_ids, limit=None):
+    """
+    Инкрементальное обновление после сохранения постов: пересчитываются термы
+    и список соседей самих постов, а в чужие списки пост вставляется, только
+    если обходит их худшего соседа. Матрица собирается из сохранённых термов,
+    без разбора текстов остальных постов.
+    """
+    limit = limit or related_count()
+    posts = list(Post.objects.filter(pk__in=post_ids).only('id', 'title', 'content', 'status'))
+    published = [post for post in posts if is_candidate(post)]
+    removed = set(post_ids) - {post.pk for post in published}
+    if removed:
+        PostTerms.objects.filter(post_id__in=removed).delete()
+        RelatedPost.objects.filter(post_id__in=removed).delete()
+        RelatedPost.objects.filter(related_id__in=removed).delete()
+    if not published:
+        return 0
+    save_terms(published)
+
+    matrix = SimilarityMatrix.load()
+    changed = {post.pk for post in published}
+    # Старые оценки изменившихся постов в чужих списках больше не верны
+    RelatedPost.objects.filter(related_id__in=changed).exclude(post_id__in=changed).delete()
+    RelatedPost.objects.filter(post_id__in=changed).delete()
+
+    thresholds = {
+        row['post_id']: (row['count'], row['worst'])
+        for row in RelatedPost.objects.values('post_id').annotate(count=Count('id'), worst=Min('score'))
+    }
+    incoming = {}
+    links = []
+    for post_id in changed:
+        row = matrix.rows[post_id]
+        scores = matrix.scores(row)
+        order, values = top_related(scores, limit)
+        links.extend(make_links(post_id, matrix.post_ids[order].tolist(), values.tolist()))
+
+        for other in np.flatnonzero(scores >= MIN_SCORE).tolist():
+            other_id = int(matrix.post_ids[other])
+            if other_id in changed:
+                continue
+            count, worst = thresholds.get(other_id, (0, 0.0))
+            if count < limit or scores[other] > worst:
+                incoming.setdefault(other_id, []).append((post_id, float(scores[other])))
+    RelatedPost.objects.bulk_create(links)
+
+    # Списки, в которые входят изменённые посты, переписываются целиком с новыми позициями
+    if incoming:
+        current = {}
+        for link in RelatedPost.objects.filter(post_id__in=incoming).order_by('post_id', 'rank'):
+            current.setdefault(link.post_id, []).append((link.related_id, link.score))
+        RelatedPost.objects.filter(post_id__in=incoming).delete()
+        links = []
+        for post_id, candidates in incoming.items():
+            merged = sorted(current.get(post_id, []) + candidates, key=lambda item: -item[1])[:limit]
+            links.extend(make_links(post_id, *zip(*merged)))
+        RelatedPost.objects.bulk_create(links)
+    return len(changed)
+
+
+def related_queryset(post_id, limit=None):
+    """Один запрос по индексу (post, rank) с присоединёнными постами."""
+    return (
+        RelatedPost.objects.filter(
+            post_id=post_id, related__status=Post.STATUS_PUBLISHED, related__pub_date__lte=timezone.now()
+        )
+        .select_related('related')
+        .only('score', 'rank', 'related__id', 'related__title', 'related__slug', 'related__excerpt',
+              'related__pub_date', 'related__image', 'related__image_variants')
+        .order_by('rank')[:limit or related_count()]
+    )
+
+
+def related_versions_queryset(post_id):
+    return (
+        RelatedPost.objects.filter(
+            post_id=post_id, related__status=Post.STATUS_PUBLISHED, related__pub_date__lte=timezone.now()
+        )
+        .order_by('rank')
+        .values_list('related_id', 'related__updated_at')[:related_count()]
+    )
+
+
+def related_versions(post_id):
+    """Похожие посты и время их изменения — для ETag страницы поста."""
+    return list(related_versions_queryset(post_id))
+
+
+async def arelated_versions(post_id):
+    return [row async for row in related_versions_queryset(post_id)]
+
+
+def related_posts(post_id, limit=None):
+    return [link.related for link in related_queryset(post_id, limit)]
+
+
+async def arelated_posts(post_id, limit=None):
+    return [link.related async for link in related_queryset(post_id, limit)]
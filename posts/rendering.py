@@ -0,0 +1,57 @@
+import re
+
+import markdown
+from markdown.extensions import Extension
+from markdown.treeprocessors import Treeprocessor
+from django.utils.text import Truncator
+
+EXCERPT_WORDS = 30
+WORDS_PER_MINUTE = 200
+
+SAFE_URL_RE = re.compile(r'^(https?:|mailto:|/|#|\.|[^:]*$)', re.IGNORECASE)
+
+MARKDOWN_EXTENSIONS = ['fenced_code', 'tables', 'sane_lists']
+
+
+class SafeLinksTreeprocessor(Treeprocessor):
+    def run(self, root):
+        for element in root.iter():
+            for attribute in ('href', 'src'):
+                value = element.get(attribute)
+                if value is not None and not SAFE_URL_RE.match(value.strip()):
+                    element.set(attribute, '#')
+            if element.tag == 'a':
+                element.set('rel', 'nofollow noopener')
+
+
+class SafeMarkdownExtension(Extension):
+    """Сырой HTML выводится как текст, ссылки с небезопасными схемами вырезаются."""
+
+    def extendMarkdown(self, md):
+        md.preprocessors.deregister('html_block')
+        md.inlinePatterns.deregister('html')
+        md.treeprocessors.register(SafeLinksTreeprocessor(md), 'safe_links', 0)
+
+
+def render_markdown(text):
+    return markdown.markdown(text or '', extensions=MARKDOWN_EXTENSIONS + [SafeMarkdownExtension()])
+
+
+def render_excerpt(excerpt, content_html):
+    html = render_markdown(excerpt) if excerpt else content_html
+    return Truncator(html).words(EXCERPT_WORDS, html=True, truncate='…')
+
+
+def count_words(text):
+    return len((text or '').split())
+
+
+def render_post(post):
+    post.content_html = render_markdown(post.content)
+    post.excerpt_html = render_excerpt(post.excerpt, post.content_html)
+    post.word_count = count_words(post.content)
+    post.reading_time = max(1, post.word_count // WORDS_PER_MINUTE)
+    return post
+
+
+RENDERED_FIELDS = ['content_html', 'excerpt_html', 'word_count', 'reading_time']
@@ -0,0 +1,187 @@
+import json
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError
+from urllib.parse import quote
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+from django.db import connection
+from django.test import Client
+
+from .instrumentation import QueryRecorder, percentile
+from .models import Category, Comment, Post, Tag
+
+SERVER_TIMING_QUERIES_RE = re.compile(r'db;[^,]*desc="(\d+) queries"')
+
+SEARCH_QUERIES = ('django', 'кеш', 'индекс запрос', 'python', 'оптимизация', 'sqlite', 'лента', 'postgres миграция')
+
+
+def load_traffic(path):
+    """Смесь запросов: по строке JSON на эндпоинт с name, path, weight и необязательным method."""
+    with open(path, encoding='utf-8') as fh:
+        return [json.loads(line) for line in fh if line.strip() and not line.lstrip().startswith('#')]
+
+
+class Targets:
+    """Значения для шаблонов путей: популярные посты, категории и теги выбираются чаще."""
+
+    def __init__(self, rng, limit=500):
+        self.rng = rng
+        self.values = {
+            'post_id': list(Post.published.order_by('-views_count').values_list('pk', flat=True)[:limit]),
+            'category': list(Category.objects.filter(posts__isnull=False).distinct().values_list('slug', flat=True)),
+            'tag': list(Tag.objects.filter(posts__isnull=False).distinct().values_list('slug', flat=True)),
+            'comment_id': list(
+                Comment.objects.filter(approved=True, depth=0, post__status=Post.STATUS_PUBLISHED)
+                .values_list('pk', flat=True)[:limit]
+            ),
+            'query': list(SEARCH_QUERIES),
+        }
+        self.comment_posts = dict(
+            Comment.objects.filter(pk__in=self.values['comment_id']).values_list('pk', 'post_id')
+        )
+        self._lock = threading.Lock()
+
+    def pick(self, name):
+        values = self.values[name]
+        if not values:
+            raise LookupError(f'Нет данных для {{{name}}}: сначала запустите seed_data')
+        with self._lock:
+            # Степенное распределение: первые (самые популярные) значения выпадают чаще
+            return values[min(len(values) - 1, int(self.rng.paretovariate(1.2)) - 1)]
+
+    def fill(self, path):
+        values = {}
+        if '{comment_id}' in path:
+            values['comment_id'] = self.pick('comment_id')
+            values['post_id'] = self.comment_posts[values['comment_id']]
+        for name in re.findall(r'\{(\w+)\}', path):
+            if name not in values:
+                values[name] = self.pick(name)
+        return path.format(**{name: quote(str(value), safe='') for name, value in values.items()})
+
+
+class ClientTransport:
+    """Запросы через django.test.Client в этом же процессе; запросы к БД считаются напрямую."""
+
+    def __init__(self):
+        self._local = threading.local()
+        self.host = (settings.ALLOWED_HOSTS or ['localhost'])[0].lstrip('.').replace('*', 'localhost')
+
+    def request(self, method, path):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = Client(HTTP_HOST=self.host)
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            response = client.generic(method, path)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        return response.status_code, recorder.count
+
+
+class HTTPTransport:
+    """Запросы к запущенному серверу; число запросов к БД берётся из Server-Timing, если он есть."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+
+    def request(self, method, path):
+        try:
+            with urlopen(Request(self.base_url + path, method=method), timeout=30) as response:
+                response.read()
+                status, timing = response.status, response.headers.get('Server-Timing', '')
+        except HTTPError as exc:
+            status, timing = exc.code, exc.headers.get('Server-Timing', '')
+        match = SERVER_TIMING_QUERIES_RE.search(timing or '')
+        return status, int(match.group(1)) if match else None
+
+
+class Replay:
+    def __init__(self, traffic, transport, concurrency=4, seed=42):
+        self.traffic = traffic
+        self.transport = transport
+        self.concurrency = concurrency
+        self.rng = random.Random(seed)
+        self.targets = Targets(self.rng)
+
+    def plan(self, total):
+        weights = [entry.get('weight', 1) for entry in self.traffic]
+        entries = self.rng.choices(self.traffic, weights=weights, k=total)
+        return [(entry['name'], entry.get('method', 'GET'), self.targets.fill(entry['path'])) for entry in entries]
+
+    def run(self, total, warmup=0):
+        for name, method, path in self.plan(warmup):
+            self.transport.request(method, path)
+
+        samples = defaultdict(list)
+        lock = threading.Lock()
+
+        def send(item):
+            name, method, path = item
+            started = time.perf_counter()
+            status, queries = self.transport.request(method, path)
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                samples[name].append((elapsed, status, queries))
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            list(executor.map(send, self.plan(total)))
+        return self.report(samples, time.perf_counter() - started)
+
+    def report(self, samples, duration):
+        endpoints = {}
+        for name, rows in sorted(samples.items()):
+            latencies = [row[0] for row in rows]
+            queries = [row[2] for row in rows if row[2] is not None]
+            endpoints[name] = {
+                'requests': len(rows),
+                'errors': sum(1 for row in rows if row[1] >= 500),
+                'statuses': sorted({row[1] for row in rows}),
+                'p50_ms': round(percentile(latencies, 0.5), 2),
+                'p95_ms': round(percentile(latencies, 0.95), 2),
+                'p99_ms': round(percentile(latencies, 0.99), 2),
+                'queries': round(sum(queries) / len(queries), 2) if queries else None,
+            }
+        total = sum(endpoint['requests'] for endpoint in endpoints.values())
+        latencies = [row[0] for rows in samples.values() for row in rows]
+        return {
+            'requests': total,
+            'concurrency': self.concurrency,
+            'throughput_rps': round(total / duration, 1) if duration else None,
+            'p50_ms': round(percentile(latencies, 0.5), 2) if latencies else None,
+            'p95_ms': round(percentile(latencies, 0.95), 2) if latencies else None,
+            'endpoints': endpoints,
+        }
+
+
+def compare(baseline, current, tolerance=0.2):
+    """
+    Сравнивает отчёт с базовым: регрессия — рост p95 сверх tolerance, рост
+    среднего числа SQL-запросов хотя бы на половину запроса или новые ошибки.
+    """
+    rows = []
+    regressions = []
+    for name, now in current['endpoints'].items():
+        before = baseline['endpoints'].get(name)
+        if before is None:
+            rows.append((name, None, now['p95_ms'], None, now['queries'], 'новый'))
+            continue
+        change = (now['p95_ms'] - before['p95_ms']) / before['p95_ms'] if before['p95_ms'] else 0.0
+        notes = []
+        if change > tolerance:
+            notes.append(f'p95 +{change:.0%}')
+        if now['queries'] is not None and before['queries'] is not None and now['queries'] - before['queries'] >= 0.5:
+            notes.append(f'запросов {before["queries"]} → {now["queries"]}')
+        if now['errors'] > before['errors']:
+            notes.append(f'ошибок {now["errors"]}')
+        if notes:
+            regressions.append(name)
+        rows.append((name, before['p95_ms'], now['p95_ms'], before['queries'], now['queries'], ', '.join(notes)))
+    return rows, regressions
@@ -0,0 +1,375 @@
+import re
+from functools import lru_cache
+
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Post
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+SNIPPET_WORDS = 30
+
+SQLITE_TABLE = 'posts_post_fts'
+POSTGRES_TABLE = 'posts_post_search'
+
+
+# Стеммер Snowball для русского языка (https://snowballstem.org/algorithms/russian/stemmer.html)
+
+_VOWELS = 'аеиоуыэюя'
+
+_PERFECTIVE_GERUND = (
+    ('в', 'вши', 'вшись'),
+    ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись'),
+)
+_ADJECTIVE = (
+    'ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем', 'им', 'ым', 'ом',
+    'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую', 'юю', 'ая', 'яя', 'ою', 'ею',
+)
+_PARTICIPLE = (
+    ('ем', 'нн', 'вш', 'ющ', 'щ'),
+    ('ивш', 'ывш', 'ующ'),
+)
+_REFLEXIVE = ('ся', 'сь')
+_VERB = (
+    ('ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но', 'ет', 'ют', 'ны', 'ть', 'ешь', 'нно'),
+    ('ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей', 'уй', 'ил', 'ыл', 'им', 'ым', 'ен',
+     'ило', 'ыло', 'ено', 'ят', 'ует', 'уют', 'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю'),
+)
+_NOUN = (
+    'а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии', 'и', 'ией', 'ей', 'ой', 'ий',
+    'й', 'иям', 'ям', 'ием', 'ем', 'ам', 'ом', 'о', 'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю',
+    'ия', 'ья', 'я',
+)
+_SUPERLATIVE = ('ейше', 'ейш')
+_DERIVATIONAL = ('ость', 'ост')
+
+
+@lru_cache(maxsize=None)
+def _by_length(endings):
+    return tuple(sorted(endings, key=len, reverse=True))
+
+
+def _strip_grouped(rv, groups):
+    # Окончания первой группы допустимы только после «а» или «я»
+    first, second = groups
+    for ending in _by_length(first + second):
+        if not rv.endswith(ending):
+            continue
+        stem = rv[:-len(ending)]
+        if ending in second or stem.endswith(('а', 'я')):
+            return stem
+    return None
+
+
+def _strip(rv, endings):
+    for ending in _by_length(endings):
+        if rv.endswith(ending):
+            return rv[:-len(ending)]
+    return None
+
+
+def _region(word, start=0):
+    for i in range(start + 1, len(word)):
+        if word[i] not in _VOWELS and word[i - 1] in _VOWELS:
+            return i + 1
+    return len(word)
+
+
+def stem_russian(word):
+    word = word.lower().replace('ё', 'е')
+    rv_start = next((i + 1 for i, ch in enumerate(word) if ch in _VOWELS), len(word))
+    prefix, rv = word[:rv_start], word[rv_start:]
+
+    stem = _strip_grouped(rv, _PERFECTIVE_GERUND)
+    if stem is not None:
+        rv = stem
+    else:
+        rv = _strip(rv, _REFLEXIVE) or rv
+        adjective = _strip(rv, _ADJECTIVE)
+        if adjective is not None:
+            participle = _strip_grouped(adjective, _PARTICIPLE)
+            rv = participle if participle is not None else adjective
+        else:
+            for stripped in (_strip_grouped(rv, _VERB), _strip(rv, _NOUN)):
+                if stripped is not None:
+                    rv = stripped
+                    break
+
+    if rv.endswith('и'):
+        rv = rv[:-1]
+
+    r2_start = _region(word, _region(word) - 1)
+    for ending in _DERIVATIONAL:
+        if rv.endswith(ending) and rv_start + len(rv) - len(ending) >= r2_start:
+            rv = rv[:-len(ending)]
+            break
+
+    superlative = _strip(rv, _SUPERLATIVE)
+    if superlative is not None:
+        rv = superlative
+    if rv.endswith('нн'):
+        rv = rv[:-1]
+    elif superlative is None and rv.endswith('ь'):
+        rv = rv[:-1]
+
+    return prefix + rv
+
+
+@lru_cache(maxsize=100_000)
+def stem(word):
+    # Словарь реального текста невелик, поэтому кеш снимает почти всю стоимость стемминга
+    word = word.lower()
+    if any('а' <= ch <= 'я' or ch == 'ё' for ch in word):
+        return stem_russian(word)
+    return word
+
+
+def tokenize(text):
+    return [stem(word) for word in WORD_RE.findall(text or '')]
+
+
+def normalize(text):
+    return ' '.join(tokenize(text))
+
+
+def highlight(text, terms, size=SNIPPET_WORDS):
+    """Фрагмент текста вокруг первого совпадения, найденные слова обёрнуты в <mark>."""
+    words = (text or '').split()
+    stems = [tokenize(word) for word in words]
+
+    def matches(word_stems):
+        return any(s.startswith(term) for s in word_stems for term in terms)
+
+    first = next((i for i, word_stems in enumerate(stems) if matches(word_stems)), 0)
+    start = max(0, first - size // 3)
+    end = min(len(words), start + size)
+
+    parts = []
+    for word, word_stems in zip(words[start:end], stems[start:end]):
+        parts.append(f'<mark>{escape(word)}</mark>' if matches(word_stems) else escape(word))
+
+    snippet = ' '.join(parts)
+    if start > 0:
+        snippet = '… ' + snippet
+    if end < len(words):
+        snippet += ' …'
+    return mark_safe(snippet)
+
+
+class BaseSearchBackend:
+    def index(self, post, tag_names):
+        self.index_many([(post, tag_names)])
+
+    def index_many(self, items):
+        raise NotImplementedError
+
+    def remove(self, post_id):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def count(self, terms, query):
+        raise NotImplementedError
+
+    def search(self, terms, query, limit, offset):
+        raise NotImplementedError
+
+    def published_params(self):
+        now = connection.ops.adapt_datetimefield_value(timezone.now())
+        return [Post.STATUS_PUBLISHED, now]
+
+
+class SQLiteSearchBackend(BaseSearchBackend):
+    # FTS5 хранит уже прошедший стемминг текст, поэтому русская морфология
+    # обрабатывается нашим стеммером, а не токенизатором SQLite.
+
+    def index_many(self, items):
+        rows = [
+            (post.pk, normalize(post.title), normalize(post.content), normalize(' '.join(tag_names)))
+            for post, tag_names in items
+        ]
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {SQLITE_TABLE} WHERE rowid = %s', [row[:1] for row in rows])
+            cursor.executemany(
+                f'INSERT INTO {SQLITE_TABLE} (rowid, title, content, tags) VALUES (%s, %s, %s, %s)', rows
+            )
+
+    def remove(self, post_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {SQLITE_TABLE} WHERE rowid = %s', [post_id])
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {SQLITE_TABLE}')
+
+    def match_expression(self, terms):
+        return ' '.join(f'"{term}"*' for term in terms)
+
+    def count(self, terms, query):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT COUNT(*) FROM {SQLITE_TABLE} '
+                f'JOIN posts_post ON posts_post.id = {SQLITE_TABLE}.rowid '
+                f'WHERE {SQLITE_TABLE} MATCH %s AND posts_post.status = %s AND posts_post.pub_date <= %s',
+                [self.match_expression(terms)] + self.published_params()
+            )
+            return cursor.fetchone()[0]
+
+    def search(self, terms, query, limit, offset):
+        # Веса bm25: заголовок, текст, теги
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT {SQLITE_TABLE}.rowid FROM {SQLITE_TABLE} '
+                f'JOIN posts_post ON posts_post.id = {SQLITE_TABLE}.rowid '
+                f'WHERE {SQLITE_TABLE} MATCH %s AND posts_post.status = %s AND posts_post.pub_date <= %s '
+                f'ORDER BY bm25({SQLITE_TABLE}, 10.0, 1.0, 5.0), posts_post.pub_date DESC '
+                f'LIMIT %s OFFSET %s',
+                [self.match_expression(terms)] + self.published_params() + [limit, offset]
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    CONFIG = 'russian'
+
+    def index_many(self, items):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {POSTGRES_TABLE} (post_id, document) VALUES (%s, '
+                f"setweight(to_tsvector('{self.CONFIG}', %s), 'A') || "
+                f"setweight(to_tsvector('{self.CONFIG}', %s), 'B') || "
+                f"setweight(to_tsvector('{self.CONFIG}', %s), 'C')) "
+                f'ON CONFLICT (post_id) DO UPDATE SET document = EXCLUDED.document',
+                [(post.pk, post.title, ' '.join(tag_names), post.content) for post, tag_names in items]
+            )
+
+    def remove(self, post_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {POSTGRES_TABLE} WHERE post_id = %s', [post_id])
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'TRUNCATE {POSTGRES_TABLE}')
+
+    def count(self, terms, query):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT COUNT(*) FROM {POSTGRES_TABLE} s JOIN posts_post p ON p.id = s.post_id '
+                f"WHERE s.document @@ websearch_to_tsquery('{self.CONFIG}', %s) "
+                f'AND p.status = %s AND p.pub_date <= %s',
+                [query] + self.published_params()
+            )
+            return cursor.fetchone()[0]
+
+    def search(self, terms, query, limit, offset):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT s.post_id FROM {POSTGRES_TABLE} s JOIN posts_post p ON p.id = s.post_id, '
+                f"websearch_to_tsquery('{self.CONFIG}', %s) q "
+                f'WHERE s.document @@ q AND p.status = %s AND p.pub_date <= %s '
+                f'ORDER BY ts_rank(s.document, q) DESC, p.pub_date DESC LIMIT %s OFFSET %s',
+                [query] + self.published_params() + [limit, offset]
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+class SimpleSearchBackend(BaseSearchBackend):
+    """
+    Для баз без поддерживаемого полнотекстового поиска: индекса нет, посты
+    ищутся по вхождению основ слов в заголовок, текст и теги (icontains).
+    Медленно на больших таблицах, но сохранение постов не ломается.
+    """
+
+    def index_many(self, items):
+        pass
+
+    def remove(self, post_id):
+        pass
+
+    def clear(self):
+        pass
+
+    def queryset(self, terms):
+        condition = Q()
+        for term in terms:
+            condition &= Q(title__icontains=term) | Q(content__icontains=term) | Q(tags__name__icontains=term)
+        matching = Post.published.filter(condition).values('pk')
+        return Post.published.filter(pk__in=matching)
+
+    def count(self, terms, query):
+        return self.queryset(terms).count()
+
+    def search(self, terms, query, limit, offset):
+        return list(self.queryset(terms).order_by('-pub_date', '-id').values_list('pk', flat=True)[offset:offset + limit])
+
+
+class SearchResults:
+    """Ленивый результат поиска: Paginator запрашивает только count() и нужный срез."""
+
+    model = Post
+
+    def __init__(self, backend, query):
+        self.backend = backend
+        self.query = query
+        self.terms = tokenize(query)
+        self._count = None
+
+    def count(self):
+        if self._count is None:
+            self._count = self.backend.count(self.terms, self.query) if self.terms else 0
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        if not self.terms:
+            return []
+        start = key.start or 0
+        stop = key.stop if key.stop is not None else self.count()
+        ids = self.backend.search(self.terms, self.query, stop - start, start)
+        posts = Post.objects.select_related('category').prefetch_related('tags').in_bulk(ids)
+        results = []
+        for post_id in ids:
+            post = posts[post_id]
+            post.search_snippet = highlight(post.content, self.terms)
+            results.append(post)
+        return results
+
+
+def get_backend():
+    if connection.vendor == 'sqlite':
+        return SQLiteSearchBackend()
+    if connection.vendor == 'postgresql':
+        return PostgresSearchBackend()
+    return SimpleSearchBackend()
+
+
+def search_posts(query):
+    return SearchResults(get_backend(), query)
+
+
+def index_post(post):
+    get_backend().index(post, post.tags.values_list('name', flat=True))
+
+
+def remove_post(post_id):
+    get_backend().remove(post_id)
+
+
+def rebuild_index(chunk_size=500):
+    backend = get_backend()
+    backend.clear()
+    count = 0
+    posts = Post.objects.only('id', 'title', 'content').prefetch_related('tags')
+    for post in posts.iterator(chunk_size=chunk_size):
+        backend.index(post, [tag.name for tag in post.tags.all()])
+        count += 1
+    return count
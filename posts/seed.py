@@ -0,0 +1,187 @@
+import random
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from .importer import import_chunk
+from .models import Comment, Like, Post, PostActivity
+from .ranking import day_start
+
+STOP_WORDS = ('и', 'в', 'на', 'с', 'по', 'для', 'это', 'как', 'что', 'не', 'мы', 'они', 'было', 'будет')
+
+TERMS = (
+    'блог', 'запрос', 'индекс', 'кеш', 'django', 'python', 'база', 'данных', 'шаблон', 'сервер',
+    'поиск', 'страница', 'пост', 'комментарий', 'тег', 'категория', 'скорость', 'память', 'очередь',
+    'задача', 'профилирование', 'оптимизация', 'sqlite', 'postgres', 'markdown', 'лента', 'подписка',
+    'разработка', 'тест', 'нагрузка', 'время', 'ответ', 'клиент', 'модель', 'поле', 'миграция',
+)
+
+SYLLABLES = ('ка', 'ро', 'ли', 'на', 'те', 'ми', 'до', 'се', 'ва', 'лу', 'по', 'ре', 'ст', 'ов', 'ин')
+
+STATUS_WEIGHTS = ((Post.STATUS_PUBLISHED, 90), (Post.STATUS_DRAFT, 7), (Post.STATUS_ARCHIVED, 3))
+REPLY_PROBABILITY = 0.45
+MAX_DEPTH = 8
+ACTIVITY_DAYS = 30
+
+
+class Seeder:
+    """
+    Генератор тестового контента с «реалистичными» распределениями:
+    популярность тегов и категорий по Ципфу, длина постов логнормальная,
+    число комментариев и лайков — с тяжёлым хвостом, ответы образуют ветки.
+    """
+
+    def __init__(self, seed=42, categories=10, tags=50, users=200, authors=5,
+                 comments_per_post=8.0, likes_per_post=5.0, chunk_size=500, vocabulary=2000):
+        self.rng = random.Random(seed)
+        self.vocabulary, self.word_weights = self.build_vocabulary(vocabulary)
+        self.categories = [(f'category-{i}', f'Категория {i}') for i in range(categories)]
+        self.tags = [(f'tag-{i}', f'тег {i}') for i in range(tags)]
+        self.category_weights = [1 / (rank + 1) for rank in range(categories)]
+        self.tag_weights = [1 / (rank + 1) for rank in range(tags)]
+        self.users = users
+        self.authors = authors
+        self.comments_per_post = comments_per_post
+        self.likes_per_post = likes_per_post
+        self.chunk_size = chunk_size
+        self.now = timezone.now()
+
+    def build_vocabulary(self, size):
+        # Частоты слов по Ципфу: служебные слова встречаются везде, термины — в части постов
+        words = set(TERMS)
+        while len(words) < size:
+            words.add(''.join(self.rng.choices(SYLLABLES, k=self.rng.randint(2, 4))))
+        words = sorted(words)
+        self.rng.shuffle(words)
+        vocabulary = list(STOP_WORDS) + words
+        weights = list(accumulate(1 / (rank + 1) for rank in range(len(vocabulary))))
+        return vocabulary, weights
+
+    def words(self, count):
+        return self.rng.choices(self.vocabulary, cum_weights=self.word_weights, k=count)
+
+    def text(self, words):
+        paragraphs = []
+        while words > 0:
+            size = min(words, self.rng.randint(20, 80))
+            paragraph = self.words(size)
+            if self.rng.random() < 0.3:
+                index = self.rng.randrange(size)
+                paragraph[index] = f'**{paragraph[index]}**'
+            paragraph = ' '.join(paragraph).capitalize() + '.'
+            if self.rng.random() < 0.2:
+                paragraph = f'## {paragraph[:40]}\n\n{paragraph}'
+            paragraphs.append(paragraph)
+            words -= size
+        return '\n\n'.join(paragraphs)
+
+    def heavy_tail(self, mean):
+        # Парето с alpha=1.5 имеет среднее 3, масштабируем к нужному
+        return int(self.rng.paretovariate(1.5) * mean / 3)
+
+    def create_users(self):
+        names = [f'author{i}' for i in range(self.authors)] + [f'reader{i}' for i in range(self.users)]
+        User.objects.bulk_create(
+            [User(username=name, password='!', is_staff=name.startswith('author')) for name in names],
+            ignore_conflicts=True,
+        )
+        users = dict(User.objects.filter(username__in=names).values_list('username', 'pk'))
+        return [f'author{i}' for i in range(self.authors)], [users[f'reader{i}'] for i in range(self.users)]
+
+    def post_record(self, authors):
+        words = max(30, int(self.rng.lognormvariate(6.2, 0.6)))
+        tag_count = min(len(self.tags), self.rng.choice((0, 1, 2, 2, 3, 3, 4, 5)))
+        tags = set(self.rng.choices(self.tags, weights=self.tag_weights, k=tag_count))
+        title = ' '.join(self.words(self.rng.randint(3, 8))).capitalize()
+        return {
+            'fields': {
+                'title': title,
+                'content': self.text(words),
+                'status': self.rng.choices(*zip(*STATUS_WEIGHTS))[0],
+                'pub_date': self.now - timedelta(seconds=self.rng.randint(0, 2 * 365 * 24 * 3600)),
+                'is_featured': self.rng.random() < 0.05,
+                'views_count': self.heavy_tail(300),
+            },
+            'slug': '',
+            'author': self.rng.choice(authors),
+            'category': self.rng.choices(self.categories, weights=self.category_weights)[0],
+            'tags': sorted(tags),
+        }
+
+    def create_comments(self, posts):
+        # Дерево строится в памяти и вставляется по уровням: путь содержит pk родителя
+        levels = []
+        for post in posts:
+            nodes = []
+            for _ in range(self.heavy_tail(self.comments_per_post)):
+                parent = self.rng.choice(nodes) if nodes and self.rng.random() < REPLY_PROBABILITY else None
+                depth = parent['depth'] + 1 if parent else 0
+                if depth > MAX_DEPTH:
+                    parent, depth = None, 0
+                node = {'parent': parent, 'depth': depth, 'comment': Comment(
+                    post_id=post.pk,
+                    author_name=f'Читатель {self.rng.randint(1, self.users)}',
+                    author_email=f'reader{self.rng.randint(1, self.users)}@example.com',
+                    content=self.text(max(3, int(self.rng.lognormvariate(3, 0.8)))),
+                    approved=self.rng.random() < 0.85,
+                    is_spam=self.rng.random() < 0.03,
+                    depth=depth,
+                )}
+                nodes.append(node)
+                while len(levels) <= depth:
+                    levels.append([])
+                levels[depth].append(node)
+
+        total = 0
+        for level in levels:
+            for node in level:
+                if node['parent']:
+                    node['comment'].parent_id = node['parent']['comment'].pk
+            comments = Comment.objects.bulk_create([node['comment'] for node in level])
+            for node in level:
+                parent_path = node['parent']['comment'].path if node['parent'] else ''
+                node['comment'].path = Comment.make_path(parent_path, node['comment'].pk)
+            Comment.objects.bulk_update(comments, ['path'])
+            total += len(comments)
+        return total
+
+    def create_likes(self, posts, readers):
+        likes = []
+        for post in posts:
+            count = min(len(readers), self.heavy_tail(self.likes_per_post))
+            post.likes_count = count
+            likes.extend(Like(post_id=post.pk, user_id=user_id) for user_id in self.rng.sample(readers, count))
+        Like.objects.bulk_create(likes, ignore_conflicts=True)
+        Post.objects.bulk_update(posts, ['likes_count'])
+        return len(likes)
+
+    def create_activity(self, posts):
+        # Суточные корзины для рейтингов: у каждого поста несколько активных дней за месяц
+        today = day_start(self.now)
+        buckets = []
+        for post in posts:
+            if post.status != Post.STATUS_PUBLISHED:
+                continue
+            for day in self.rng.sample(range(ACTIVITY_DAYS), self.rng.randint(0, 5)):
+                buckets.append(PostActivity(
+                    post_id=post.pk, period=PostActivity.PERIOD_DAY, started_at=today - timedelta(days=day),
+                    views=self.heavy_tail(30), likes=self.heavy_tail(1),
+                ))
+        PostActivity.objects.bulk_create(buckets, ignore_conflicts=True)
+        return len(buckets)
+
+    def run(self, posts):
+        authors, readers = self.create_users()
+        stats = {'posts': 0, 'comments': 0, 'likes': 0, 'activity': 0}
+        for start in range(0, posts, self.chunk_size):
+            records = [self.post_record(authors) for _ in range(min(self.chunk_size, posts - start))]
+            with transaction.atomic():
+                created = import_chunk(records)
+                stats['posts'] += len(created)
+                stats['comments'] += self.create_comments(created)
+                stats['likes'] += self.create_likes(created, readers)
+                stats['activity'] += self.create_activity(created)
+        return stats
@@ -1,12 +1,15 @@
 from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
 from django.contrib.auth.models import User
-from .models import Post, Category, Tag, Comment, Like, Subscription
+from .images import variant_urls
+from .models import Post, Category, Tag, Comment, Like, RelatedPost, Subscription
 
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
-        fields = ['id', 'username', 'email', 'first_name', 'last_name']
+        # email автора публично не отдаётся
+        fields = ['id', 'username', 'first_name', 'last_name']
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -28,18 +31,121 @@ class CommentSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'approved', 'created_at']
 
 
-class PostListSerializer(serializers.ModelSerializer):
+class CommentTreeSerializer(serializers.ModelSerializer):
+    replies = serializers.SerializerMethodField()
+    hidden_replies = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Comment
+        fields = ['id', 'parent', 'author_name', 'author_website', 'content', 'depth', 'created_at',
+                  'hidden_replies', 'replies']
+
+    def get_replies(self, obj):
+        return CommentTreeSerializer(obj.children, many=True, context=self.context).data
+
+
+POST_RELATIONS = {
+    'author': UserSerializer.Meta.fields,
+    'category': CategorySerializer.Meta.fields,
+    'tags': TagSerializer.Meta.fields,
+}
+
+
+def parse_names(value):
+    return [name for name in (part.strip() for part in value.split(',')) if name]
+
+
+class Fieldset:
+    """
+    Поля ответа из ?fields= и ?expand=. Без параметров отдаётся полное
+    представление со вложенными объектами; с параметрами связи, не указанные
+    в expand, отдаются идентификаторами.
+    """
+
+    def __init__(self, available, fields=None, expand=None):
+        fields = set(available if fields is None else fields)
+        self.fields = [name for name in available if name in fields]
+        self.expand = set(POST_RELATIONS if expand is None else expand) & fields
+
+    @classmethod
+    def from_request(cls, request, available):
+        # Подходит и Request из DRF, и обычный HttpRequest асинхронных представлений
+        params = getattr(request, 'query_params', request.GET)
+        fields = params.get('fields')
+        expand = params.get('expand')
+        if fields is None and expand is None:
+            return cls(available)
+
+        fields = parse_names(fields) if fields else list(available)
+        expand = parse_names(expand) if expand else []
+        unknown = [name for name in fields if name not in available]
+        if unknown:
+            raise ValidationError({'fields': f'Неизвестные поля: {", ".join(unknown)}'})
+        unknown = [name for name in expand if name not in POST_RELATIONS]
+        if unknown:
+            raise ValidationError({'expand': f'Нельзя раскрыть поля: {", ".join(unknown)}'})
+        return cls(available, fields, expand)
+
+    def columns(self):
+        """Колонки для only()/values() и связи для select_related() под выбранные поля."""
+        columns = ['id', 'pub_date']
+        related = []
+        for name in self.fields:
+            if name in ('id', 'pub_date', 'tags', 'comments'):
+                continue
+            if name in self.expand:
+                related.append(name)
+                columns.extend(f'{name}__{field}' for field in POST_RELATIONS[name])
+            else:
+                columns.append(name)
+        return columns, related
+
+    def narrow(self, queryset):
+        """Queryset одного поста, который читает только нужное выбранным полям."""
+        columns, related = self.columns()
+        queryset = queryset.select_related(*related).only(*columns)
+        if 'tags' in self.fields:
+            queryset = queryset.prefetch_related('tags')
+        if 'comments' in self.fields:
+            queryset = queryset.prefetch_related('comments')
+        return queryset
+
+
+class SparseFieldsetMixin:
+    def __init__(self, *args, fieldset=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fieldset is None:
+            return
+        for name in list(self.fields):
+            if name not in fieldset.fields:
+                self.fields.pop(name)
+            elif name in POST_RELATIONS and name not in fieldset.expand:
+                self.fields[name] = serializers.PrimaryKeyRelatedField(read_only=True, many=name == 'tags')
+
+
+def build_url(request):
+    url = Post._meta.get_field('image').storage.url
+    if request is None:
+        return url
+    return lambda name: request.build_absolute_uri(url(name))
+
+
+class PostListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
     category = CategorySerializer(read_only=True)
     tags = TagSerializer(many=True, read_only=True)
+    image_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = Post
         fields = [
             'id', 'title', 'slug', 'excerpt', 'author', 'category', 'tags',
-            'image', 'pub_date', 'views_count', 'likes_count', 'reading_time'
+            'image', 'image_variants', 'pub_date', 'views_count', 'likes_count', 'reading_time'
         ]
 
+    def get_image_variants(self, obj):
+        return variant_urls(obj.image_variants, build_url(self.context.get('request')))
+
 
 class PostDetailSerializer(PostListSerializer):
     comments = CommentSerializer(many=True, read_only=True)
@@ -48,6 +154,99 @@ class PostDetailSerializer(PostListSerializer):
         fields = PostListSerializer.Meta.fields + ['content', 'comments']
 
 
+class PostRowSerializer:
+    """
+    Быстрый путь списка постов: строки .values() превращаются в словари без
+    создания моделей и вложенных сериализаторов на каждую строку. Вывод
+    совпадает с PostListSerializer.
+    """
+
+    datetime_field = serializers.DateTimeField()
+
+    def __init__(self, fieldset, request=None):
+        self.fieldset = fieldset
+        self.request = request
+
+    def values(self, queryset):
+        columns, _ = self.fieldset.columns()
+        return queryset.values(*columns)
+
+    def tag_rows(self, post_ids):
+        columns = [f'tag__{field}' for field in POST_RELATIONS['tags']] if self.expand_tags else ['tag_id']
+        return (
+            Post.tags.through.objects.filter(post_id__in=post_ids)
+            .order_by(*(f'tag__{field}' for field in Tag._meta.ordering), 'tag_id')
+            .values_list('post_id', *columns)
+        )
+
+    @property
+    def expand_tags(self):
+        return 'tags' in self.fieldset.expand
+
+    def group_tags(self, rows):
+        tags = {}
+        for post_id, *values in rows:
+            tags.setdefault(post_id, []).append(
+                dict(zip(POST_RELATIONS['tags'], values)) if self.expand_tags else values[0]
+            )
+        return tags
+
+    def load_tags(self, post_ids):
+        return self.group_tags(self.tag_rows(post_ids))
+
+    async def aload_tags(self, post_ids):
+        return self.group_tags([row async for row in self.tag_rows(post_ids)])
+
+    def needs_tags(self, rows):
+        return 'tags' in self.fieldset.fields and bool(rows)
+
+    async def aserialize(self, rows):
+        rows = list(rows)
+        tags = await self.aload_tags([row['id'] for row in rows]) if self.needs_tags(rows) else {}
+        return self.serialize(rows, tags)
+
+    def serialize(self, rows, tags=None):
+        rows = list(rows)
+        fields = self.fieldset.fields
+        expand = self.fieldset.expand
+        if tags is None:
+            tags = self.load_tags([row['id'] for row in rows]) if self.needs_tags(rows) else {}
+        url = build_url(self.request)
+
+        data = []
+        for row in rows:
+            item = {}
+            for name in fields:
+                if name == 'tags':
+                    item[name] = tags.get(row['id'], [])
+                elif name in expand:
+                    item[name] = None if row[f'{name}__id'] is None else {
+                        field: row[f'{name}__{field}'] for field in POST_RELATIONS[name]
+                    }
+                elif name == 'image':
+                    item[name] = url(row['image']) if row['image'] else None
+                elif name == 'image_variants':
+                    item[name] = variant_urls(row['image_variants'], url)
+                elif name == 'pub_date':
+                    item[name] = self.datetime_field.to_representation(row['pub_date'])
+                else:
+                    item[name] = row[name]
+            data.append(item)
+        return data
+
+
+class RelatedPostSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(source='related.id')
+    title = serializers.CharField(source='related.title')
+    slug = serializers.CharField(source='related.slug')
+    excerpt = serializers.CharField(source='related.excerpt')
+    pub_date = serializers.DateTimeField(source='related.pub_date')
+
+    class Meta:
+        model = RelatedPost
+        fields = ['id', 'title', 'slug', 'excerpt', 'pub_date', 'score']
+
+
 class LikeSerializer(serializers.ModelSerializer):
     class Meta:
         model = Like
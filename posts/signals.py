@@ -1,10 +1,193 @@
-from django.db.models.signals import post_save
+from django.conf import settings
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
 from django.dispatch import receiver
-from .models import Comment
+from django.utils import timezone
+from .models import Category, Comment, NewsletterDelivery, Post, Tag
+from . import search
+from .cache import fragment_cache
+from .navigation import invalidate_navigation
+from .prerender import affected_paths, post_path, schedule_prerender
+from .ranking import invalidate_rankings
+from .queue import enqueue
+
+
+@receiver(post_save, sender=Comment)
+def handle_new_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        # Уведомления и автомодерация выполняются фоновым обработчиком (run_worker)
+        enqueue('comment.created', {'comment_id': instance.pk})
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    search.remove_post(instance.pk)
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def reindex_post_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse and action == 'pre_clear':
+        instance._cleared_post_ids = list(instance.posts.values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        # Изменились посты у тега: переиндексируем затронутые посты
+        post_ids = pk_set if action != 'post_clear' else getattr(instance, '_cleared_post_ids', [])
+        for post in Post.objects.filter(pk__in=post_ids):
+            search.index_post(post)
+    else:
+        search.index_post(instance)
+
+
+@receiver(post_save, sender=Tag)
+def reindex_tag_posts(sender, instance, created, raw=False, **kwargs):
+    if raw or created:
+        return
+    for post in instance.posts.all():
+        search.index_post(post)
+
+
+@receiver(post_save, sender=Post)
+def invalidate_post_fragments(sender, instance, update_fields=None, **kwargs):
+    # updated_at входит в ключ фрагмента; сбрасываем кеш, только если он не изменился
+    if update_fields is not None and 'updated_at' not in update_fields:
+        fragment_cache.invalidate()
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def invalidate_tag_fragments(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        fragment_cache.invalidate()
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_fragments(sender, **kwargs):
+    fragment_cache.invalidate()
+
+
+@receiver(post_save, sender=Post)
+def invalidate_post_navigation(sender, instance, update_fields=None, **kwargs):
+    # Счётчики и производные поля на навигацию не влияют
+    if update_fields is None or {'status', 'pub_date', 'category'} & set(update_fields):
+        invalidate_navigation()
+
+
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_navigation_data(sender, **kwargs):
+    invalidate_navigation()
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def invalidate_tag_cloud(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_navigation()
+
+
+@receiver(post_save, sender=Post)
+def invalidate_post_rankings(sender, instance, update_fields=None, **kwargs):
+    # Топы пересчитывает периодическая задача; здесь сбрасываются только данные постов в них
+    if update_fields is None or {'status', 'pub_date', 'category', 'title', 'slug'} & set(update_fields):
+        invalidate_rankings()
+
+
+@receiver(post_delete, sender=Post)
+def invalidate_deleted_post_rankings(sender, **kwargs):
+    invalidate_rankings()
+
+
+@receiver(post_save, sender=Post)
+def schedule_newsletter(sender, instance, raw=False, **kwargs):
+    if raw or not instance.was_just_published:
+        return
+    instance._loaded_status = instance.status
+    delivery, _ = NewsletterDelivery.objects.get_or_create(post=instance)
+    if delivery.status != NewsletterDelivery.STATUS_DONE:
+        # Отложенные посты рассылаются в момент публикации
+        enqueue('newsletter.send', {'post_id': instance.pk}, run_at=max(instance.pub_date, timezone.now()))
+
+
+@receiver(post_save, sender=Post)
+def schedule_related_update(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and not {'title', 'content', 'status'} & set(update_fields)):
+        return
+    enqueue('related.update', {'post_ids': [instance.pk]})
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def schedule_related_tags_update(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        post_ids = pk_set if action != 'post_clear' else getattr(instance, '_cleared_post_ids', [])
+    else:
+        post_ids = [instance.pk]
+    if post_ids:
+        enqueue('related.update', {'post_ids': sorted(post_ids)})
+
+
+@receiver(post_save, sender=Post)
+def schedule_image_variants(sender, instance, raw=False, **kwargs):
+    if raw or 'image' in instance.get_deferred_fields():
+        return
+    name = instance.image.name or ''
+    if name == getattr(instance, '_loaded_image', ''):
+        return
+    instance._loaded_image = name
+    if instance.image_variants:
+        # Копии старого изображения больше не подходят
+        instance.image_variants = {}
+        Post.objects.filter(pk=instance.pk).update(image_variants={})
+    if name:
+        enqueue('image.variants', {'post_id': instance.pk})
+
+
+@receiver(post_save, sender=Post)
+def prerender_post(sender, instance, raw=False, **kwargs):
+    if not raw:
+        schedule_prerender(post_ids=[instance.pk])
+
+
+@receiver(pre_delete, sender=Post)
+def prerender_deleted_post(sender, instance, **kwargs):
+    # Страницы, где показан пост, ищутся до удаления: связи карты зависимостей удалятся вместе с ним
+    if getattr(settings, 'PRERENDER_ENABLED', False):
+        schedule_prerender(paths=affected_paths([instance.pk]))
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def prerender_post_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        post_ids = pk_set if action != 'post_clear' else getattr(instance, '_cleared_post_ids', [])
+    else:
+        post_ids = [instance.pk]
+    schedule_prerender(post_ids=post_ids)
+
 
 @receiver(post_save, sender=Comment)
-def handle_new_comment(sender, instance, created, **kwargs):
-    if created:
-        # Здесь может быть логика отправки уведомлений
-        # или автоматической модерации
-        pass
\ No newline at end of file
+def prerender_comment_post(sender, instance, raw=False, **kwargs):
+    # Комментарий виден на странице поста только после одобрения: перерисовка
+    # нужна, если он одобрен сейчас или был одобрен до снятия одобрения
+    was_approved = getattr(instance, '_loaded_approved', False)
+    instance._loaded_approved = instance.approved
+    if not raw and (instance.approved or was_approved):
+        schedule_prerender(paths=[post_path(instance.post_id)])
+
+
+@receiver(post_delete, sender=Comment)
+def prerender_deleted_comment_post(sender, instance, **kwargs):
+    schedule_prerender(paths=[post_path(instance.post_id)])
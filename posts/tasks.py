@@ -0,0 +1,121 @@
+import logging
+import re
+
+from django.conf import settings
+from django.core.mail import send_mail
+from django.template.loader import render_to_string
+from django.utils import timezone
+from PIL import Image
+
+from .images import generate_variants
+from .models import Comment, Post
+from .newsletter import send_newsletter
+from .prerender import PageRenderer, affected_paths
+from .ranking import refresh_rankings, rollup_activity
+from .related import update_related
+from .queue import purge_finished, task
+
+logger = logging.getLogger(__name__)
+
+LINK_RE = re.compile(r'https?://|www\.', re.IGNORECASE)
+
+SPAM_WORDS = (
+    'casino', 'viagra', 'crypto', 'bitcoin', 'loan', 'казино', 'кредит', 'ставки', 'заработок', 'биткоин',
+)
+
+
+def spam_score(comment):
+    text = comment.content.lower()
+    score = 0.0
+
+    links = len(LINK_RE.findall(comment.content))
+    score += min(links, 5) * 0.2
+    if comment.author_website:
+        score += 0.1
+    score += sum(0.3 for word in SPAM_WORDS if word in text)
+
+    letters = [ch for ch in comment.content if ch.isalpha()]
+    if len(letters) > 20 and sum(ch.isupper() for ch in letters) / len(letters) > 0.6:
+        score += 0.3
+    if len(text.strip()) < 3:
+        score += 0.3
+    return min(score, 1.0)
+
+
+@task('comment.created')
+def process_new_comments(payloads):
+    ids = [payload['comment_id'] for payload in payloads]
+    comments = list(
+        Comment.objects.filter(pk__in=ids, approved=False).select_related('post').order_by('pk')
+    )
+    threshold = getattr(settings, 'COMMENT_SPAM_THRESHOLD', 0.6)
+
+    spam = []
+    for comment in comments:
+        comment.is_spam = spam_score(comment) >= threshold
+        if comment.is_spam:
+            spam.append(comment)
+    if spam:
+        Comment.objects.bulk_update(spam, ['is_spam'])
+
+    pending = [comment for comment in comments if not comment.is_spam]
+    recipients = getattr(settings, 'MODERATOR_EMAILS', [settings.CONTACT_EMAIL])
+    if pending and recipients:
+        # Одно письмо модераторам на всю пачку комментариев
+        send_mail(
+            subject=f'Новые комментарии на модерации: {len(pending)}',
+            message=render_to_string('posts/email/comments_moderation.txt', {'comments': pending}),
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            recipient_list=recipients,
+        )
+
+
+@task('newsletter.send')
+def send_post_newsletters(payloads):
+    posts = Post.published.filter(pk__in=[payload['post_id'] for payload in payloads])
+    for post in posts:
+        send_newsletter(post)
+
+
+@task('image.variants')
+def generate_post_images(payloads):
+    posts = Post.objects.filter(pk__in=[payload['post_id'] for payload in payloads]).exclude(image='')
+    for post in posts.only('id', 'image'):
+        # Битый файл не должен валить задачи остальных постов пачки
+        try:
+            variants = generate_variants(post.image)
+        except (OSError, ValueError, Image.DecompressionBombError):
+            logger.exception('Не удалось создать копии изображения поста %s', post.pk)
+            continue
+        # updated_at сдвигается, чтобы закешированные карточки перерисовались с srcset;
+        # если изображение успели заменить, результат отбрасывается
+        Post.objects.filter(pk=post.pk, image=post.image.name).update(
+            image_variants=variants, updated_at=timezone.now()
+        )
+
+
+@task('related.update')
+def update_related_posts(payloads):
+    # Одна сборка матрицы на всю пачку изменённых постов
+    post_ids = {post_id for payload in payloads for post_id in payload['post_ids']}
+    update_related(sorted(post_ids))
+
+
+@task('ranking.refresh', every=getattr(settings, 'RANKING_REFRESH_INTERVAL', 600))
+def refresh_post_rankings(payloads):
+    # Payload не нужен: пересчёт целиком, сколько бы задач ни попало в пачку
+    rollup_activity()
+    refresh_rankings()
+
+
+@task('prerender.pages')
+def prerender_pages(payloads):
+    # Каждая затронутая страница пачки перерисовывается один раз
+    post_ids = {post_id for payload in payloads for post_id in payload.get('post_ids', ())}
+    paths = {path for payload in payloads for path in payload.get('paths', ())}
+    PageRenderer().render_many(paths | affected_paths(sorted(post_ids)))
+
+
+@task('queue.purge', every=getattr(settings, 'JOB_PURGE_INTERVAL', 3600))
+def purge_finished_jobs(payloads):
+    purge_finished()
@@ -1,8 +1,26 @@
 from django import template
 
+from posts.images import srcset
+
 register = template.Library()
 
 @register.filter
 def reading_time(text):
     words = len(text.split())
-    return max(1, words // 200)
\ No newline at end of file
+    return max(1, words // 200)
+
+@register.inclusion_tag('posts/includes/post_image.html')
+def post_image(post, sizes='100vw'):
+    """<picture> с WebP/JPEG srcset; пока копий нет — исходное изображение."""
+    variants = post.image_variants or {}
+    url = post.image.storage.url
+    jpeg = variants.get('jpeg') or []
+    return {
+        'post': post,
+        'src': url(jpeg[-1][1]) if jpeg else post.image.url,
+        'webp_srcset': srcset(variants, 'webp', url),
+        'jpeg_srcset': srcset(variants, 'jpeg', url),
+        'width': variants.get('width'),
+        'height': variants.get('height'),
+        'sizes': sizes,
+    }
@@ -1,3 +1,1121 @@
-from django.test import TestCase
+import base64
+import gzip
+import json
+import os
+import tempfile
+import uuid
+from datetime import timedelta
+from importlib import import_module
+from io import BytesIO, StringIO
+from unittest import skipUnless
+from unittest.mock import patch
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection, connections
+from django.core.cache import cache, caches
+from django.core.files.base import ContentFile
+from django.core import mail
+from django.core.management import call_command
+from django.template.loader import render_to_string
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from . import importer
+from .async_views import post_detail, post_list, sync_post_detail, sync_post_list
+from .cache import FragmentCache
+from .counters import ViewCounter, view_counter
+from .db import REPLICA_ALIAS, PrimaryReplicaRouter, replica_reads, sqlite_pragmas
+from .export import accepts_gzip
+from .feeds import FEED_CACHE_ALIAS, LatestPostsFeed
+from .forms import CommentForm
+from .importer import import_posts
+from .instrumentation import QueryRecorder, fingerprint, request_stats
+from .models import (
+    Post, Category, Comment, Job, Like, NewsletterDelivery, PostActivity, RankedPost, RelatedPost, RenderedPage,
+    Subscription, Tag,
+)
+from .navigation import get_navigation, invalidate_navigation
+from .newsletter import NewsletterInterrupted, claim_delivery, save_delivery, send_batch, send_newsletter
+from .pagination import CursorPaginator, PostCursorPagination, encode_cursor
+from .prerender import PageRenderer, affected_paths
+from .queue import PERIODIC, purge_finished, schedule_periodic
+from .ranking import get_rankings, invalidate_rankings, record_activity, refresh_rankings, rollup_activity
+from .related import rebuild_related, related_posts, update_related
+from .rendering import EXCERPT_WORDS, render_markdown
+from .search import SimpleSearchBackend, get_backend as get_search_backend, search_posts, stem
+from .serializers import Fieldset, PostListSerializer, PostRowSerializer
+from .tasks import generate_post_images, process_new_comments, spam_score
+from .throttling import parse_rate, throttle_stats
+from .views import PostDetailView
+
+
+def create_posts(count, category=None, tags=(), drafts=()):
+    """Посты «Пост i» со slug post-i; номера из drafts остаются черновиками."""
+    posts = []
+    for i in range(count):
+        post = Post.objects.create(
+            title=f'Пост {i}', slug=f'post-{i}', content='текст', category=category,
+            status=Post.STATUS_DRAFT if i in drafts else Post.STATUS_PUBLISHED,
+        )
+        if tags:
+            post.tags.add(*tags)
+        posts.append(post)
+    return posts
+
+
+@skipUnless(connection.vendor == 'sqlite', 'План запроса проверяется только для SQLite')
+class PublishedQueryPlanTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Python', slug='python')
+        cls.tag = Tag.objects.create(name='django', slug='django')
+        create_posts(20, category=cls.category, tags=[cls.tag], drafts=range(0, 20, 2))
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_published_manager(self):
+        self.assertEqual(Post.published.count(), 10)
+
+    def test_list_query(self):
+        self.assertUsesIndex(Post.published.all(), 'post_status_pub_date_idx')
+
+    def test_category_query(self):
+        self.assertUsesIndex(Post.published.filter(category=self.category), 'post_category_pub_date_idx')
+
+    def test_tag_query(self):
+        self.assertUsesIndex(Post.published.filter(tags=self.tag), 'post_status_pub_date_idx')
+
+    def test_feed_query(self):
+        self.assertUsesIndex(Post.published.all()[:10], 'post_status_pub_date_idx')
+
+
+class PostRowSerializerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create(username='author', email='author@example.com')
+        category = Category.objects.create(name='Python', slug='python')
+        tags = [Tag.objects.create(name=name, slug=name) for name in ('orm', 'django')]
+        for i in range(6):
+            post = Post.objects.create(
+                title=f'Пост {i}', slug=f'post-{i}', content='текст', status=Post.STATUS_PUBLISHED,
+                author=author if i % 2 else None, category=category if i % 3 else None,
+                image='posts/cover.jpg' if i == 0 else None,
+            )
+            post.tags.set(tags[:i % 3])
+
+    def serialize(self, params=None):
+        request = Request(APIRequestFactory().get('/api/v1/posts/', params or {}))
+        fieldset = Fieldset.from_request(request, PostListSerializer.Meta.fields)
+        posts = Post.objects.order_by('-pub_date', '-id')
+
+        expected = PostListSerializer(
+            posts.select_related('author', 'category').prefetch_related('tags'),
+            many=True, fieldset=fieldset, context={'request': request},
+        ).data
+        serializer = PostRowSerializer(fieldset, request=request)
+        return serializer.serialize(serializer.values(posts)), [dict(item) for item in expected]
+
+    def test_matches_model_serializer(self):
+        rows, expected = self.serialize()
+        self.assertEqual(rows, expected)
+        self.assertNotIn('email', rows[-2]['author'])
+
+    def test_sparse_fieldset(self):
+        rows, expected = self.serialize({'fields': 'id,author,category,tags', 'expand': 'category'})
+        self.assertEqual(rows, expected)
+        self.assertEqual(list(rows[0]), ['id', 'author', 'category', 'tags'])
+
+
+class AsyncPostAPITests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Python', slug='python')
+        tag = Tag.objects.create(name='orm', slug='orm')
+        cls.post = create_posts(3, category=category, tags=[tag], drafts=[0])[-1]
+
+    def assertSameResponse(self, path, sync_view, async_view, **kwargs):
+        factory = RequestFactory()
+        expected = sync_view(factory.get(path, HTTP_ACCEPT='application/json'), **kwargs).render()
+        response = async_to_sync(async_view)(factory.get(path, HTTP_ACCEPT='application/json'), **kwargs)
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(json.loads(response.content), json.loads(expected.content))
+        self.assertEqual(response.get('ETag'), expected.get('ETag'))
+
+    def test_list_matches_viewset(self):
+        self.assertSameResponse('/api/v1/posts/', sync_post_list, post_list)
+        self.assertSameResponse('/api/v1/posts/?fields=id,title,tags&expand=tags', sync_post_list, post_list)
+        self.assertSameResponse('/api/v1/posts/?category=999', sync_post_list, post_list)
+
+    def test_detail_matches_viewset(self):
+        self.assertSameResponse(f'/api/v1/posts/{self.post.pk}/', sync_post_detail, post_detail, pk=self.post.pk)
+        draft = Post.objects.get(status=Post.STATUS_DRAFT)
+        self.assertSameResponse(f'/api/v1/posts/{draft.pk}/', sync_post_detail, post_detail, pk=draft.pk)
+
+
+class NavigationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.root = Category.objects.create(name='Разработка', slug='dev')
+        cls.child = Category.objects.create(name='Python', slug='python', parent=cls.root)
+        hidden = Category.objects.create(name='Скрытая', slug='hidden', parent=cls.root, is_active=False)
+        Category.objects.create(name='Внутри скрытой', slug='nested', parent=hidden)
+        tags = [Tag.objects.create(name=name, slug=name) for name in ('orm', 'django', 'empty')]
+        for i, category in enumerate([cls.root, cls.child, cls.child, cls.child, hidden]):
+            post = Post.objects.create(
+                title=f'Пост {i}', slug=f'post-{i}', content='текст', category=category,
+                status=Post.STATUS_DRAFT if i == 3 else Post.STATUS_PUBLISHED,
+            )
+            post.tags.set(tags[:1] if i else tags[:2])
+
+    def setUp(self):
+        invalidate_navigation()
+
+    def test_category_tree_rolls_up_counts(self):
+        with self.assertNumQueries(2):
+            navigation = get_navigation()
+        [root] = navigation.categories
+        self.assertEqual((root.slug, root.post_count, root.total_count), ('dev', 1, 3))
+        self.assertEqual([(node.slug, node.total_count) for node in root.children], [('python', 2)])
+        self.assertEqual([node.slug for node in navigation.flat_categories()], ['dev', 'python'])
+
+    def test_tag_cloud_weights(self):
+        tags = {tag.slug: tag for tag in get_navigation().tags}
+        self.assertEqual(set(tags), {'orm', 'django'})
+        self.assertEqual((tags['orm'].post_count, tags['orm'].weight), (4, 5))
+        self.assertEqual((tags['django'].post_count, tags['django'].weight), (1, 1))
+
+    def test_invalidated_on_changes(self):
+        get_navigation()
+        with self.assertNumQueries(0):
+            get_navigation()
+        self.child.name = 'Python 3'
+        self.child.save()
+        self.assertEqual(get_navigation().categories[0].children[0].name, 'Python 3')
+
+
+class RelatedPostsTests(TestCase):
+    TEXTS = {
+        'django-orm': ('Запросы Django ORM', 'Оптимизация запросов django orm: select_related и индексы базы'),
+        'django-cache': ('Кеширование в Django', 'Кеш шаблонов django и запросов к базе'),
+        'garden': ('Весенний сад', 'Посадка томатов и огурцов в теплице весной'),
+        'garden-2': ('Теплица для томатов', 'Как выбрать теплицу: томаты, огурцы и полив'),
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tag = Tag.objects.create(name='python', slug='python')
+        cls.posts = {}
+        for slug, (title, content) in cls.TEXTS.items():
+            cls.posts[slug] = Post.objects.create(title=title, slug=slug, content=content,
+                                                  status=Post.STATUS_PUBLISHED)
+        cls.posts['django-orm'].tags.add(cls.tag)
+        cls.posts['django-cache'].tags.add(cls.tag)
+
+    def related_slugs(self, slug):
+        return [post.slug for post in related_posts(self.posts[slug].pk)]
+
+    def test_rebuild_finds_similar_posts(self):
+        rebuild_related(limit=2)
+        self.assertEqual(self.related_slugs('django-orm'), ['django-cache'])
+        self.assertEqual(self.related_slugs('garden'), ['garden-2'])
+
+    def test_incremental_update_matches_rebuild(self):
+        rebuild_related(limit=2)
+        post = self.posts['django-cache']
+        post.title, post.content = 'Огурцы в теплице', 'Полив томатов и огурцов в теплице'
+        post.save()
+        update_related([post.pk], limit=2)
+        incremental = {slug: self.related_slugs(slug) for slug in self.posts}
+        rebuild_related(limit=2)
+        self.assertEqual(incremental, {slug: self.related_slugs(slug) for slug in self.posts})
+
+    def test_unpublished_post_is_removed(self):
+        rebuild_related(limit=2)
+        post = self.posts['garden-2']
+        post.status = Post.STATUS_DRAFT
+        post.save()
+        update_related([post.pk], limit=2)
+        self.assertEqual(self.related_slugs('garden'), [])
+        self.assertFalse(RelatedPost.objects.filter(post=post).exists())
+
+    def test_api_reads_single_query(self):
+        rebuild_related(limit=2)
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/v1/posts/{self.posts["garden"].pk}/related/')
+        self.assertEqual([item['slug'] for item in response.json()], ['garden-2'])
+
+
+class RankingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.python = Category.objects.create(name='Python', slug='python')
+        cls.garden = Category.objects.create(name='Сад', slug='garden')
+        cls.old = Post.objects.create(title='Старый хит', slug='old', content='текст', category=cls.python,
+                                      status=Post.STATUS_PUBLISHED)
+        cls.fresh = Post.objects.create(title='Свежий', slug='fresh', content='текст', category=cls.garden,
+                                        status=Post.STATUS_PUBLISHED)
+        cls.draft = Post.objects.create(title='Черновик', slug='draft', content='текст', category=cls.garden,
+                                        status=Post.STATUS_DRAFT)
+
+    def setUp(self):
+        self.now = timezone.now()
+        invalidate_rankings()
+
+    def test_rollup_preserves_totals(self):
+        for hours in (80, 79, 78, 2):
+            record_activity(views={self.old.pk: 10}, likes={self.old.pk: 1}, now=self.now - timedelta(hours=hours))
+        rollup_activity(now=self.now)
+        buckets = PostActivity.objects.filter(post=self.old)
+        self.assertEqual(buckets.filter(period=PostActivity.PERIOD_HOUR).count(), 1)
+        self.assertTrue(buckets.filter(period=PostActivity.PERIOD_DAY).exists())
+        self.assertEqual(sum(bucket.views for bucket in buckets), 40)
+        self.assertEqual(sum(bucket.likes for bucket in buckets), 4)
+
+    def test_trending_decays_and_popular_does_not(self):
+        record_activity(views={self.old.pk: 500}, now=self.now - timedelta(days=6))
+        record_activity(views={self.fresh.pk: 100, self.draft.pk: 1000}, now=self.now - timedelta(hours=1))
+        refresh_rankings(now=self.now)
+        rankings = get_rankings()
+        self.assertEqual([item.id for item in rankings.trending], [self.fresh.pk, self.old.pk])
+        self.assertEqual([item.id for item in rankings.popular], [self.old.pk, self.fresh.pk])
+        self.assertEqual([item.id for item in rankings.top(RankedPost.LIST_POPULAR, self.garden.pk)], [self.fresh.pk])
+
+    def test_api_is_cached(self):
+        record_activity(views={self.old.pk: 5, self.fresh.pk: 3}, now=self.now)
+        refresh_rankings(now=self.now)
+        self.client.get('/api/v1/posts/trending/')
+        with self.assertNumQueries(0):
+            response = self.client.get(f'/api/v1/posts/trending/?list=popular&category={self.python.pk}')
+        self.assertEqual([item['slug'] for item in response.json()['results']], ['old'])
+        self.assertEqual(self.client.get('/api/v1/posts/trending/?list=unknown').status_code, 400)
+
+    def test_periodic_refresh_is_rescheduled(self):
+        schedule_periodic(now=self.now)
+        schedule_periodic(now=self.now)
+        job = Job.objects.get(task='ranking.refresh')
+        Job.objects.filter(pk=job.pk).update(status=Job.STATUS_DONE)
+        schedule_periodic(now=self.now)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_PENDING)
+        self.assertEqual(job.run_at, self.now + PERIODIC['ranking.refresh'])
+
+
+@override_settings(THROTTLE_RATES={'comment': '2/min', 'like': '1/min'})
+class ThrottleTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        [cls.post] = create_posts(1)
+        cls.user = User.objects.create_user('reader', password='secret')
+
+    def setUp(self):
+        cache.clear()
+        throttle_stats.reset()
+
+    def test_parse_rate(self):
+        self.assertEqual(parse_rate('5/min'), (5, 5 / 60))
+        self.assertEqual(parse_rate('10/5m'), (10, 10 / 300))
+        with self.assertRaises(ValueError):
+            parse_rate('often')
+
+    def test_comment_form_is_limited_per_ip(self):
+        url = self.post.get_absolute_url()
+        data = {'author_name': 'Читатель', 'author_email': 'reader@example.com', 'content': 'Спасибо за пост'}
+        for _ in range(2):
+            self.assertEqual(self.client.post(url, data, HTTP_USER_AGENT='test-agent').status_code, 302)
+        with self.assertNumQueries(0):
+            response = self.client.post(url, data)
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        comment = Comment.objects.filter(post=self.post).first()
+        self.assertEqual((comment.ip_address, comment.user_agent), ('127.0.0.1', 'test-agent'))
+        self.assertEqual(throttle_stats.snapshot()['scopes']['comment'], {'allowed': 2, 'rejected': 1})
+
+    def test_like_is_limited_per_user(self):
+        self.client.force_login(self.user)
+        url = f'/api/v1/posts/{self.post.pk}/like/'
+        self.assertEqual(self.client.post(url).status_code, 200)
+        self.assertEqual(self.client.post(url, REMOTE_ADDR='10.0.0.2').status_code, 429)
+        [offender] = throttle_stats.snapshot()['top_rejected']
+        self.assertEqual(offender['key'], f'user:{self.user.pk}')
+
+
+class PrerenderTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Python', slug='python')
+        cls.tag = Tag.objects.create(name='orm', slug='orm')
+        cls.posts = create_posts(3, category=cls.category)
+        cls.posts[0].tags.add(cls.tag)
+
+    def setUp(self):
+        # Просмотры одного посетителя дедуплицируются через кеш
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = directory.name
+        self.renderer = PageRenderer(self.root)
+
+    def read(self, *parts):
+        with open(os.path.join(self.root, *parts), encoding='utf-8') as fh:
+            return fh.read()
+
+    def test_full_render(self):
+        total, changed, removed = self.renderer.render_all()
+        self.assertEqual((total, changed, removed), (14, 14, 0))
+        self.assertTrue(os.path.exists(os.path.join(self.root, 'index.html.gz')))
+        self.assertIn('<rss', self.read('rss', 'index.xml'))
+        detail = self.read('post', str(self.posts[0].pk), 'index.html')
+        self.assertIn('sendBeacon', detail)
+        self.assertNotIn('type="hidden" name="csrfmiddlewaretoken"', detail)
+        self.assertEqual(self.renderer.render_all(), (14, 0, 0))
+
+    def test_edit_renders_dependent_pages(self):
+        self.renderer.render_all()
+        post = self.posts[0]
+        self.assertEqual(set(RenderedPage.objects.get(path='/tag/orm/').posts.all()), {post})
+        post.tags.clear()
+        post.status = Post.STATUS_DRAFT
+        post.save()
+        paths = affected_paths([post.pk])
+        self.assertIn('/tag/orm/', paths)
+        self.assertNotIn(f'/post/{self.posts[1].pk}/', paths)
+        self.renderer.render_many(paths)
+        self.assertFalse(os.path.exists(os.path.join(self.root, 'post', str(post.pk), 'index.html')))
+        self.assertNotIn(post.title, self.read('tag', 'orm', 'index.html'))
+        self.assertNotIn(post.title, self.read('index.html'))
+
+    def test_static_comment_form_and_view_beacon(self):
+        client = Client(enforce_csrf_checks=True)
+        url = self.posts[0].get_absolute_url()
+        data = {'author_name': 'Читатель', 'author_email': 'reader@example.com', 'content': 'Спасибо'}
+        with self.settings(PRERENDER_ENABLED=True):
+            self.assertEqual(client.post(url, data).status_code, 403)
+            token = client.get('/csrf/').json()['token']
+            self.assertEqual(client.post(url, dict(data, csrfmiddlewaretoken=token)).status_code, 302)
+        view_counter.flush()
+        self.assertEqual(client.post(f'{url}view/').status_code, 204)
+        self.assertEqual(view_counter.pending(), {self.posts[0].pk: 1})
+        draft = Post.objects.create(title='Черновик', slug='draft', content='текст')
+        self.assertEqual(client.post(f'{draft.get_absolute_url()}view/').status_code, 404)
+        self.assertEqual(client.post('/post/999999/view/').status_code, 404)
+        self.assertEqual(view_counter.pending(), {self.posts[0].pk: 1})
+        view_counter.flush()
+
+    @override_settings(PRERENDER_ENABLED=True)
+    def test_comment_moderation_renders_post_page(self):
+        path = self.posts[0].get_absolute_url()
+        with patch('posts.signals.schedule_prerender') as schedule:
+            comment = Comment.objects.create(post=self.posts[0], author_name='Гость',
+                                             author_email='guest@example.com', content='Привет')
+            self.assertFalse(schedule.called)
+            for approved in (True, False):
+                comment = Comment.objects.get(pk=comment.pk)
+                comment.approved = approved
+                comment.save()
+                schedule.assert_called_with(paths=[path])
+                schedule.reset_mock()
+            Comment.objects.get(pk=comment.pk).save()
+            self.assertFalse(schedule.called)
+            comment.delete()
+            schedule.assert_called_with(paths=[path])
+
+
+class DatabaseRoutingTests(TestCase):
+    def test_sqlite_pragmas(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('только SQLite')
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+        # Режим журнала пишется в файл базы, поэтому WAL только по явной настройке
+        self.assertEqual(sqlite_pragmas()['journal_mode'], '')
+        with self.settings(SQLITE_JOURNAL_MODE='WAL'):
+            self.assertEqual(sqlite_pragmas()['synchronous'], 'NORMAL')
+
+    def test_replica_reads_until_write(self):
+        router = PrimaryReplicaRouter()
+        self.assertEqual(router.db_for_read(Post), 'default')
+        # TestCase держит транзакцию открытой — вне её чтение пошло бы на реплику
+        with replica_reads(), patch.object(connections['default'], 'in_atomic_block', False):
+            self.assertEqual(router.db_for_read(Post), REPLICA_ALIAS)
+            self.assertEqual(router.db_for_write(Post), 'default')
+            self.assertEqual(router.db_for_read(Post), 'default')
+        with replica_reads():
+            self.assertEqual(router.db_for_read(Post), 'default')
+        self.assertFalse(router.allow_migrate(REPLICA_ALIAS, 'posts'))
+
+
+class ImportTests(TestCase):
+    def lines(self, *records):
+        return [json.dumps(record, ensure_ascii=False) for record in records]
+
+    def record(self, title, **fields):
+        return dict({'title': title, 'content': 'текст', 'status': Post.STATUS_PUBLISHED}, **fields)
+
+    def test_tag_resolved_by_name(self):
+        tag = Tag.objects.create(name='Django', slug='django-web')
+        result = import_posts(self.lines(self.record('Первый', tags=['Django'])))
+        self.assertEqual((result.created, result.errors), (1, []))
+        self.assertEqual(Tag.objects.count(), 1)
+        self.assertEqual(list(Post.objects.get(title='Первый').tags.all()), [tag])
+
+    def test_invalid_field_values_skip_record(self):
+        result = import_posts(self.lines(
+            self.record('Да', is_featured='yes'),
+            self.record('Минус', views_count=-5),
+            self.record('Верно', is_featured=True, views_count='7'),
+        ))
+        self.assertEqual(result.created, 1)
+        self.assertEqual([error['line'] for error in result.errors], [1, 2])
+        self.assertTrue(result.errors[0]['error'].startswith('is_featured'))
+        post = Post.objects.get(title='Верно')
+        self.assertEqual((post.is_featured, post.views_count), (True, 7))
+
+    def test_database_error_skips_only_failing_record(self):
+        Post.objects.create(title='Занят', slug='taken', content='текст')
+        real_unique_slugs = importer.unique_slugs
+
+        def colliding_slugs(bases):
+            return ['taken' if base == 'Дубль' else slug for base, slug in zip(bases, real_unique_slugs(bases))]
+
+        with patch.object(importer, 'unique_slugs', colliding_slugs):
+            result = import_posts(self.lines(self.record('Первый'), self.record('Дубль'), self.record('Третий')))
+        self.assertEqual(result.created, 2)
+        self.assertEqual([error['line'] for error in result.errors], [2])
+        self.assertFalse(Post.objects.filter(title='Дубль').exists())
+
+    def test_bulk_api_reports_errors(self):
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(admin)
+        body = '\n'.join(self.lines(self.record('Плохой', views_count=-1)))
+        response = self.client.post('/api/v1/posts/bulk/', body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['created'], 0)
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tag = Tag.objects.create(name='базы', slug='bazy')
+        cls.title_match = Post.objects.create(title='Программирование на Python', slug='title-match',
+                                              content='Обычный текст.', status=Post.STATUS_PUBLISHED)
+        cls.content_match = Post.objects.create(title='Заметки', slug='content-match',
+                                                content='Немного о программировании.', status=Post.STATUS_PUBLISHED)
+
+    def found(self, query):
+        return [post.pk for post in search_posts(query)[:10]]
+
+    def test_russian_stemmer(self):
+        self.assertEqual(stem('программирование'), stem('программирования'))
+        self.assertEqual({stem('книги'), stem('книгой'), stem('книга')}, {'книг'})
+        self.assertEqual(stem('красивейший'), 'красив')
+        self.assertEqual(stem('Django'), 'django')
+
+    @skipUnless(connection.vendor in ('sqlite', 'postgresql'), 'Нужен полнотекстовый индекс')
+    def test_title_ranked_above_content(self):
+        self.assertEqual(self.found('программированию'), [self.title_match.pk, self.content_match.pk])
+
+    @skipUnless(connection.vendor in ('sqlite', 'postgresql'), 'Нужен полнотекстовый индекс')
+    def test_index_follows_saves_and_tags(self):
+        post = self.content_match
+        post.title = 'Миграции схемы'
+        post.save()
+        self.assertEqual(self.found('миграция'), [post.pk])
+        self.assertEqual(self.found('заметки'), [])
+        post.tags.add(self.tag)
+        self.assertEqual(self.found('база'), [post.pk])
+        post.tags.remove(self.tag)
+        self.assertEqual(self.found('база'), [])
+        post.delete()
+        self.assertEqual(self.found('миграция'), [])
+
+    def test_unsupported_database_falls_back(self):
+        with patch.object(connection, 'vendor', 'mysql'):
+            self.assertIsInstance(get_search_backend(), SimpleSearchBackend)
+            post = Post.objects.create(title='новая книга', slug='book', content='текст',
+                                       status=Post.STATUS_PUBLISHED)
+            post.tags.add(self.tag)
+            results = search_posts('книгой')
+            self.assertEqual((results.count(), [found.pk for found in results[:10]]), (1, [post.pk]))
+
+
+class CommentThreadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.post = Post.objects.create(title='Обсуждение', slug='discussion', content='текст',
+                                       status=Post.STATUS_PUBLISHED)
+        cls.chain = []
+        parent = None
+        for depth in range(Comment.MAX_DEPTH + 1):
+            parent = Comment.objects.create(post=cls.post, parent=parent, approved=True, author_name=f'Гость {depth}',
+                                            author_email='guest@example.com', content=f'Ответ {depth}')
+            cls.chain.append(parent)
+
+    def test_deepest_path_fits_column(self):
+        deepest = Comment.objects.get(pk=self.chain[-1].pk)
+        self.assertEqual(deepest.depth, Comment.MAX_DEPTH)
+        self.assertLessEqual(len(deepest.path), Comment._meta.get_field('path').max_length)
+
+    def test_reply_depth_capped(self):
+        data = {'author_name': 'Гость', 'author_email': 'guest@example.com', 'content': 'Ещё'}
+        self.assertTrue(CommentForm(dict(data, parent=self.chain[-2].pk), post=self.post).is_valid())
+        form = CommentForm(dict(data, parent=self.chain[-1].pk), post=self.post)
+        self.assertFalse(form.is_valid())
+        self.assertIn('parent', form.errors)
+
+    def test_more_replies_link_opens_html_thread(self):
+        collapsed = self.chain[PostDetailView.comments_max_depth]
+        url = reverse('posts:comment-thread', args=[self.post.pk, collapsed.pk])
+        response = self.client.get(self.post.get_absolute_url())
+        self.assertContains(response, f'href="{url}"')
+        self.assertNotContains(response, reverse('post-comment-tree', args=[self.post.pk]))
+
+        response = self.client.get(url)
+        self.assertEqual(response['Content-Type'], 'text/html; charset=utf-8')
+        self.assertContains(response, 'Ответ 6')
+        self.assertNotContains(response, 'Ответ 4<')
+        self.assertEqual(self.client.get(reverse('posts:comment-thread', args=[self.post.pk, 999999])).status_code, 404)
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Python', slug='python')
+        cls.post = Post.objects.create(title='Пост', slug='post', content='текст', category=cls.category,
+                                       status=Post.STATUS_PUBLISHED)
+        cls.other = Post.objects.create(title='Другой', slug='other', content='текст', category=cls.category,
+                                        status=Post.STATUS_PUBLISHED)
+
+    def setUp(self):
+        cache.clear()
+        # Просмотры страницы поста сбрасываются до отката транзакции теста
+        self.addCleanup(view_counter.flush)
+
+    def test_api_etag_and_if_modified_since(self):
+        url = f'/api/v1/posts/{self.post.pk}/'
+        response = self.client.get(url)
+        etag, last_modified = response['ETag'], response['Last-Modified']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH='"stale"').status_code, 200)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+        self.post.updated_at = self.post.updated_at + timedelta(seconds=5)
+        Post.objects.filter(pk=self.post.pk).update(updated_at=self.post.updated_at)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 200)
+
+    def test_list_page_follows_sidebar(self):
+        url = reverse('posts:category-posts', args=['python'])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(sum('"posts_category"."slug" =' in query['sql'] for query in queries), 1)
+        self.assertNotIn('Last-Modified', response)
+        etag = response['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        invalidate_navigation()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_detail_page_follows_related_posts_and_csrf_cookie(self):
+        url = self.post.get_absolute_url()
+        response = self.client.get(url)
+        self.assertNotIn('ETag', response)
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        RelatedPost.objects.create(post=self.post, related=self.other, rank=0, score=0.5)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, self.other.title)
+        etag = response['ETag']
+
+        self.client.cookies[settings.CSRF_COOKIE_NAME] = 'x' * 32
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class JobRetentionTests(TestCase):
+    def test_purge_keeps_recent_pending_failed_and_periodic_jobs(self):
+        now = timezone.now()
+        old = now - timedelta(days=8)
+        for task_name, status, run_at in [
+            ('comment.created', Job.STATUS_DONE, old),
+            ('related.update', Job.STATUS_DONE, old),
+            ('comment.created', Job.STATUS_DONE, now - timedelta(days=1)),
+            ('comment.created', Job.STATUS_PENDING, old),
+            ('comment.created', Job.STATUS_FAILED, old),
+            ('ranking.refresh', Job.STATUS_DONE, old),
+        ]:
+            Job.objects.create(task=task_name, status=status, run_at=run_at)
+
+        with override_settings(JOB_RETENTION_DAYS=7):
+            self.assertEqual(purge_finished(now=now, batch_size=1), 2)
+        self.assertEqual(Job.objects.count(), 4)
+        self.assertTrue(Job.objects.filter(task='ranking.refresh').exists())
+        self.assertIn('queue.purge', PERIODIC)
+
+
+@override_settings(MODERATOR_EMAILS=['moderator@example.com'], COMMENT_SPAM_THRESHOLD=0.6)
+class CommentModerationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        [cls.post] = create_posts(1)
+
+    def comment(self, content, **fields):
+        return Comment.objects.create(post=self.post, author_name='Гость', author_email='guest@example.com',
+                                      content=content, **fields)
+
+    def run_jobs(self):
+        jobs = Job.objects.filter(task='comment.created', status=Job.STATUS_PENDING)
+        process_new_comments([job.payload for job in jobs])
+
+    def test_new_comment_enqueues_job(self):
+        comment = self.comment('Спасибо за пост')
+        job = Job.objects.get(task='comment.created')
+        self.assertEqual(job.payload, {'comment_id': comment.pk})
+        # Письмо уходит из обработчика очереди, а не при сохранении
+        self.assertEqual(mail.outbox, [])
+
+    def test_spam_score(self):
+        self.assertLess(spam_score(Comment(content='Интересная статья, спасибо')), 0.6)
+        spam = Comment(content='Казино и ставки: https://a.example https://b.example',
+                       author_website='https://c.example')
+        self.assertGreaterEqual(spam_score(spam), 0.6)
+
+    def test_spam_is_flagged_and_clean_comments_held_for_moderators(self):
+        clean = self.comment('Спасибо за пост')
+        spam = self.comment('Казино и ставки: https://a.example https://b.example')
+        self.run_jobs()
+        clean.refresh_from_db()
+        spam.refresh_from_db()
+        self.assertEqual((clean.is_spam, clean.approved), (False, False))
+        self.assertEqual((spam.is_spam, spam.approved), (True, False))
+
+        [message] = mail.outbox
+        self.assertEqual(message.to, ['moderator@example.com'])
+        self.assertEqual(message.subject, 'Новые комментарии на модерации: 1')
+        self.assertIn('Спасибо за пост', message.body)
+        self.assertNotIn('Казино', message.body)
+
+    def test_no_notification_for_moderated_or_spam_comments(self):
+        self.comment('Уже одобрен', approved=True)
+        self.comment('Казино, кредит и ставки')
+        self.run_jobs()
+        self.assertEqual(mail.outbox, [])
+
+class CursorPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        base = timezone.now() - timedelta(days=1)
+        # Четыре поста с одной датой: порядок внутри неё задаёт id
+        dates = [base, base, base, base, base - timedelta(hours=1), base - timedelta(hours=2), base + timedelta(hours=1)]
+        for i, pub_date in enumerate(dates):
+            Post.objects.create(title=f'Пост {i}', slug=f'post-{i}', content='текст', pub_date=pub_date,
+                                status=Post.STATUS_PUBLISHED)
+        cls.expected = list(Post.published.order_by('-pub_date', '-id').values_list('pk', flat=True))
+
+    def test_walk_forward_and_back_across_ties(self):
+        paginator = CursorPaginator(Post.published.all(), 3)
+        pages = [paginator.page()]
+        while pages[-1].has_next():
+            pages.append(paginator.page(pages[-1].next_cursor))
+        self.assertEqual([[post.pk for post in page] for page in pages],
+                         [self.expected[:3], self.expected[3:6], self.expected[6:]])
+        self.assertFalse(pages[0].has_previous())
+        self.assertIsNone(pages[-1].next_cursor)
+
+        back = paginator.page(pages[-1].previous_cursor)
+        self.assertEqual([post.pk for post in back], self.expected[3:6])
+        self.assertEqual([post.pk for post in paginator.page(back.previous_cursor)], self.expected[:3])
+
+    @patch.object(PostCursorPagination, 'page_size', 4)
+    def test_api_links(self):
+        first = self.client.get('/api/v1/posts/').json()
+        self.assertIsNone(first['previous'])
+        last = self.client.get(first['next']).json()
+        self.assertEqual([post['id'] for post in last['results']], self.expected[4:])
+        self.assertIsNone(last['next'])
+        back = self.client.get(last['previous']).json()
+        self.assertEqual([post['id'] for post in back['results']], self.expected[:4])
+
+    def test_invalid_cursor_is_404(self):
+        forged = base64.urlsafe_b64encode(b'{"d":"not a date","i":1}').decode()
+        for cursor in ('garbage!', forged, encode_cursor({'pub_date': timezone.now(), 'id': 1})[:-3]):
+            self.assertEqual(self.client.get('/', {'cursor': cursor}).status_code, 404)
+            self.assertEqual(self.client.get('/api/v1/posts/', {'cursor': cursor}).status_code, 404)
+
+
+class ViewCounterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.posts = create_posts(2)
+
+    def setUp(self):
+        cache.clear()
+
+    def request(self, ip):
+        return RequestFactory().get('/', REMOTE_ADDR=ip)
+
+    def test_views_are_buffered_deduplicated_and_flushed(self):
+        counter = ViewCounter(flush_interval=3600, dedup_window=60)
+        first, second = self.posts
+        self.assertTrue(counter.record(self.request('10.0.0.1'), first.pk))
+        self.assertFalse(counter.record(self.request('10.0.0.1'), first.pk))
+        counter.record(self.request('10.0.0.2'), first.pk)
+        counter.record(self.request('10.0.0.1'), second.pk)
+        self.assertEqual(counter.pending(), {first.pk: 2, second.pk: 1})
+        self.assertEqual(Post.objects.get(pk=first.pk).views_count, 0)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(counter.flush(), 3)
+        # Один UPDATE на каждое значение прироста, а не на каждый пост
+        self.assertEqual(sum(query['sql'].startswith('UPDATE "posts_post"') for query in queries), 2)
+        self.assertEqual(dict(Post.objects.values_list('pk', 'views_count')), {first.pk: 2, second.pk: 1})
+        self.assertEqual(PostActivity.objects.filter(post=first).get().views, 2)
+        self.assertEqual((counter.pending(), counter.flush()), ({}, 0))
+
+
+class LikeCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        [cls.post] = create_posts(1)
+        cls.users = [User.objects.create_user(f'reader{i}', password='password') for i in range(2)]
+
+    def setUp(self):
+        cache.clear()
+
+    def like(self, user):
+        self.client.force_login(user)
+        return self.client.post(f'/api/v1/posts/{self.post.pk}/like/').json()
+
+    def test_like_toggles_counter(self):
+        first, second = self.users
+        self.assertEqual(self.like(first), {'action': 'liked', 'likes_count': 1})
+        self.assertEqual(self.like(second), {'action': 'liked', 'likes_count': 2})
+        self.assertEqual(self.like(first), {'action': 'unliked', 'likes_count': 1})
+        self.assertEqual(Post.objects.get(pk=self.post.pk).likes_count, Like.objects.filter(post=self.post).count())
+
+    def test_unlike_with_stale_counter(self):
+        # Лайк поставлен до появления счётчика: likes_count остался нулём
+        Like.objects.create(post=self.post, user=self.users[0])
+        self.assertEqual(Post.objects.get(pk=self.post.pk).likes_count, 0)
+        self.assertEqual(self.like(self.users[0]), {'action': 'unliked', 'likes_count': 0})
+
+    def test_migration_backfills_counter(self):
+        Like.objects.create(post=self.post, user=self.users[0])
+        Like.objects.create(post=self.post, user=self.users[1])
+        backfill = import_module('posts.migrations.0015_backfill_likes_count')
+        backfill.fill_likes_count(django_apps, None)
+        self.assertEqual(Post.objects.get(pk=self.post.pk).likes_count, 2)
+
+    def test_reconcile_restores_drifted_counter(self):
+        Like.objects.create(post=self.post, user=self.users[0])
+        Post.objects.filter(pk=self.post.pk).update(likes_count=7)
+        call_command('reconcile_likes_count', stdout=StringIO())
+        self.assertEqual(Post.objects.get(pk=self.post.pk).likes_count, 1)
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tag = Tag.objects.create(name='orm', slug='orm')
+        cls.old = Post.objects.create(title='Старый', slug='old', content='текст')
+        cls.new = Post.objects.create(title='Новый', slug='new', content='текст', status=Post.STATUS_PUBLISHED)
+        cls.new.tags.add(cls.tag)
+        Post.objects.filter(pk=cls.old.pk).update(updated_at=timezone.now() - timedelta(days=10))
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def export(self, url, **headers):
+        response = self.client.get(url, **headers)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    def test_ndjson_rows_tags_and_since(self):
+        _, body = self.export('/api/v1/export/posts.ndjson')
+        rows = [json.loads(line) for line in body.decode().splitlines()]
+        self.assertEqual([(row['slug'], row['tags']) for row in rows], [('old', []), ('new', ['orm'])])
+
+        since = (timezone.now() - timedelta(days=1)).date().isoformat()
+        _, body = self.export(f'/api/v1/export/posts.ndjson?since={since}')
+        self.assertEqual([json.loads(line)['slug'] for line in body.decode().splitlines()], ['new'])
+
+    def test_csv_gzip(self):
+        response, body = self.export('/api/v1/export/posts.csv', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        lines = gzip.decompress(body).decode().splitlines()
+        self.assertTrue(lines[0].startswith('id,title,slug'))
+        self.assertEqual(len(lines), 3)
+
+    def test_accept_encoding_q_values(self):
+        for header, expected in [('gzip', True), ('deflate, gzip;q=0.5', True), ('*', True),
+                                 ('gzip;q=0', False), ('x-gzip', False), ('*, gzip;q=0', False), ('', False)]:
+            self.assertIs(accepts_gzip(header), expected, header)
+        response, body = self.export('/api/v1/export/posts.csv', HTTP_ACCEPT_ENCODING='gzip;q=0, identity')
+        self.assertNotIn('Content-Encoding', response)
+        self.assertTrue(body.startswith(b'id,title,slug'))
+
+    def test_admin_only(self):
+        self.client.logout()
+        self.assertEqual(self.client.get('/api/v1/export/posts.ndjson').status_code, 403)
+
+
+class FragmentCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Python', slug='python')
+        [cls.post] = create_posts(1, category=cls.category)
+
+    def setUp(self):
+        self.fragments = FragmentCache()
+        self.fragments.cache.clear()
+
+    def render(self):
+        return self.fragments.render('post-card', 'posts/includes/post_card.html', Post.objects.get(pk=self.post.pk))
+
+    def test_hit_until_generation_changes(self):
+        self.assertIn('Python', self.render())
+        self.assertIn('Python', self.render())
+        self.assertEqual((self.fragments.hits, self.fragments.misses), (1, 1))
+
+        # Переименование категории не трогает updated_at поста — сдвигается поколение
+        generation = self.fragments.generation()
+        Category.objects.filter(pk=self.category.pk).update(name='Django')
+        self.assertIn('Python', self.render())
+        self.category.refresh_from_db()
+        self.category.save()
+        self.assertNotEqual(self.fragments.generation(), generation)
+        self.assertIn('Django', self.render())
+        self.assertEqual(self.fragments.stats()['misses'], 2)
+
+    def test_updated_at_changes_key(self):
+        self.render()
+        Post.objects.filter(pk=self.post.pk).update(title='Новый заголовок', updated_at=timezone.now())
+        self.assertIn('Новый заголовок', self.render())
+        self.assertEqual((self.fragments.hits, self.fragments.misses), (0, 2))
+
+
+class ImageVariantTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        media = override_settings(MEDIA_ROOT=directory.name, IMAGE_WIDTHS=(320, 640, 960))
+        media.enable()
+        self.addCleanup(media.disable)
+
+    def create_post(self, size):
+        buffer = BytesIO()
+        Image.new('RGB', size, (200, 50, 50)).save(buffer, format='PNG')
+        return Post.objects.create(title='Пост', slug='post', content='текст', status=Post.STATUS_PUBLISHED,
+                                   image=ContentFile(buffer.getvalue(), name='photo.png'))
+
+    def test_variants_are_generated_without_upscaling(self):
+        post = self.create_post((700, 350))
+        self.assertEqual(Job.objects.filter(task='image.variants', payload={'post_id': post.pk}).count(), 1)
+        generate_post_images([{'post_id': post.pk}])
+
+        post.refresh_from_db()
+        variants = post.image_variants
+        self.assertEqual((variants['width'], variants['height']), (700, 350))
+        for fmt in ('webp', 'jpeg'):
+            self.assertEqual([width for width, _ in variants[fmt]], [320, 640, 700])
+            self.assertTrue(all(post.image.storage.exists(name) for _, name in variants[fmt]))
+
+    def test_broken_image_does_not_fail_batch(self):
+        good = self.create_post((400, 200))
+        broken = Post.objects.create(title='Битый', slug='broken', content='текст', status=Post.STATUS_PUBLISHED,
+                                     image=ContentFile(b'not an image', name='broken.png'))
+        with self.assertLogs('posts.tasks', 'ERROR'):
+            generate_post_images([{'post_id': broken.pk}, {'post_id': good.pk}])
+        self.assertEqual([width for width, _ in Post.objects.get(pk=good.pk).image_variants['webp']], [320, 400])
+        self.assertEqual(Post.objects.get(pk=broken.pk).image_variants, {})
+
+    def test_card_renders_srcset(self):
+        post = self.create_post((700, 350))
+        html = render_to_string('posts/includes/post_card.html', {'post': post})
+        # Пока копий нет — только исходное изображение
+        self.assertNotIn('srcset', html)
+        self.assertIn(post.image.url, html)
+
+        generate_post_images([{'post_id': post.pk}])
+        post.refresh_from_db()
+        html = render_to_string('posts/includes/post_card.html', {'post': post})
+        self.assertIn('<source type="image/webp" srcset="', html)
+        self.assertIn('-640w.webp 640w', html)
+        self.assertIn('-700w.jpg 700w', html)
+        self.assertIn('width="700" height="350"', html)
+
+
+class RenderingTests(TestCase):
+    def test_raw_html_is_escaped(self):
+        html = render_markdown('<script>alert(1)</script>\n\nТекст <img src="x" onerror="alert(1)">')
+        self.assertNotIn('<script', html)
+        self.assertNotIn('<img', html)
+        self.assertIn('&lt;script&gt;', html)
+
+    def test_unsafe_links_are_removed(self):
+        html = render_markdown('[ссылка](javascript:alert(1)) [сайт](https://example.com) ![img](data:text/html,x)')
+        self.assertNotIn('javascript:', html)
+        self.assertNotIn('data:', html)
+        self.assertIn('href="https://example.com" rel="nofollow noopener"', html)
+
+    def test_excerpt_and_word_count(self):
+        post = Post.objects.create(title='Пост', slug='post', content=' '.join(['слово'] * 450))
+        self.assertEqual((post.word_count, post.reading_time), (450, 2))
+        self.assertEqual(post.excerpt_html.count('слово'), EXCERPT_WORDS)
+        self.assertIn('…', post.excerpt_html)
+
+    def test_migration_backfills_existing_posts(self):
+        post = Post.objects.create(title='Пост', slug='post', content='**жирный** текст')
+        Post.objects.filter(pk=post.pk).update(content_html='', excerpt_html='', word_count=0)
+        backfill = import_module('posts.migrations.0016_backfill_rendered_content')
+        backfill.fill_rendered_content(django_apps, None)
+        post.refresh_from_db()
+        self.assertEqual(post.content_html, '<p><strong>жирный</strong> текст</p>')
+        self.assertEqual((post.excerpt_html, post.word_count), (post.content_html, 2))
+
+
+class NewsletterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        [cls.post] = create_posts(1)
+        cls.subscriptions = [
+            Subscription.objects.create(email=f'reader{i}@example.com', confirmed_at=timezone.now()) for i in range(5)
+        ]
+        Subscription.objects.create(email='unconfirmed@example.com')
+
+    def recipients(self):
+        return [message.to[0] for message in mail.outbox]
+
+    def test_sends_once_to_confirmed_subscribers(self):
+        delivery = send_newsletter(self.post, batch_size=2, workers=2)
+        self.assertEqual((delivery.status, delivery.sent_count), (NewsletterDelivery.STATUS_DONE, 5))
+        self.assertEqual(delivery.last_subscription_id, self.subscriptions[-1].pk)
+        self.assertEqual(sorted(self.recipients()), [s.email for s in self.subscriptions])
+        self.assertIsNone(send_newsletter(self.post))
+        self.assertEqual(len(mail.outbox), 5)
+
+    def test_interrupted_delivery_resumes_from_checkpoint(self):
+        def flaky(message, emails):
+            if 'reader2@example.com' in emails:
+                raise ConnectionError('SMTP недоступен')
+            return send_batch(message, emails)
+
+        with patch('posts.newsletter.send_batch', side_effect=flaky), self.assertLogs('posts.newsletter', 'ERROR'):
+            with self.assertRaises(NewsletterInterrupted):
+                send_newsletter(self.post, batch_size=2, workers=1)
+        delivery = NewsletterDelivery.objects.get(post=self.post)
+        self.assertEqual(delivery.status, NewsletterDelivery.STATUS_INTERRUPTED)
+        self.assertEqual((delivery.last_subscription_id, delivery.sent_count), (self.subscriptions[1].pk, 2))
+
+        mail.outbox.clear()
+        delivery = send_newsletter(self.post, batch_size=2, workers=1)
+        self.assertEqual((delivery.status, delivery.sent_count), (NewsletterDelivery.STATUS_DONE, 5))
+        self.assertEqual(sorted(self.recipients()), [s.email for s in self.subscriptions[2:]])
+
+    def test_stale_claim_is_taken_over(self):
+        first = claim_delivery(self.post)
+        self.assertIsNone(claim_delivery(self.post))
+        NewsletterDelivery.objects.filter(pk=first.pk).update(updated_at=timezone.now() - timedelta(minutes=10))
+        second = claim_delivery(self.post)
+        self.assertNotEqual(second.claim_token, first.claim_token)
+        # Старый отправитель больше не может ни продлить захват, ни сдвинуть контрольную точку
+        self.assertFalse(save_delivery(first, last_subscription_id=self.subscriptions[-1].pk))
+        self.assertTrue(save_delivery(second, sent_count=1))
+        self.assertEqual(NewsletterDelivery.objects.get(pk=first.pk).last_subscription_id, 0)
+
+    def test_sender_stops_after_losing_claim(self):
+        def batches(after_id, batch_size):
+            yield [(self.subscriptions[0].pk, self.subscriptions[0].email)]
+            NewsletterDelivery.objects.filter(post=self.post).update(claim_token=uuid.uuid4())
+            for subscription in self.subscriptions[1:]:
+                yield [(subscription.pk, subscription.email)]
+
+        with patch('posts.newsletter.iter_batches', batches), self.assertLogs('posts.newsletter', 'WARNING'):
+            self.assertIsNone(send_newsletter(self.post, batch_size=1, workers=1))
+        delivery = NewsletterDelivery.objects.get(post=self.post)
+        self.assertEqual((delivery.status, delivery.sent_count), (NewsletterDelivery.STATUS_SENDING, 0))
+        self.assertLess(len(mail.outbox), 5)
+
+
+class FeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Python', slug='python')
+        cls.posts = create_posts(2, category=cls.category)
+        Post.objects.create(title='Вне категории', slug='other', content='текст', status=Post.STATUS_PUBLISHED)
+        cls.posts[0].content = 'начало ' + ' '.join(['слово'] * 40) + ' финал'
+        cls.posts[0].save()
+
+    def setUp(self):
+        caches[FEED_CACHE_ALIAS].clear()
+
+    def test_full_content_feed(self):
+        self.assertNotContains(self.client.get('/rss/'), 'финал')
+        response = self.client.get('/rss/full/')
+        self.assertContains(response, 'финал')
+        self.assertContains(response, 'Вне категории')
+
+    def test_category_feed(self):
+        response = self.client.get('/category/python/rss/')
+        self.assertContains(response, 'Мой Блог - Python')
+        self.assertContains(response, 'Пост 1')
+        self.assertNotContains(response, 'Вне категории')
+        self.assertEqual(self.client.get('/category/missing/rss/').status_code, 404)
+
+    def test_conditional_get_and_cache_ignore_query_string(self):
+        response = self.client.get('/rss/')
+        self.assertEqual(self.client.get('/rss/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        # Другая строка запроса берёт тот же XML из кеша, а не строит новый
+        with patch.object(LatestPostsFeed, 'get_feed', side_effect=AssertionError):
+            again = self.client.get('/rss/?utm_source=newsletter')
+        self.assertEqual(again.content, response.content)
+
+
+class InstrumentationTests(TestCase):
+    def setUp(self):
+        request_stats.reset()
+        self.addCleanup(request_stats.reset)
+
+    def test_fingerprint_groups_parameters(self):
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE id = 5 AND name = 'O''Brien' AND pk IN (%s, %s, %s)"),
+            fingerprint("SELECT * FROM t WHERE id = 12 AND name = 'x' AND pk IN (%s)"),
+        )
+
+    def test_recorder_reports_repeated_queries(self):
+        post = create_posts(1)[0]
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            for _ in range(3):
+                Post.objects.get(pk=post.pk)
+            Category.objects.count()
+        self.assertEqual(recorder.count, 4)
+        [(sql, count)] = recorder.duplicates()
+        self.assertEqual(count, 3)
+        self.assertIn('"posts_post"', sql)
+
+    @override_settings(INSTRUMENTATION_ENABLED=True, INSTRUMENTATION_SAMPLE_RATE=1.0)
+    def test_middleware_sets_header_and_collects_stats(self):
+        post = create_posts(1)[0]
+        response = self.client.get(f'/api/v1/posts/{post.pk}/')
+        self.assertRegex(response['Server-Timing'], r'db;dur=[\d.]+;desc="\d+ queries"')
+        stats = request_stats.snapshot()['post-detail']
+        self.assertEqual(stats['requests'], 1)
+        self.assertGreater(stats['queries']['max'], 0)
+
+    @override_settings(INSTRUMENTATION_ENABLED=False)
+    def test_disabled(self):
+        response = self.client.get('/api/v1/posts/')
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(request_stats.snapshot(), {})
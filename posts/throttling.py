@@ -0,0 +1,160 @@
+import re
+import threading
+import time
+from collections import Counter, defaultdict, deque
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.throttling import BaseThrottle
+
+from .counters import get_client_ip
+
+RATE_RE = re.compile(r'^\s*(\d+)\s*/\s*(\d*)\s*([smhd])\w*\s*$')
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+RECENT_REJECTIONS = 1000
+
+
+def parse_rate(rate):
+    """'5/min', '100/hour', '10/5m' → (ёмкость ведра, токенов в секунду)."""
+    match = RATE_RE.match(rate or '')
+    if not match:
+        raise ValueError(f'Неверный формат лимита: {rate!r}')
+    count, multiplier, unit = match.groups()
+    return int(count), int(count) / (int(multiplier or 1) * PERIODS[unit])
+
+
+class TokenBucket:
+    """
+    Ведро токенов в кеше THROTTLE_CACHE: вмещает capacity токенов и
+    пополняется на rate в секунду. В кеше лежит пара (токены, время
+    обновления); чтение и запись одного процесса защищены блокировкой, а
+    между процессами с общим кешем лимит соблюдается приблизительно.
+    """
+
+    def __init__(self, capacity, rate):
+        self.capacity = capacity
+        self.rate = rate
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return caches[getattr(settings, 'THROTTLE_CACHE', 'default')]
+
+    def consume(self, key, now=None):
+        """Берёт токен; возвращает 0 или сколько секунд ждать следующего."""
+        now = now or time.time()
+        with self._lock:
+            tokens, updated = self.cache.get(key) or (self.capacity, now)
+            tokens = min(self.capacity, tokens + (now - updated) * self.rate)
+            if tokens < 1:
+                return (1 - tokens) / self.rate
+            # Запись живёт, пока ведро не наполнится снова: дальше она не нужна
+            self.cache.set(key, (tokens - 1, now), int((self.capacity - tokens + 1) / self.rate) + 1)
+        return 0
+
+
+class ThrottleStats:
+    """Пропущенные и отклонённые запросы по областям и последние отклонения; в памяти процесса."""
+
+    def __init__(self):
+        self._counts = defaultdict(Counter)
+        self._recent = deque(maxlen=RECENT_REJECTIONS)
+        self._lock = threading.Lock()
+
+    def add(self, scope, rejected_key=None):
+        with self._lock:
+            self._counts[scope]['rejected' if rejected_key else 'allowed'] += 1
+            if rejected_key:
+                self._recent.append((time.time(), scope, rejected_key))
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+            self._recent.clear()
+
+    def snapshot(self):
+        with self._lock:
+            counts = {scope: dict(counter) for scope, counter in self._counts.items()}
+            recent = list(self._recent)
+        offenders = Counter((scope, key) for _, scope, key in recent)
+        return {
+            'scopes': {
+                scope: {'allowed': count.get('allowed', 0), 'rejected': count.get('rejected', 0)}
+                for scope, count in sorted(counts.items())
+            },
+            'top_rejected': [
+                {'scope': scope, 'key': key, 'count': count} for (scope, key), count in offenders.most_common(10)
+            ],
+        }
+
+
+throttle_stats = ThrottleStats()
+
+
+class Throttle:
+    """
+    Лимит области scope из THROTTLE_RATES: отдельное ведро на IP и на
+    пользователя. Сначала проверяется IP — отклонённый запрос не читает
+    сессию и не доходит до базы.
+    """
+
+    _buckets = {}
+    _buckets_lock = threading.Lock()
+
+    def __init__(self, scope):
+        self.scope = scope
+
+    @property
+    def bucket(self):
+        rate = getattr(settings, 'THROTTLE_RATES', {}).get(self.scope)
+        if not rate:
+            return None
+        # Ведро создаётся заново при смене лимита (override_settings в тестах)
+        with self._buckets_lock:
+            bucket = self._buckets.get((self.scope, rate))
+            if bucket is None:
+                bucket = self._buckets[self.scope, rate] = TokenBucket(*parse_rate(rate))
+        return bucket
+
+    def keys(self, request):
+        yield f'throttle:{self.scope}:ip:{get_client_ip(request)}'
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            yield f'throttle:{self.scope}:user:{user.pk}'
+
+    def check(self, request):
+        """0, если запрос укладывается в лимит, иначе секунды до следующей попытки."""
+        bucket = self.bucket
+        if bucket is None:
+            return 0
+        for key in self.keys(request):
+            wait = bucket.consume(key)
+            if wait:
+                throttle_stats.add(self.scope, key.split(':', 2)[2])
+                return wait
+        throttle_stats.add(self.scope)
+        return 0
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Троттлинг DRF на тех же вёдрах; чтение не ограничивается."""
+
+    scope = None
+
+    def allow_request(self, request, view):
+        if request.method in SAFE_METHODS:
+            return True
+        self._wait = Throttle(self.scope).check(request)
+        return not self._wait
+
+    def wait(self):
+        return self._wait
+
+
+class CommentRateThrottle(TokenBucketThrottle):
+    scope = 'comment'
+
+
+class LikeRateThrottle(TokenBucketThrottle):
+    scope = 'like'
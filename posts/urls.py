@@ -1,16 +1,32 @@
+from django.conf import settings
 from django.urls import path
 from . import views
-from .feeds import LatestPostsFeed
+from .feeds import CategoryPostsFeed, LatestPostsFeed, TagPostsFeed
 
 app_name = 'posts'
 
+if getattr(settings, 'ASYNC_VIEWS', False):
+    from .async_views import AsyncPostDetailView as PostDetailView, AsyncPostListView as PostListView
+else:
+    from .views import PostDetailView, PostListView
+
 urlpatterns = [
-    path('', views.PostListView.as_view(), name='post-list'),
-    path('post/<int:pk>/', views.PostDetailView.as_view(), name='post-detail'),
+    path('', PostListView.as_view(), name='post-list'),
+    path('post/<int:pk>/', PostDetailView.as_view(), name='post-detail'),
+    path('post/<int:pk>/view/', views.record_view, name='post-view'),
+    path('post/<int:pk>/comments/<int:comment_pk>/', views.comment_thread, name='comment-thread'),
+    path('csrf/', views.csrf_token, name='csrf-token'),
     path('search/', views.PostSearchView.as_view(), name='post-search'),
-    path('category/<slug:category_slug>/', views.PostListView.as_view(), name='category-posts'),
-    path('tag/<slug:tag_slug>/', views.PostListView.as_view(), name='tag-posts'),
+    path('category/<slug:category_slug>/', PostListView.as_view(), name='category-posts'),
+    path('tag/<slug:tag_slug>/', PostListView.as_view(), name='tag-posts'),
+    path('category/<slug:category_slug>/rss/', CategoryPostsFeed(), name='category-rss'),
+    path('category/<slug:category_slug>/atom/', CategoryPostsFeed(atom=True), name='category-atom'),
+    path('tag/<slug:tag_slug>/rss/', TagPostsFeed(), name='tag-rss'),
+    path('tag/<slug:tag_slug>/atom/', TagPostsFeed(atom=True), name='tag-atom'),
     path('about/', views.about, name='about'),
     path('contact/', views.contact, name='contact'),
     path('rss/', LatestPostsFeed(), name='post-rss'),
-]
\ No newline at end of file
+    path('rss/full/', LatestPostsFeed(full=True), name='post-rss-full'),
+    path('atom/', LatestPostsFeed(atom=True), name='post-atom'),
+    path('atom/full/', LatestPostsFeed(atom=True, full=True), name='post-atom-full'),
+]
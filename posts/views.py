@@ -1,35 +1,67 @@
+from django.conf import settings
+from django.http import Http404, HttpResponse, JsonResponse
+from django.middleware.csrf import get_token
 from django.shortcuts import render, get_object_or_404, redirect
+from django.views.decorators.cache import never_cache
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 from django.views.generic import ListView, DetailView
 from django.contrib import messages
-from django.db.models import Q
 from .models import Post, Category, Tag, Comment
 from .forms import CommentForm, SearchForm
-
-
-class PostListView(ListView):
+from .search import search_posts
+from .counters import get_client_ip, view_counter
+from .pagination import CursorPaginationMixin
+from .cache import fragment_cache
+from .comment_tree import CommentThread, count_visible, load_subtree, load_thread
+from .related import related_posts, related_versions
+from .conditional import ConditionalGetMixin, collection_state, page_state, post_state
+from .prerender import is_prerender
+from .throttling import Throttle
+
+
+class PostListView(ConditionalGetMixin, CursorPaginationMixin, ListView):
     model = Post
     template_name = 'posts/post_list.html'
     context_object_name = 'posts'
     paginate_by = 10
 
     def get_queryset(self):
-        queryset = Post.published.all().select_related('category').prefetch_related('tags')
-
+        # Категория и тег читаются один раз: get_queryset вызывают и ETag, и ListView
         category_slug = self.kwargs.get('category_slug')
-        if category_slug:
+        if category_slug and not hasattr(self, 'category'):
             self.category = get_object_or_404(Category, slug=category_slug)
-            queryset = queryset.filter(category=self.category)
 
         tag_slug = self.kwargs.get('tag_slug')
-        if tag_slug:
+        if tag_slug and not hasattr(self, 'tag'):
             self.tag = get_object_or_404(Tag, slug=tag_slug)
-            queryset = queryset.filter(tags=self.tag)
 
+        return self.filter_posts()
+
+    def filter_posts(self):
+        queryset = Post.published.all().select_related('category').defer('content', 'content_html')
+        if hasattr(self, 'category'):
+            queryset = queryset.filter(category=self.category)
+        if hasattr(self, 'tag'):
+            queryset = queryset.filter(tags=self.tag)
         return queryset
 
+    def get_resource_state(self):
+        queryset = self.get_queryset()
+        extra = [obj.updated_at for obj in (getattr(self, 'category', None), getattr(self, 'tag', None)) if obj]
+        return page_state(collection_state(queryset, *extra))
+
+    def get_count_cache_key(self):
+        category = getattr(self, 'category', None)
+        tag = getattr(self, 'tag', None)
+        return f'post-count:{category.pk if category else "-"}:{tag.pk if tag else "-"}'
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['categories'] = Category.objects.filter(is_active=True)
+        posts = context['posts']
+        context['post_cards'] = list(zip(
+            posts, fragment_cache.render_many('post-card', 'posts/includes/post_card.html', posts)
+        ))
 
         if hasattr(self, 'category'):
             context['category'] = self.category
@@ -39,30 +71,73 @@ class PostListView(ListView):
         return context
 
 
-class PostDetailView(DetailView):
+class PostDetailView(ConditionalGetMixin, DetailView):
     model = Post
     template_name = 'posts/post_detail.html'
     context_object_name = 'post'
+    comments_per_page = 50
+    comments_max_depth = 5
 
     def get_queryset(self):
-        return Post.objects.select_related('author', 'category').prefetch_related('tags', 'comments')
+        queryset = Post.objects.select_related('author', 'category')
+        # Статически публикуются только опубликованные посты
+        return queryset.filter(status=Post.STATUS_PUBLISHED) if is_prerender(self.request) else queryset
+
+    def get_comments_page(self):
+        try:
+            return max(1, int(self.request.GET.get('comments_page', 1)))
+        except ValueError:
+            return 1
+
+    def get_resource_state(self):
+        # Без cookie CSRF страница выдаёт новую: старая копия с формой комментария не годится
+        csrf_cookie = self.request.COOKIES.get(settings.CSRF_COOKIE_NAME)
+        if csrf_cookie is None:
+            return None
+        pk = self.kwargs['pk']
+        return page_state(post_state(self.get_queryset(), pk), related_versions(pk), csrf_cookie)
+
+    def get(self, request, *args, **kwargs):
+        response = super().get(request, *args, **kwargs)
+        # Статическую страницу засчитывает запрос из неё самой (record_view)
+        if response.status_code in (200, 304) and not is_prerender(request):
+            view_counter.record(request, self.kwargs['pk'])
+        return response
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['comments'] = self.object.comments.filter(approved=True, parent__isnull=True)
-        context['comment_form'] = CommentForm()
+        context['post_body'] = fragment_cache.render('post-body', 'posts/includes/post_body.html', self.object)
+        context['comment_thread'] = load_thread(
+            self.object,
+            page=self.get_comments_page(),
+            per_page=self.comments_per_page,
+            max_depth=self.comments_max_depth,
+        )
+        context['comment_form'] = CommentForm(post=self.object, initial={'parent': self.request.GET.get('reply_to')})
+        context['related_posts'] = related_posts(self.object.pk)
+        context['prerendered'] = is_prerender(self.request)
         return context
 
     def post(self, request, *args, **kwargs):
+        # Лимит проверяется до чтения поста: отклонённая отправка не обращается к базе
+        wait = Throttle('comment').check(request)
+        if wait:
+            response = HttpResponse('Слишком много комментариев, попробуйте позже.', status=429,
+                                    content_type='text/plain; charset=utf-8')
+            response['Retry-After'] = str(int(wait) + 1)
+            return response
+
         self.object = self.get_object()
-        form = CommentForm(request.POST)
+        form = CommentForm(request.POST, post=self.object)
 
         if form.is_valid():
             comment = form.save(commit=False)
             comment.post = self.object
+            comment.ip_address = get_client_ip(request)
+            comment.user_agent = request.META.get('HTTP_USER_AGENT', '')
             comment.save()
             messages.success(request, 'Ваш комментарий отправлен на модерацию!')
-            return redirect('post-detail', pk=self.object.pk)
+            return redirect('posts:post-detail', pk=self.object.pk)
 
         context = self.get_context_data()
         context['comment_form'] = form
@@ -76,17 +151,12 @@ class PostSearchView(ListView):
     paginate_by = 10
 
     def get_queryset(self):
-        queryset = Post.published.all()
-        query = self.request.GET.get('q')
+        query = self.request.GET.get('q', '').strip()
 
-        if query:
-            queryset = queryset.filter(
-                Q(title__icontains=query) |
-                Q(content__icontains=query) |
-                Q(tags__name__icontains=query)
-            ).distinct()
+        if not query:
+            return Post.objects.none()
 
-        return queryset
+        return search_posts(query)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -94,6 +164,36 @@ class PostSearchView(ListView):
         return context
 
 
+def comment_thread(request, pk, comment_pk):
+    """Ветка ответов, свёрнутых на странице поста в «Ещё ответов»."""
+    post = get_object_or_404(Post.objects.only('pk', 'title'), pk=pk)
+    root = Comment.objects.filter(pk=comment_pk, post=post, approved=True).only('post', 'path', 'depth').first()
+    node = load_subtree(root, max_depth=PostDetailView.comments_max_depth) if root else None
+    if node is None:
+        raise Http404('Комментарий не найден')
+    thread = CommentThread([node], total=count_visible([node]))
+    # Отступы считаются от корня ветки, а не от корня всего обсуждения
+    for comment in thread:
+        comment.depth -= root.depth
+    return render(request, 'posts/comment_thread.html', {'post': post, 'root': node, 'comment_thread': thread})
+
+
+@csrf_exempt
+@require_POST
+def record_view(request, pk):
+    # Просмотр засчитывается только существующему опубликованному посту
+    if not Post.published.filter(pk=pk).exists():
+        raise Http404('Пост не найден')
+    view_counter.record(request, pk)
+    return HttpResponse(status=204)
+
+
+@never_cache
+def csrf_token(request):
+    """CSRF-токен для формы комментария на статической странице, где его нет в HTML."""
+    return JsonResponse({'token': get_token(request)})
+
+
 def about(request):
     return render(request, 'posts/about.html')
 